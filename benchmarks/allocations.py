@@ -0,0 +1,45 @@
+# Count the surfaces Game.step allocates per frame, by kind, and check that
+# there are none once the game runs: sprites come pre-flipped, the font, the
+# HUD, the transition mask and the scaled frame are reused buffers.
+# The counted frames include a level transition and screenshake.
+# run from the repo root: python -m benchmarks.allocations
+import os
+import random
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from game import Game
+from scripts.alloc_counter import SurfaceAllocCounter
+
+WARMUP = 120
+FRAMES = 300
+
+
+def main():
+    random.seed(0)
+    game = Game(show_start_screen=False)
+    # walk left and right so the player and the enemies get drawn flipped
+    for frame in range(WARMUP):
+        game.movement = [frame % 120 < 60, frame % 120 >= 60]
+        game.step()
+
+    counter = SurfaceAllocCounter()
+    with counter:
+        for frame in range(FRAMES):
+            game.movement = [frame % 120 < 60, frame % 120 >= 60]
+            if frame == FRAMES // 2:
+                game.transition = -30
+                game.screenshake = 16
+            game.step()
+
+    print('surfaces allocated per frame over %d frames:' % FRAMES)
+    for kind, count in counter.counts.most_common():
+        print('  %-24s %6.2f' % (kind, count / FRAMES))
+    print('  %-24s %6.2f' % ('total', counter.total / FRAMES))
+    assert counter.counts['transform.flip'] == 0, 'entities still flip their sprites every frame'
+    assert counter.total == 0, 'a steady-state frame allocates surfaces'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# Autotiling a large random map: the old full rescan, the numpy bulk pass,
+# and incremental passes after edits of growing size. The incremental time
+# should follow the number of edited cells, not the map size.
+# run from the repo root: python -m benchmarks.autotile
+import random
+import time
+
+from scripts.tilemap import Tilemap, AUTOTILE_MAP, AUTOTILE_TYPES
+
+SIDES = [128, 512]  # maps of SIDE x SIDE cells, about 70% filled
+EDITS = [1, 10, 100, 1000]
+
+
+def make_tilemap(side, seed=0):
+    rng = random.Random(seed)
+    tilemap = Tilemap(None, chunk_cache=False)
+    for y in range(side):
+        for x in range(side):
+            if rng.random() < 0.7:
+                tilemap.set_tile((x, y), rng.choice(['grass', 'stone', 'decor']), rng.randrange(9))
+    tilemap.autotiler.dirty.clear()
+    return tilemap
+
+
+def legacy_autotile(tilemap):
+    # Tilemap.autotile before the Autotiler: string keys, a set and a sorted tuple per tile
+    tiles = {str(x) + ';' + str(y): {'type': t, 'variant': v, 'pos': [x, y]} for x, y, t, v in tilemap.grid}
+    for tile in tiles.values():
+        neighbors = set()
+        for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
+            check_loc = str(tile['pos'][0] + shift[0]) + ';' + str(tile['pos'][1] + shift[1])
+            if check_loc in tiles:
+                if tiles[check_loc]['type'] == tile['type']:
+                    neighbors.add(shift)
+        neighbors = tuple(sorted(neighbors))
+        if (tile['type'] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
+            tile['variant'] = AUTOTILE_MAP[neighbors]
+    return tiles
+
+
+def snapshot(tilemap):
+    return sorted(tilemap.grid)
+
+
+def check_load(path='data/maps/0.json'):
+    # a loaded map is where the editor starts: its hand-picked variants aren't edits to redo
+    tilemap = Tilemap(None, chunk_cache=False)
+    tilemap.load(path)
+    assert not tilemap.autotiler.dirty
+    before = snapshot(tilemap)
+    assert tilemap.autotiler.update() == 0 and snapshot(tilemap) == before
+    print('%s: no cells left to re-tile after loading' % path)
+
+
+def main():
+    check_load()
+    for side in SIDES:
+        tilemap = make_tilemap(side)
+        start = time.perf_counter()
+        expected = legacy_autotile(tilemap)
+        legacy_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        tilemap.autotile()
+        bulk_ms = (time.perf_counter() - start) * 1000
+        assert snapshot(tilemap) == sorted((t['pos'][0], t['pos'][1], t['type'], t['variant']) for t in expected.values())
+        print('%dx%d map, %d tiles: legacy %.1f ms, bulk %.1f ms' % (side, side, len(tilemap.grid), legacy_ms, bulk_ms))
+
+        rng = random.Random(1)
+        for edits in EDITS:
+            for _ in range(edits):
+                pos = (rng.randrange(side), rng.randrange(side))
+                if rng.random() < 0.5:
+                    tilemap.set_tile(pos, rng.choice(['grass', 'stone']), 0)
+                else:
+                    tilemap.remove_tile(pos)
+            start = time.perf_counter()
+            tilemap.autotiler.update()
+            incremental_ms = (time.perf_counter() - start) * 1000
+            # the incremental result must match a full pass
+            after = snapshot(tilemap)
+            tilemap.autotile()
+            assert snapshot(tilemap) == after
+            print('  %5d edits: incremental %8.3f ms' % (edits, incremental_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# Overlap queries between many enemies and projectiles: brute force pair tests
+# against the SpatialHash broadphase, which is updated incrementally as the
+# enemies move.
+# run from the repo root: python -m benchmarks.broadphase
+import random
+import time
+
+import pygame
+
+from scripts.broadphase import SpatialHash
+
+COUNTS = [100, 300, 1000, 3000]  # enemies, with as many projectiles
+WORLD = (4000, 1000)
+FRAMES = 30
+
+
+def make_world(count, seed=0):
+    rng = random.Random(seed)
+    enemies = [[rng.uniform(0, WORLD[0]), rng.uniform(0, WORLD[1])] for _ in range(count)]
+    projectiles = [(rng.uniform(0, WORLD[0]), rng.uniform(0, WORLD[1])) for _ in range(count)]
+    steps = [rng.choice((-0.5, 0.5)) for _ in range(count)]
+    return enemies, projectiles, steps
+
+
+def run_brute(count):
+    enemies, projectiles, steps = make_world(count)
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        for pos, step in zip(enemies, steps):
+            pos[0] += step
+        # what the game did: a fresh Rect per entity per test
+        for point in projectiles:
+            for pos in enemies:
+                if pygame.Rect(pos[0], pos[1], 8, 15).collidepoint(point):
+                    hits += 1
+    return (time.perf_counter() - start) / FRAMES * 1000, hits
+
+
+def run_hashed(count):
+    enemies, projectiles, steps = make_world(count)
+    grid = SpatialHash(16)
+    for i, pos in enumerate(enemies):
+        grid.insert(i, (int(pos[0]), int(pos[1]), 8, 15))
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        for i, (pos, step) in enumerate(zip(enemies, steps)):
+            pos[0] += step
+            grid.move(i, (int(pos[0]), int(pos[1]), 8, 15))
+        for point in projectiles:
+            hits += len(grid.query_point(point))
+    return (time.perf_counter() - start) / FRAMES * 1000, hits
+
+
+def main():
+    print('%8s %12s %12s %8s' % ('count', 'pairs ms', 'hash ms', 'speedup'))
+    for count in COUNTS:
+        brute_ms, brute_hits = run_brute(count) if count <= 1000 else (None, None)
+        hash_ms, hash_hits = run_hashed(count)
+        if brute_ms is None:
+            print('%8d %12s %12.2f %8s' % (count, '-', hash_ms, '-'))
+            continue
+        assert brute_hits == hash_hits
+        print('%8d %12.2f %12.2f %7.1fx' % (count, brute_ms, hash_ms, brute_ms / hash_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# Tile collision throughput for many entities: PhysicsEntity.update against
+# physics_rects_around building fresh Rects on every call (what it used to
+# do), against the prebuilt CollisionGeometry, and the entities moved
+# together by a PhysicsWorld, on a level with platforms. Also times building
+# the geometry and patching it after single tile edits, and checks that a
+# body moving faster than a tile per frame doesn't pass through a wall.
+# run from the repo root: python -m benchmarks.collision
+import random
+import time
+
+import pygame
+
+from scripts.collision import NEIGHBOR_OFFSETS
+from scripts.entity import PhysicsEntity
+from scripts.physics import PhysicsWorld
+from scripts.simulation import headless_assets
+from scripts.tilegrid import CHUNK_SHIFT, CHUNK_MASK
+from scripts.tilemap import Tilemap
+
+COUNTS = [100, 300, 1000]
+FRAMES = 120
+WIDTH = 200  # tiles
+FLOOR_Y = 30
+
+
+class PerCallTilemap(Tilemap):
+    # physics_rects_around as it was before the geometry was cached
+    def physics_rects_around(self, pos):
+        rects = []
+        ts = self.tile_size
+        tile_x = int(pos[0] // ts)
+        tile_y = int(pos[1] // ts)
+        chunks = self.grid.chunks
+        solid = self.grid.solid
+        for offset in NEIGHBOR_OFFSETS:
+            x = tile_x + offset[0]
+            y = tile_y + offset[1]
+            chunk = chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+            if chunk is not None and solid[chunk.types[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]] == 1:
+                rects.append(pygame.Rect(x * ts, y * ts, ts, ts))
+        return rects
+
+
+class Owner:
+    # what an entity needs of the game: its animations
+    def __init__(self, assets):
+        self.assets = assets
+
+
+def fill(tilemap, seed=0):
+    # a floor between two walls, with platforms of random length above it
+    rng = random.Random(seed)
+    for x in range(WIDTH):
+        tilemap.set_tile((x, FLOOR_Y), 'stone')
+    for y in range(FLOOR_Y):
+        tilemap.set_tile((0, y), 'stone')
+        tilemap.set_tile((WIDTH - 1, y), 'stone')
+    for _ in range(WIDTH // 2):
+        x = rng.randrange(2, WIDTH - 8)
+        y = rng.randrange(4, FLOOR_Y - 2)
+        for dx in range(rng.randrange(1, 7)):
+            tilemap.set_tile((x + dx, y), 'grass')
+
+
+def run(tilemap_class, count, owner, seed=0, batched=False):
+    tilemap = tilemap_class(None, chunk_cache=False)
+    fill(tilemap)
+    rng = random.Random(seed)
+    ts = tilemap.tile_size
+    entities = []
+    while len(entities) < count:
+        entity = PhysicsEntity(owner, 'enemy', (rng.uniform(ts, (WIDTH - 2) * ts), rng.uniform(0, (FLOOR_Y - 1) * ts)), (8, 15))
+        # not inside a tile, where the ways of getting out differ
+        if entity.rect().collidelist(tilemap.physics_rects_around(entity.pos)) < 0:
+            entities.append(entity)
+    steps = [rng.choice((-1, 1)) * rng.uniform(0.3, 1.5) for _ in range(count)]
+    world = None
+    if batched:
+        world = PhysicsWorld(tilemap)
+        for entity in entities:
+            world.add(entity)
+    start = time.perf_counter()
+    for frame in range(FRAMES):
+        movements = []
+        for i, entity in enumerate(entities):
+            if entity.collisions['left'] or entity.collisions['right']:
+                steps[i] = -steps[i]
+            if frame % 40 == i % 40 and entity.collisions['down']:
+                entity.velocity[1] = -3
+            if world is None:
+                entity.update(tilemap, (steps[i], 0))
+            else:
+                entity.prev_pos = tuple(entity.pos)
+                movements.append((steps[i], 0))
+        if world is not None:
+            world.step(entities, movements)
+            for entity, movement in zip(entities, movements):
+                entity.moved(movement)
+    elapsed = time.perf_counter() - start
+    return elapsed, [tuple(entity.pos) for entity in entities]
+
+
+def geometry_costs():
+    tilemap = Tilemap(None, chunk_cache=False)
+    fill(tilemap)
+    start = time.perf_counter()
+    for _ in range(20):
+        tilemap.collision.build()
+    build = (time.perf_counter() - start) / 20 * 1000
+    cells = len(tilemap.collision.cells)
+    runs = sum(len(row) for row in tilemap.collision.runs.values())
+    rng = random.Random(1)
+    edits = [(rng.randrange(1, WIDTH - 1), rng.randrange(4, FLOOR_Y)) for _ in range(2000)]
+    start = time.perf_counter()
+    for pos in edits:
+        if tilemap.remove_tile(pos) is False:
+            tilemap.set_tile(pos, 'stone')
+    edit = (time.perf_counter() - start) / len(edits) * 1e6
+    return build, edit, cells, runs
+
+
+def tunnels(owner, batched, speed=40):
+    # does a body thrown at a one tile thick wall come out on the other side?
+    tilemap = Tilemap(None, chunk_cache=False)
+    for y in range(4):
+        tilemap.set_tile((10, y), 'stone')
+    entity = PhysicsEntity(owner, 'enemy', (140, 20), (8, 15))
+    if batched:
+        PhysicsWorld(tilemap).add(entity)
+    entity.velocity[0] = speed
+    entity.update(tilemap)
+    return entity.pos[0] > 10 * tilemap.tile_size
+
+
+def main():
+    owner = Owner(headless_assets())
+    print('%8s %16s %16s %16s %8s' % ('entities', 'per call upd/s', 'cached upd/s', 'batched upd/s', 'speedup'))
+    for count in COUNTS:
+        old, old_end = run(PerCallTilemap, count, owner)
+        new, new_end = run(Tilemap, count, owner)
+        batched, batched_end = run(Tilemap, count, owner, batched=True)
+        # all must move every entity the same way before their speed means anything
+        assert old_end == new_end == batched_end
+        updates = count * FRAMES
+        print('%8d %16.0f %16.0f %16.0f %7.2fx' % (count, updates / old, updates / new, updates / batched, old / batched))
+    build, edit, cells, runs = geometry_costs()
+    print()
+    print('%d solid tiles in %d merged runs' % (cells, runs))
+    print('full build %.3f ms, %.2f us per tile edit' % (build, edit))
+    print('40 px/frame into a wall: update %s, batched %s' % (
+        'passes through' if tunnels(owner, False) else 'stops', 'passes through' if tunnels(owner, True) else 'stops'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# Milliseconds per Simulation.tick as the number of enemies grows, with
+# every enemy updated on its own and with the batched physics (PhysicsWorld
+# and EnemyManager), on an arena of platforms with ledges to turn at. The
+# player stands in the middle and can't die, so every enemy keeps walking
+# and shooting for the whole run; both ways must end in the same state.
+# A tick has to fit in 16.7 ms for 60 FPS.
+# run from the repo root: python -m benchmarks.enemy_sweep
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from scripts.enemy import Enemy
+from scripts.replay import state_hash
+from scripts.simulation import Simulation, headless_assets, silent_sfx
+
+COUNTS = [50, 100, 250, 500, 1000, 2000]
+TICKS = 300
+WARMUP = 30
+WIDTH = 240  # tiles
+FLOOR_Y = 40
+FRAME_MS = 1000 / 60
+
+
+def arena(seed=0):
+    # a floor between two walls, platforms of random length above it; returns the map and
+    # where enemies can stand, (x, y) in pixels
+    rng = random.Random(seed)
+    tiles = {}
+    spots = []
+
+    def put(x, y):
+        tiles['%d;%d' % (x, y)] = {'type': 'stone', 'variant': 0, 'pos': [x, y]}
+
+    for x in range(WIDTH):
+        put(x, FLOOR_Y)
+        if 0 < x < WIDTH - 1:
+            spots.append((x, FLOOR_Y))
+    for y in range(FLOOR_Y):
+        put(0, y)
+        put(WIDTH - 1, y)
+    for row in range(4, FLOOR_Y - 3, 4):
+        x = rng.randrange(2, 12)
+        while x < WIDTH - 12:
+            length = rng.randrange(4, 12)
+            for dx in range(length):
+                put(x + dx, row)
+                spots.append((x + dx, row))
+            x += length + rng.randrange(3, 10)
+    return {'tilemap': tiles, 'tile_size': 16, 'offgrid': []}, spots
+
+
+def populate(sim, count, seed=0):
+    level, spots = arena(seed)
+    sim.tilemap.load_data(level)
+    sim.tilemap.autotile()
+    sim.leaf_spawners = []
+    sim.clear_enemies()
+    ts = sim.tilemap.tile_size
+    rng = random.Random(seed)
+    for x, y in rng.sample(spots, count) if count <= len(spots) else [rng.choice(spots) for _ in range(count)]:
+        sim.add_enemy(Enemy(sim, (x * ts + rng.randrange(0, ts - 8), y * ts - 15), (8, 15)))
+    sim.player.pos[:] = (WIDTH // 2 * ts, FLOOR_Y * ts - 15)
+    sim.player.velocity[:] = (0, 0)
+    sim.player.health = 10 ** 9
+    sim.projectiles.clear()
+    sim.particles.clear()
+    sim.sparks.clear()
+    sim.reset_render_state()
+
+
+def run(count, batched):
+    sim = Simulation(headless_assets(), silent_sfx(), seed=1, batched_physics=batched)
+    populate(sim, count)
+    for _ in range(WARMUP):
+        sim.tick(0)
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        sim.tick(0)
+    elapsed = (time.perf_counter() - start) / TICKS * 1000
+    assert not sim.dead and len(sim.enemies) == count
+    return elapsed, state_hash(sim)
+
+
+def main():
+    print('%8s %16s %16s %8s' % ('enemies', 'per enemy ms', 'batched ms', 'speedup'))
+    for count in COUNTS:
+        single, single_end = run(count, False)
+        batched, batched_end = run(count, True)
+        # both have to play the same game
+        assert single_end == batched_end
+        print('%8d %10.2f %-5s %10.2f %-5s %7.2fx' % (
+            count, single, '' if single <= FRAME_MS else '>60Hz', batched, '' if batched <= FRAME_MS else '>60Hz', single / batched))
+    print('>60Hz: the tick alone takes longer than a 60 FPS frame (%.1f ms)' % FRAME_MS)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# Simulated frames per second of the headless environments: one Simulation,
+# a VectorEnv of several in this process, and ProcessVectorEnv over 1, 2, 4
+# ... workers up to the number of cores, all with random actions.
+# run from the repo root: python -m benchmarks.env_throughput
+import multiprocessing
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+
+from scripts.env import VectorEnv, ProcessVectorEnv
+
+STEPS = 300
+PER_WORKER = 8
+
+
+def throughput(env, count):
+    actions = np.random.default_rng(0).integers(0, 16, size=(STEPS, count)).astype(np.uint8)
+    env.reset()
+    start = time.perf_counter()
+    for step in actions:
+        env.step(step)
+    return STEPS * count / (time.perf_counter() - start)
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    print('%-28s %12s' % ('environment', 'frames/s'))
+    for count in (1, PER_WORKER):
+        print('%-28s %12.0f' % ('VectorEnv(%d)' % count, throughput(VectorEnv(count), count)))
+    workers = 1
+    while True:
+        count = workers * PER_WORKER
+        with ProcessVectorEnv(count, workers=workers) as env:
+            print('%-28s %12.0f' % ('ProcessVectorEnv(%d, %d workers)' % (count, workers), throughput(env, count)))
+        if workers >= cores:
+            break
+        workers = min(workers * 2, cores)
+    print('%d cores' % cores)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Load time of a synthetic 1M tile level, as a JSON map and as a binary map
+# (scripts/mapformat.py), both through Tilemap.load.
+# run from the repo root: python -m benchmarks.map_load
+import json
+import os
+import random
+import tempfile
+import time
+
+from scripts.tilemap import Tilemap
+
+SIDE = 1000  # SIDE x SIDE tiles
+TYPES = ['grass', 'stone', 'decor', 'large_decor']
+
+
+def make_map(seed=0):
+    rng = random.Random(seed)
+    tilemap = {}
+    for y in range(-SIDE // 2, SIDE // 2):
+        for x in range(-SIDE // 2, SIDE // 2):
+            tilemap[str(x) + ';' + str(y)] = {'type': rng.choice(TYPES), 'variant': rng.randrange(9), 'pos': [x, y]}
+    offgrid = [{'type': 'large_decor', 'variant': rng.randrange(3), 'pos': [rng.uniform(-8000, 8000), rng.uniform(-8000, 8000)]}
+               for _ in range(1000)]
+    return {'tilemap': tilemap, 'tile_size': 16, 'offgrid': offgrid}
+
+
+def timed_load(path):
+    tilemap = Tilemap(None)
+    start = time.perf_counter()
+    tilemap.load(path)
+    return time.perf_counter() - start, tilemap
+
+
+def main():
+    map_data = make_map()
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'level.json')
+        map_path = os.path.join(tmp, 'level.map')
+        with open(json_path, 'w') as f:
+            json.dump(map_data, f)
+        del map_data
+        json_seconds, from_json = timed_load(json_path)
+        from_json.save(map_path)
+        map_seconds, from_map = timed_load(map_path)
+
+        assert sorted(from_json.grid) == sorted(from_map.grid)
+        assert from_json.offgrid_tiles.copy() == from_map.offgrid_tiles.copy()
+        print('%d tiles' % len(from_map.grid))
+        print('%-7s %10s %10s' % ('', 'size MB', 'load ms'))
+        print('%-7s %10.1f %10.0f' % ('json', os.path.getsize(json_path) / 1e6, json_seconds * 1000))
+        print('%-7s %10.1f %10.0f' % ('binary', os.path.getsize(map_path) / 1e6, map_seconds * 1000))
+        print('%.1fx faster' % (json_seconds / map_seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# A decor-heavy map: drawing the offgrid tiles (chunk cache off) and the
+# editor's right-click hit test, looping over every offgrid tile as before
+# against the OffgridTiles spatial index, for growing amounts of decor.
+# run from the repo root: python -m benchmarks.offgrid
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from scripts.tilemap import Tilemap
+from benchmarks.tilemap_render import AssetHolder
+
+COUNTS = [1000, 10000, 50000]
+WORLD = 20000  # decor spread over WORLD x WORLD / 4 pixels
+FRAMES = 100
+
+
+def make_tilemap(game, count, seed=0):
+    rng = random.Random(seed)
+    tilemap = Tilemap(game, chunk_cache=False)
+    tilemap.set_offgrid([{'type': rng.choice(['decor', 'large_decor']), 'variant': rng.randrange(3),
+                          'pos': [rng.uniform(0, WORLD), rng.uniform(0, WORLD / 4)]} for _ in range(count)])
+    return tilemap
+
+
+def legacy_render(tilemap, surf, offset):
+    for tile in tilemap.offgrid_tiles.copy():
+        surf.blit(tilemap.game.assets[tile['type']][tile['variant']], (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
+
+
+def legacy_hits(tilemap, point):
+    hits = []
+    # the editor's loop, with the float positions compared exactly like the index
+    # does (pygame.Rect truncated them, which moved the hitbox by under a pixel)
+    for tile in tilemap.offgrid_tiles.copy():
+        img = tilemap.game.assets[tile['type']][tile['variant']]
+        x, y = tile['pos']
+        if x <= point[0] < x + img.get_width() and y <= point[1] < y + img.get_height():
+            hits.append(tile)
+    return hits
+
+
+def main():
+    pygame.init()
+    pygame.display.set_mode((320, 240))
+    game = AssetHolder()
+    display = pygame.Surface((320, 240))
+    print('%8s %14s %14s %14s %14s' % ('decor', 'draw ms', 'indexed ms', 'hit test ms', 'indexed ms'))
+    for count in COUNTS:
+        tilemap = make_tilemap(game, count)
+        offsets = [(int(WORLD * i / FRAMES), 1000) for i in range(FRAMES)]
+        points = [(x + 160.5, y + 120.5) for x, y in offsets]
+
+        start = time.perf_counter()
+        for offset in offsets:
+            display.fill((0, 0, 0))
+            legacy_render(tilemap, display, offset)
+        old_draw = (time.perf_counter() - start) / FRAMES * 1000
+        old_image = pygame.image.tobytes(display, 'RGB')
+        start = time.perf_counter()
+        for offset in offsets:
+            display.fill((0, 0, 0))
+            tilemap.render(display, offset)
+        new_draw = (time.perf_counter() - start) / FRAMES * 1000
+        new_image = pygame.image.tobytes(display, 'RGB')
+        assert old_image == new_image
+
+        start = time.perf_counter()
+        old_hits = [len(legacy_hits(tilemap, point)) for point in points]
+        old_hit = (time.perf_counter() - start) / FRAMES * 1000
+        start = time.perf_counter()
+        new_hits = [len(tilemap.offgrid_tiles.query_point(point)) for point in points]
+        new_hit = (time.perf_counter() - start) / FRAMES * 1000
+        assert old_hits == new_hits
+        print('%8d %14.3f %14.3f %14.3f %14.3f' % (count, old_draw, new_draw, old_hit, new_hit))
+
+
+if __name__ == '__main__':
+    main()
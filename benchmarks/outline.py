@@ -0,0 +1,66 @@
+# Time the outline pass: the old per-frame mask rebuild against the buffered
+# BLEND_RGBA_MIN silhouette, at the game's internal resolution and larger.
+# run from the repo root: python -m benchmarks.outline
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from scripts.utils import load_images
+from scripts.tilemap import Tilemap
+from scripts.outline import Outline, OUTLINE_OFFSETS
+
+MAP = 'data/maps/1.json'
+SIZES = [(320, 240), (640, 480), (1280, 960)]
+FRAMES = 200
+
+
+class AssetHolder:
+    def __init__(self):
+        self.assets = {
+            'decor': load_images('tiles/decor'),
+            'grass': load_images('tiles/grass'),
+            'stone': load_images('tiles/stone'),
+            'large_decor': load_images('tiles/large_decor'),
+            'spawners': load_images('tiles/spawners'),
+        }
+
+
+def timed(outline, display, dest):
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        outline.render(display, dest)
+    return (time.perf_counter() - start) / FRAMES * 1000
+
+
+def main():
+    pygame.init()
+    pygame.display.set_mode((320, 240))
+    tilemap = Tilemap(AssetHolder())
+    tilemap.load(MAP)
+    print('%12s %10s %12s %8s' % ('size', 'mask ms', 'buffered ms', 'speedup'))
+    for size in SIZES:
+        display = pygame.Surface(size, pygame.SRCALPHA)
+        display.fill((0, 0, 0, 0))
+        tilemap.render(display, offset=(-40, -40))
+        dest = pygame.Surface(size)
+
+        # same silhouette as the mask pass drawn at the same offsets
+        reference = pygame.Surface(size)
+        reference.fill((40, 80, 120))
+        silhouette = pygame.mask.from_surface(display).to_surface(setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0))
+        for offset in OUTLINE_OFFSETS:
+            reference.blit(silhouette, offset)
+        dest.fill((40, 80, 120))
+        Outline(size).render(display, dest)
+        assert pygame.image.tobytes(reference, 'RGB') == pygame.image.tobytes(dest, 'RGB')
+
+        mask_ms = timed(Outline(size, mode='mask'), display, dest)
+        buffered_ms = timed(Outline(size), display, dest)
+        print('%12s %10.3f %12.3f %7.1fx' % ('%dx%d' % size, mask_ms, buffered_ms, mask_ms / buffered_ms))
+
+
+if __name__ == '__main__':
+    main()
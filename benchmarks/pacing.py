@@ -0,0 +1,41 @@
+# Frame pacing of the fixed-timestep loop (Game.frame) at different render
+# rates: uncapped, capped at 144, 60 and 30 fps, and 60 fps with a long stall
+# now and then. The game should tick at 60 per second in every case, with
+# several ticks per frame below 60 fps and dropped ticks only after stalls.
+# run from the repo root: python -m benchmarks.pacing
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from game import Game
+
+SECONDS = 3
+
+
+def run(game, max_fps, stall_every=0, stall=0.2):
+    game.max_fps = max_fps
+    game.timestep.last = None
+    game.timestep.accumulator = 0.0
+    game.timestep.reset_stats()
+    end = time.perf_counter() + SECONDS
+    frame = 0
+    while time.perf_counter() < end:
+        game.frame()
+        frame += 1
+        if stall_every and frame % stall_every == 0:
+            time.sleep(stall)
+
+
+def main():
+    game = Game(show_start_screen=False)
+    for name, max_fps, stall_every in (('uncapped', 0, 0), ('144 fps', 144, 0), ('60 fps', 60, 0),
+                                       ('30 fps', 30, 0), ('60 fps, stalls', 60, 60)):
+        run(game, max_fps, stall_every)
+        print('--', name)
+        print(game.timestep.report())
+
+
+if __name__ == '__main__':
+    main()
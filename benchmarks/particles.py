@@ -0,0 +1,79 @@
+# Compare the array backed ParticleSystem against the old list of Particle
+# objects at a steady number of live leaf particles.
+# run from the repo root: python -m benchmarks.particles
+import math
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from scripts.utils import load_images, Animation
+from scripts.particle import Particle, ParticleSystem
+
+LIVE_COUNTS = [1000, 5000, 10000, 20000]
+FRAMES = 120
+
+
+class AssetHolder:
+    def __init__(self):
+        self.assets = {
+            'particle/leaf': Animation(load_images('particles/leaf'), img_dur=20, loop=False),
+            'particle/particle': Animation(load_images('particles/particle'), img_dur=6, loop=False),
+        }
+
+
+def spawn_args(rng, per_frame):
+    return [((rng.random() * 320, rng.random() * 240), (-0.1, 0.3), rng.randint(0, 20)) for _ in range(per_frame)]
+
+
+def run_legacy(game, display, live, frames):
+    # the loop Game.run used to have
+    rng = random.Random(0)
+    per_frame = live // 360  # a leaf lives ~360 frames
+    particles = [Particle(game, 'leaf', pos, velocity=vel, frame=rng.randint(0, 359)) for pos, vel, _ in spawn_args(rng, live)]
+    start = time.perf_counter()
+    for _ in range(frames):
+        for pos, vel, frame in spawn_args(rng, per_frame):
+            particles.append(Particle(game, 'leaf', pos, velocity=vel, frame=frame))
+        for particle in particles.copy():
+            kill = particle.update()
+            particle.render(display)
+            if particle.type == 'leaf':
+                particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
+            if kill:
+                particles.remove(particle)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def run_system(game, display, live, frames):
+    rng = random.Random(0)
+    per_frame = live // 360
+    particles = ParticleSystem(game.assets)
+    for pos, vel, _ in spawn_args(rng, live):
+        particles.spawn('leaf', pos, velocity=vel, frame=rng.randint(0, 359))
+    start = time.perf_counter()
+    for _ in range(frames):
+        for pos, vel, frame in spawn_args(rng, per_frame):
+            particles.spawn('leaf', pos, velocity=vel, frame=frame)
+        particles.update()
+        particles.render(display)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    pygame.init()
+    pygame.display.set_mode((320, 240))
+    display = pygame.Surface((320, 240), pygame.SRCALPHA)
+    game = AssetHolder()
+    print('%8s %12s %12s %8s' % ('live', 'list ms', 'arrays ms', 'speedup'))
+    for live in LIVE_COUNTS:
+        legacy = run_legacy(game, display, live, FRAMES)
+        system = run_system(game, display, live, FRAMES)
+        print('%8d %12.2f %12.2f %7.1fx' % (live, legacy, system, legacy / system))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# Per-stage frame times of the game loop from the built-in profiler, and what
+# the profiler costs: the same frames with it off and on.
+# Writes profile_trace.json (open it in chrome://tracing or Perfetto) and
+# profile.csv next to where it is run.
+# run from the repo root: python -m benchmarks.profile_frames
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from game import Game
+
+FRAMES = 600
+
+
+def run_frames(game, start):
+    random.seed(0)
+    game.restore(start)
+    begin = time.perf_counter()
+    for _ in range(FRAMES):
+        game.step()
+    return (time.perf_counter() - begin) / FRAMES * 1000
+
+
+def main():
+    game = Game(show_start_screen=False)
+    for _ in range(60):
+        game.step()
+    start = game.snapshot()
+
+    off = min(run_frames(game, start) for _ in range(3))
+    game.profiler.set_enabled(True)
+    on = min(run_frames(game, start) for _ in range(3))
+    game.profiler.next_frame()
+
+    print('%-12s %8s %8s %8s' % ('stage ms', 'p50', 'p95', 'p99'))
+    for name, values in game.profiler.percentiles().items():
+        print('%-12s %8.3f %8.3f %8.3f' % (name, *values))
+    print()
+    print('profiler off %.3f ms/frame, on %.3f ms/frame (%+.1f%%)' % (off, on, (on - off) / off * 100))
+    game.profiler.export_chrome('profile_trace.json')
+    game.profiler.export_csv('profile.csv')
+    print('wrote profile_trace.json and profile.csv')
+
+
+if __name__ == '__main__':
+    main()
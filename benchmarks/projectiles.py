@@ -0,0 +1,97 @@
+# Stress test the pooled ProjectileSystem against the old list of
+# [[x, y], speed, timer] projectiles with hundreds of projectiles in flight.
+# run from the repo root: python -m benchmarks.projectiles
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from scripts.utils import load_image
+from scripts.tilemap import Tilemap
+from scripts.projectile import ProjectileSystem, MAX_AGE, NEVER
+
+MAP = 'data/maps/2.json'
+IN_FLIGHT = [100, 300, 1000]
+FRAMES = 300
+
+
+def spawn_points(tilemap, rng, count):
+    xs = [x for x, y, _, _ in tilemap.grid]
+    ys = [y for x, y, _, _ in tilemap.grid]
+    ts = tilemap.tile_size
+    return [((rng.uniform(min(xs), max(xs)) * ts, rng.uniform(min(ys), max(ys)) * ts), rng.choice((-1.5, 1.5)))
+            for _ in range(count)]
+
+
+def check_impact_frames(tilemap, projectiles, points):
+    # the precomputed frame must match stepping the projectile frame by frame,
+    # up to the frame after MAX_AGE: the tile is checked before the age
+    for pos, speed in points:
+        expected = NEVER
+        for k in range(1, MAX_AGE + 2):
+            if tilemap.solid_check((pos[0] + k * speed, pos[1])):
+                expected = k
+                break
+        assert projectiles.impact_frame(pos, speed) == expected, (pos, speed)
+
+
+def run_legacy(tilemap, img, display, player_rect, in_flight, frames):
+    # the loop Game.run used to have, minus the sparks
+    rng = random.Random(0)
+    projectiles = [[list(pos), speed, 0] for pos, speed in spawn_points(tilemap, rng, in_flight)]
+    start = time.perf_counter()
+    for _ in range(frames):
+        for projectile in projectiles.copy():
+            projectile[0][0] += projectile[1]
+            projectile[2] += 1
+            display.blit(img, (projectile[0][0] - img.get_width() / 2, projectile[0][1] - img.get_height() / 2))
+            if tilemap.solid_check(projectile[0]):
+                projectiles.remove(projectile)
+            elif projectile[2] > MAX_AGE:
+                projectiles.remove(projectile)
+            elif player_rect.collidepoint(projectile[0]):
+                projectiles.remove(projectile)
+        for pos, speed in spawn_points(tilemap, rng, in_flight - len(projectiles)):
+            projectiles.append([list(pos), speed, 0])
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def run_pooled(tilemap, img, display, player_rect, in_flight, frames):
+    rng = random.Random(0)
+    projectiles = ProjectileSystem(tilemap, img)
+    for pos, speed in spawn_points(tilemap, rng, in_flight):
+        projectiles.spawn(pos, speed)
+    start = time.perf_counter()
+    for _ in range(frames):
+        projectiles.update(player_rect)
+        projectiles.render(display)
+        # projectiles removed this frame are still counted until the next update
+        removed = int(projectiles.kill.sum())
+        for pos, speed in spawn_points(tilemap, rng, removed):
+            projectiles.spawn(pos, speed)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    pygame.init()
+    pygame.display.set_mode((320, 240))
+    display = pygame.Surface((320, 240), pygame.SRCALPHA)
+    img = load_image('projectile.png')
+    tilemap = Tilemap(None)
+    tilemap.load(MAP)
+    player_rect = pygame.Rect(150, 100, 8, 15)
+
+    check_impact_frames(tilemap, ProjectileSystem(tilemap, img), spawn_points(tilemap, random.Random(1), 2000))
+
+    print('%10s %10s %10s %8s' % ('in flight', 'list ms', 'pool ms', 'speedup'))
+    for in_flight in IN_FLIGHT:
+        legacy = run_legacy(tilemap, img, display, player_rect, in_flight, FRAMES)
+        pooled = run_pooled(tilemap, img, display, player_rect, in_flight, FRAMES)
+        print('%10d %10.2f %10.2f %7.1fx' % (in_flight, legacy, pooled, legacy / pooled))
+
+
+if __name__ == '__main__':
+    main()
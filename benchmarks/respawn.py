@@ -0,0 +1,43 @@
+# Cost of reloading a level on death: what load_level did before (read and
+# parse the JSON, extract the spawners) against restoring the cached level
+# template, plus a full Game.snapshot()/restore() round trip.
+# run from the repo root: python -m benchmarks.respawn
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from game import Game, level_path
+
+RUNS = 200
+
+
+def per_call_ms(func):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        func()
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def reload_from_disk(game, map_id):
+    game.tilemap.load(level_path(map_id))
+    game.tilemap.extract([('large_decor', 2)], keep=True)
+    game.tilemap.extract([('spawners', 0), ('spawners', 1)])
+
+
+def main():
+    game = Game(show_start_screen=False)
+    for _ in range(60):
+        game.step()
+    print('%-6s %12s %12s %18s' % ('level', 'disk ms', 'template ms', 'snapshot+restore'))
+    for map_id in range(game.level_count):
+        disk = per_call_ms(lambda: reload_from_disk(game, map_id))
+        game.level = map_id
+        template = per_call_ms(lambda: game.load_level(map_id))
+        round_trip = per_call_ms(lambda: game.restore(game.snapshot()))
+        print('%-6d %12.3f %12.3f %15.3f ms' % (map_id, disk, template, round_trip))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Compare SparkSystem against the old list of Spark objects with hit bursts of
+# 30 sparks (what a dash kill or a projectile hit spawns).
+# run from the repo root: python -m benchmarks.sparks
+import math
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from scripts.spark import Spark, SparkSystem
+
+BURSTS_PER_FRAME = [1, 4, 16]
+FRAMES = 300
+WARMUP = 30  # frames left out of the worst frame time, the pools are still growing
+
+
+def bursts(rng, count):
+    for _ in range(count):
+        pos = (rng.random() * 320, rng.random() * 240)
+        for _ in range(30):
+            yield pos, rng.random() * math.pi * 2, 2 + rng.random()
+
+
+def run_legacy(display, per_frame, frames):
+    # the loop Game.run used to have
+    rng = random.Random(0)
+    sparks = []
+    worst = 0
+    start = time.perf_counter()
+    for frame in range(frames):
+        frame_start = time.perf_counter()
+        for pos, angle, speed in bursts(rng, per_frame):
+            sparks.append(Spark(pos, angle, speed))
+        for spark in sparks.copy():
+            kill = spark.update()
+            spark.render(display)
+            if kill:
+                sparks.remove(spark)
+        if frame >= WARMUP:
+            worst = max(worst, time.perf_counter() - frame_start)
+    return (time.perf_counter() - start) / frames * 1000, worst * 1000, len(sparks)
+
+
+def run_system(display, per_frame, frames):
+    rng = random.Random(0)
+    sparks = SparkSystem()
+    worst = 0
+    start = time.perf_counter()
+    for frame in range(frames):
+        frame_start = time.perf_counter()
+        for pos, angle, speed in bursts(rng, per_frame):
+            sparks.spawn(pos, angle, speed)
+        sparks.update()
+        sparks.render(display)
+        if frame >= WARMUP:
+            worst = max(worst, time.perf_counter() - frame_start)
+    return (time.perf_counter() - start) / frames * 1000, worst * 1000, len(sparks)
+
+
+def main():
+    pygame.init()
+    pygame.display.set_mode((320, 240))
+    display = pygame.Surface((320, 240), pygame.SRCALPHA)
+    print('%8s %8s %10s %10s %10s %10s' % ('bursts', 'live', 'list ms', 'list max', 'pool ms', 'pool max'))
+    for per_frame in BURSTS_PER_FRAME:
+        legacy_ms, legacy_worst, live = run_legacy(display, per_frame, FRAMES)
+        pool_ms, pool_worst, _ = run_system(display, per_frame, FRAMES)
+        print('%8d %8d %10.2f %10.2f %10.2f %10.2f' % (per_frame, live, legacy_ms, legacy_worst, pool_ms, pool_worst))
+
+
+if __name__ == '__main__':
+    main()
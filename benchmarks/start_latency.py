@@ -0,0 +1,52 @@
+# Time from clicking Start to the first gameplay frame. With the loader the
+# assets and the first level are read while the start screen waits, so a
+# click after a human-like delay should find nearly everything done; a click
+# right away shows the cost of loading it all after the click, as before.
+# run from the repo root: python -m benchmarks.start_latency
+import os
+import statistics
+import subprocess
+import sys
+
+RUNS = 5
+DELAYS = [0.0, 0.5, 1.0]  # seconds between the start screen and the click
+
+CHILD = '''
+import os, time
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+import pygame
+import game
+shown = []
+clicked = []
+flip = pygame.display.flip
+def flip_and_click():
+    # the start screen flips once a frame; click Start once it has been up long enough
+    flip()
+    now = time.perf_counter()
+    shown.append(now)
+    if not clicked and now - shown[0] >= %(delay)r:
+        clicked.append(now)
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(400, 300), button=1))
+pygame.display.flip = flip_and_click
+g = game.Game(show_start_screen=True)
+g.step()
+print(time.perf_counter() - clicked[0])
+'''
+
+
+def latency(delay):
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    out = subprocess.run([sys.executable, '-c', CHILD % {'delay': delay}], capture_output=True, text=True, env=env, check=True)
+    return float(out.stdout) * 1000
+
+
+def main():
+    print('%10s %16s' % ('click at', 'to first frame'))
+    for delay in DELAYS:
+        ms = statistics.median(latency(delay) for _ in range(RUNS))
+        print('%9.1fs %13.1f ms' % (delay, ms))
+
+
+if __name__ == '__main__':
+    main()
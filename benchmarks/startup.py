@@ -0,0 +1,73 @@
+# Cold start: time from a fresh interpreter to a constructed Game, loading the
+# images one file at a time against the baked atlas (python -m scripts.atlas).
+# Each run is its own process so nothing is cached between runs.
+# run from the repo root: python -m benchmarks.startup
+import os
+import statistics
+import subprocess
+import sys
+
+RUNS = 15
+
+CHILD = '''
+import os, time
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+start = time.perf_counter()
+import game
+from scripts import atlas, utils
+if %(files)r:
+    # the loader finds no atlas and reads the image files
+    atlas.read = lambda rebuild=False: None
+# time spent getting images, as opposed to the rest of Game.__init__
+spent = [0.0]
+def timed(func):
+    def wrapper(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            spent[0] += time.perf_counter() - t
+    return wrapper
+game.AssetLoader.wait = timed(game.AssetLoader.wait)
+game.load_image = timed(game.load_image)
+game.load_images = timed(game.load_images)
+g = game.Game(show_start_screen=False)
+end = time.perf_counter()
+print(end - start, spent[0], utils.ATLAS is not None)
+'''
+
+
+def cold_start(files):
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    out = subprocess.run([sys.executable, '-c', CHILD % {'files': files}], capture_output=True, text=True, env=env, check=True)
+    total, images, used_atlas = out.stdout.split()
+    return float(total) * 1000, float(images) * 1000, used_atlas == 'True'
+
+
+def main():
+    from scripts import atlas
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    if atlas.load() is None:
+        print('atlas missing or stale, rebuilding')
+        atlas.build()
+
+    results = {}
+    print('%-6s %14s %14s' % ('', 'startup ms', 'images ms'))
+    for label, files in [('files', True), ('atlas', False)]:
+        totals, images = [], []
+        for _ in range(RUNS):
+            total_ms, images_ms, used_atlas = cold_start(files)
+            assert used_atlas == (not files)
+            totals.append(total_ms)
+            images.append(images_ms)
+        results[label] = statistics.median(images)
+        print('%-6s %14.1f %14.1f' % (label, statistics.median(totals), results[label]))
+    print('image loading %.2fx faster with the atlas (medians of %d runs)' % (results['files'] / results['atlas'], RUNS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# Frame hitches while crossing a streamed level of over a million tiles:
+# the player is carried along the floor of a synthetic map, much faster
+# than it can run, and every Simulation.tick is timed, with the regions
+# read ahead by the worker thread and read only when needed. Also shows how
+# much of the map is in memory at most, against loading all of it at once.
+# First checks that an enemy straying onto a region still coming in doesn't
+# stand in for the enemies that region spawns.
+# run from the repo root: python -m benchmarks.streaming
+import os
+import resource
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+
+from scripts import mapformat, streaming
+from scripts.simulation import Simulation, headless_assets, silent_sfx
+from scripts.tilemap import Tilemap
+
+WIDTH = 12000  # tiles
+FLOOR_Y = 40
+DEPTH = 96  # rows of ground under the floor
+SPEED = 16  # pixels the player is carried per tick
+TS = 16
+
+
+def huge_map(seed=0):
+    # ground with platforms above it, trees and decor on it and an enemy every 40 tiles, as mapformat arrays
+    rng = np.random.default_rng(seed)
+    names = ['grass', 'stone', 'decor', 'large_decor', 'spawners']
+    ground_x, ground_y = (a.ravel() for a in np.meshgrid(np.arange(WIDTH), np.arange(FLOOR_Y, FLOOR_Y + DEPTH)))
+    starts = np.arange(8, WIDTH - 16, 12)
+    lengths = rng.integers(3, 8, len(starts))
+    platform_x = np.concatenate([np.arange(start, start + length) for start, length in zip(starts.tolist(), lengths.tolist())])
+    platform_y = np.repeat(rng.integers(FLOOR_Y - 12, FLOOR_Y - 3, len(starts)), lengths)
+    x = np.concatenate([ground_x, platform_x])
+    y = np.concatenate([ground_y, platform_y])
+    # grass on top, stone under it
+    types = np.concatenate([np.where(ground_y == FLOOR_Y, 0, 1), np.zeros(len(platform_x), np.int64)])
+    offgrid = [(4, 0, 48.0, FLOOR_Y * TS - 15.0)]
+    for tile_x in range(20, WIDTH - 20, 40):
+        offgrid.append((4, 1, tile_x * TS + 4.0, FLOOR_Y * TS - 15.0))
+    for tile_x in range(30, WIDTH - 30, 100):
+        offgrid.append((3, 2, tile_x * TS + 0.0, FLOOR_Y * TS - 48.0))
+    for tile_x in range(5, WIDTH - 5, 7):
+        offgrid.append((2, int(rng.integers(0, 4)), tile_x * TS + 0.0, FLOOR_Y * TS - 16.0))
+    return {'tile_size': TS, 'type_names': names, 'x': x, 'y': y, 'type': types,
+            'variant': np.zeros(len(x), np.int64), 'offgrid': offgrid}
+
+
+def stray_check(path):
+    # a floor four regions long, an enemy in the first region and two in the last;
+    # the first one walks onto the last region while its chunks are going in
+    region = streaming.REGION_CHUNKS * 16
+    width = region * 4
+    x = np.arange(width)
+    # type 1 is the spawners, variant 0 the player's
+    offgrid = [(1, 0, 48.0, FLOOR_Y * TS - 15.0), (1, 1, 20 * TS, FLOOR_Y * TS - 15.0)]
+    offgrid += [(1, 1, (3 * region + dx) * TS, FLOOR_Y * TS - 15.0) for dx in (10, 30)]
+    streaming.write(path, {'tile_size': TS, 'type_names': ['stone', 'spawners'], 'x': x, 'y': np.full(width, FLOOR_Y),
+                           'type': np.zeros(width, np.int64), 'variant': np.zeros(width, np.int64), 'offgrid': offgrid})
+    sim = Simulation(headless_assets(), silent_sfx(), seed=1, stream=path)
+    sim.reset(0)
+    streamer = sim.streamer
+    assert streamer.install((3, 0), 1) == 1 and (3, 0) in streamer.staged
+    stray = sim.enemies[0]
+    stray.pos[0] = (3 * region + 20) * TS
+    streamer.park_strays()
+    assert not sim.enemies and streamer.enemies_away == 3
+    streamer.install((3, 0))
+    streamer.close()
+    assert len(sim.enemies) == 3 and streamer.enemies_away == 0
+
+
+def traverse(path, prefetch):
+    sim = Simulation(headless_assets(), silent_sfx(), seed=1, stream=path)
+    sim.streamer.prefetch = prefetch
+    sim.reset(0)
+    sim.player.health = 10 ** 9
+    times = []
+    most = {'chunks': 0, 'regions': 0, 'enemies': 0}
+    x = sim.player.pos[0]
+    end = (WIDTH - 40) * TS
+    while x < end:
+        x += SPEED
+        sim.player.pos[:] = (x, FLOOR_Y * TS - 15)
+        sim.player.velocity[:] = (0, 0)
+        sim.player.air_time = 0  # carried, it never lands
+        start = time.perf_counter()
+        sim.tick(0)
+        times.append(time.perf_counter() - start)
+        most['chunks'] = max(most['chunks'], len(sim.tilemap.grid.chunks))
+        most['regions'] = max(most['regions'], len(sim.streamer.loaded))
+        most['enemies'] = max(most['enemies'], len(sim.enemies))
+    assert not sim.dead
+    stalls = sim.streamer.stalls
+    sim.streamer.close()
+    return np.array(times) * 1000, stalls, most
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        stray_check(os.path.join(tmp, 'strays'))
+    print('strays: the spawns of a region still come in')
+
+    data = huge_map()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'huge')
+        start = time.perf_counter()
+        streaming.write(path, data)
+        split = time.perf_counter() - start
+        regions = len(os.listdir(path)) - 1
+        print('%d tiles, %d enemies, in %d regions, split in %.1f s' % (
+            len(data['x']), sum(1 for tile in data['offgrid'] if tile[:2] == (4, 1)), regions, split))
+
+        print()
+        print('%-12s %8s %8s %8s %8s %8s %8s %8s' % ('reading', 'ticks', 'median', 'p99', 'worst', 'stalls', 'chunks', 'enemies'))
+        for name, prefetch in (('ahead', 3), ('when needed', 0)):
+            times, stalls, most = traverse(path, prefetch)
+            print('%-12s %8d %8.2f %8.2f %8.2f %8d %8d %8d' % (
+                name, len(times), np.median(times), np.percentile(times, 99), times.max(), stalls, most['chunks'], most['enemies']))
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print('times in ms; chunks and enemies: the most in the game at once')
+        print('peak RSS streaming %.0f MB' % rss)
+
+        map_path = os.path.join(tmp, 'huge.map')
+        mapformat.write(map_path, data)
+        del data
+        tilemap = Tilemap(None, chunk_cache=False)
+        start = time.perf_counter()
+        tilemap.load(map_path)
+        tilemap.collision.build()
+        whole = (time.perf_counter() - start) * 1000
+        print()
+        print('the whole map at once: %d chunks, %.0f ms to load and build its collision'
+              % (len(tilemap.grid.chunks), whole))
+        print('peak RSS %.0f MB' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+if __name__ == '__main__':
+    main()
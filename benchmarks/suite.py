@@ -0,0 +1,287 @@
+# Headless benchmark suite: runs Game.step() for a fixed number of frames in
+# a set of seeded scenarios (the shipped levels and synthetic stress maps)
+# and reports frames/sec and per-stage times from the profiler. Nothing is
+# drawn to a window and the frame cap is never applied.
+#
+# run from the repo root:
+#   python -m benchmarks.suite                           # every scenario
+#   python -m benchmarks.suite --only enemies-100 dash   # some of them
+#   python -m benchmarks.suite --save before.json        # keep the results
+#   python -m benchmarks.suite --compare before.json     # and check against them
+#
+# --compare exits with status 1 when a scenario got slower than --threshold.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from game import Game
+from scripts.cloud import Clouds
+from scripts.enemy import Enemy
+
+FRAMES = 600
+SEED = 1
+STRESS_WIDTH = 160  # tiles
+FLOOR_Y = 12  # tile row of the stress maps' floor
+
+
+def stress_map(width=STRESS_WIDTH):
+    # a flat stone floor between two walls
+    tiles = {}
+
+    def put(x, y):
+        tiles['%d;%d' % (x, y)] = {'type': 'stone', 'variant': 0, 'pos': [x, y]}
+
+    for x in range(width):
+        put(x, FLOOR_Y)
+        put(x, FLOOR_Y + 1)
+    for y in range(FLOOR_Y - 8, FLOOR_Y):
+        put(0, y)
+        put(width - 1, y)
+    return {'tilemap': tiles, 'tile_size': 16, 'offgrid': []}
+
+
+def floor_pos(game, x):
+    # where an entity x pixels from the left stands on the stress floor
+    return (x, FLOOR_Y * game.tilemap.tile_size - 15)
+
+
+def load_stress(game, enemies=0):
+    # like Game.load_level, for the stress map, with enemies spread along the floor
+    game.tilemap.load_data(stress_map())
+    game.tilemap.autotile()
+    game.level = 0
+    game.leaf_spawners = []
+    game.player.pos[:] = floor_pos(game, 48)
+    game.player.velocity[:] = (0, 0)
+    game.player.air_time = 0
+    game.player.health = 3
+    game.clear_enemies()
+    span = (STRESS_WIDTH - 4) * game.tilemap.tile_size
+    for i in range(enemies):
+        game.add_enemy(Enemy(game, floor_pos(game, 32 + span * (i + 0.5) / enemies), (8, 15)))
+    game.projectiles.clear()
+    game.particles.clear()
+    game.sparks.clear()
+    game.scroll = [0, 0]
+    game.dead = 0
+    game.transition = 0
+    game.current_level_passed = False
+    game.update_background()
+
+
+def walk(game, frame):
+    # scripted input: walk right and back, jump and dash now and then
+    game.movement = [frame % 240 >= 120, frame % 240 < 120]
+    if frame % 45 == 0:
+        game.player.jump()
+    if frame % 100 == 50:
+        game.player.dash()
+
+
+def keep_alive(game):
+    # undoes the last frame's hits and kills, so the stress scenarios never
+    # die back to level 1 or move on to the next level
+    game.player.health = 3
+    game.dead = 0
+    game.current_level_passed = False
+    game.transition = 0
+
+
+class Scenario:
+    """
+    setup(game) puts the game into the scenario's starting state, then
+    every frame before(game, frame) runs ahead of game.step().
+    """
+    def __init__(self, name, setup, before=None):
+        self.name = name
+        self.setup = setup
+        self.before = before
+
+
+def level_scenario(map_id):
+    def setup(game):
+        game.level = map_id
+        game.load_level(map_id)
+        game.transition = 0
+    return Scenario('level-%d' % map_id, setup, walk)
+
+
+def enemies_scenario(count):
+    def setup(game):
+        load_stress(game, enemies=count)
+
+    def before(game, frame):
+        walk(game, frame)
+        keep_alive(game)
+    return Scenario('enemies-%d' % count, setup, before)
+
+
+def dash_scenario(count=8):
+    # the player dashes back and forth through a crowd that is topped up before every dash
+    def setup(game):
+        load_stress(game)
+        game.player.pos[:] = floor_pos(game, STRESS_WIDTH * game.tilemap.tile_size // 2)
+
+    def before(game, frame):
+        keep_alive(game)
+        game.movement = [False, False]
+        if not game.player.dashing:
+            game.player.flip = not game.player.flip
+            x = game.player.pos[0]
+            while len(game.enemies) < count:
+                offset = 12 + 8 * len(game.enemies)
+                game.add_enemy(Enemy(game, floor_pos(game, x + (-offset if game.player.flip else offset)), (8, 15)))
+            game.player.dash()
+    return Scenario('dash', setup, before)
+
+
+def projectile_scenario(per_frame=3):
+    # projectiles fired at the player from both sides, every frame
+    def setup(game):
+        load_stress(game)
+
+    def before(game, frame):
+        keep_alive(game)
+        game.movement = [False, False]
+        rect = game.player.rect()
+        for i in range(per_frame):
+            side = -1 if i % 2 else 1
+            y = rect.top + (i * 5) % rect.height
+            game.projectiles.spawn((rect.centerx + side * (60 + i * 20), y), -1.5 * side)
+    return Scenario('projectiles', setup, before)
+
+
+def scenarios(game):
+    return ([level_scenario(map_id) for map_id in range(game.level_count)]
+            + [enemies_scenario(count) for count in (10, 100, 400)]
+            + [dash_scenario(), projectile_scenario()])
+
+
+def start(game, scenario, seed):
+    random.seed(seed)
+    game.clouds = Clouds(game.assets['clouds'], count=16)
+    game.screenshake = 0
+    game.movement = [False, False]
+    scenario.setup(game)
+
+
+def play(game, scenario, frames, seed):
+    start(game, scenario, seed)
+    begin = time.perf_counter()
+    for frame in range(frames):
+        if scenario.before:
+            scenario.before(game, frame)
+        game.step()
+    elapsed = time.perf_counter() - begin
+    # what the scenario ended in; if it differs between runs, their times don't compare
+    state = [game.level, len(game.enemies), len(game.projectiles), [round(v, 3) for v in game.player.pos]]
+    return elapsed, state
+
+
+def measure(game, scenario, frames, seed, repeat):
+    # one profiled run for the stage times, then the fastest of `repeat` runs without the profiler
+    game.profiler.clear()
+    game.profiler.set_enabled(True)
+    _, state = play(game, scenario, frames, seed)
+    game.profiler.next_frame()
+    stages = game.profiler.percentiles()
+    game.profiler.set_enabled(False)
+    best = min(play(game, scenario, frames, seed)[0] for _ in range(repeat))
+    return {'fps': frames / best, 'ms': best / frames * 1000, 'stages': stages, 'state': state}
+
+
+def print_results(results):
+    print('%-14s %9s %9s %9s %9s' % ('scenario', 'fps', 'ms', 'p95 ms', 'p99 ms'))
+    for name, result in results.items():
+        frame = result['stages']['frame']
+        print('%-14s %9.1f %9.3f %9.3f %9.3f' % (name, result['fps'], result['ms'], frame[1], frame[2]))
+
+
+def print_stages(results):
+    names = []
+    for result in results.values():
+        names += [name for name in result['stages'] if name not in names and name != 'frame']
+    print()
+    print('p50 ms per stage')
+    print('%-12s' % 'stage' + ''.join(' %11s' % name for name in results))
+    for stage in names:
+        print('%-12s' % stage + ''.join(' %11.3f' % result['stages'].get(stage, [0])[0] for result in results.values()))
+
+
+def compare(results, baseline, threshold):
+    # prints the change against baseline, returns the scenarios that got slower than threshold %
+    print()
+    print('against %s (%s)' % (baseline['name'], baseline['date']))
+    print('%-14s %9s %9s %8s' % ('scenario', 'base fps', 'fps', 'change'))
+    slower = []
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if old is None:
+            print('%-14s %9s %9.1f %8s' % (name, '-', result['fps'], 'new'))
+            continue
+        change = (result['fps'] - old['fps']) / old['fps'] * 100
+        note = ''
+        if old['state'] != result['state']:
+            note = '  (ended in a different state, not comparable)'
+        elif change < -threshold:
+            note = '  slower'
+            slower.append(name)
+        print('%-14s %9.1f %9.1f %+7.1f%%%s' % (name, old['fps'], result['fps'], change, note))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description='headless game loop benchmarks')
+    parser.add_argument('--frames', type=int, default=FRAMES)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per scenario, the fastest counts')
+    parser.add_argument('--only', nargs='+', metavar='SCENARIO')
+    parser.add_argument('--list', action='store_true', help='list the scenarios and exit')
+    parser.add_argument('--save', metavar='PATH', help='write the results to PATH as a baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a baseline written by --save')
+    parser.add_argument('--threshold', type=float, default=10.0, help='%% of fps lost that counts as slower')
+    parser.add_argument('--batched-physics', action='store_true', help='run the game with the batched physics')
+    args = parser.parse_args(argv)
+
+    game = Game(show_start_screen=False, batched_physics=args.batched_physics)
+    chosen = scenarios(game)
+    if args.list:
+        for scenario in chosen:
+            print(scenario.name)
+        return 0
+    if args.only:
+        unknown = set(args.only) - {scenario.name for scenario in chosen}
+        if unknown:
+            parser.error('unknown scenario: %s' % ', '.join(sorted(unknown)))
+        chosen = [scenario for scenario in chosen if scenario.name in args.only]
+
+    results = {}
+    for scenario in chosen:
+        results[scenario.name] = measure(game, scenario, args.frames, args.seed, args.repeat)
+    print_results(results)
+    print_stages(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'name': os.path.basename(args.save), 'date': time.strftime('%Y-%m-%d %H:%M'),
+                       'frames': args.frames, 'seed': args.seed, 'results': results}, f, indent=1)
+        print()
+        print('saved to %s' % args.save)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if (baseline['frames'], baseline['seed']) != (args.frames, args.seed):
+            print('note: the baseline ran %d frames with seed %d' % (baseline['frames'], baseline['seed']))
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
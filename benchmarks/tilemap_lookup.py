@@ -0,0 +1,87 @@
+# Compare tile lookup throughput of the chunked TileGrid against the old
+# dict-of-"x;y"-strings storage.
+# run from the repo root: python -m benchmarks.tilemap_lookup
+import json
+import random
+import time
+
+import pygame
+
+from scripts.tilemap import Tilemap, NEIGHBOR_OFFSETS, PHYSICS_TILES
+
+MAPS = ['data/maps/0.json', 'data/maps/1.json', 'data/maps/2.json']
+QUERIES = 200000
+
+
+class LegacyTilemap:
+    # the string keyed lookups exactly as they used to be in scripts/tilemap.py
+    def __init__(self, path, tile_size=16):
+        with open(path) as f:
+            self.tilemap = json.load(f)['tilemap']
+        self.tile_size = tile_size
+
+    def solid_check(self, pos):
+        tile_loc = str(int(pos[0] // self.tile_size)) + ';' + str(int(pos[1] // self.tile_size))
+        if tile_loc in self.tilemap:
+            if self.tilemap[tile_loc]['type'] in PHYSICS_TILES:
+                return self.tilemap[tile_loc]
+
+    def tiles_around(self, pos):
+        tiles = []
+        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        for offset in NEIGHBOR_OFFSETS:
+            check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
+            if check_loc in self.tilemap:
+                tiles.append(self.tilemap[check_loc])
+        return tiles
+
+    def physics_rects_around(self, pos):
+        rects = []
+        for tile in self.tiles_around(pos):
+            if tile['type'] in PHYSICS_TILES:
+                rects.append(pygame.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size,
+                                         self.tile_size, self.tile_size))
+        return rects
+
+
+def query_points(tilemap, count, seed=0):
+    xs = [x for x, y, _, _ in tilemap.grid]
+    ys = [y for x, y, _, _ in tilemap.grid]
+    ts = tilemap.tile_size
+    rng = random.Random(seed)
+    return [(rng.uniform(min(xs) - 2, max(xs) + 2) * ts, rng.uniform(min(ys) - 2, max(ys) + 2) * ts)
+            for _ in range(count)]
+
+
+def timed(func, points, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for pos in points:
+            func(pos)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print('%-18s %-22s %12s %12s %8s' % ('map', 'query', 'old (q/s)', 'new (q/s)', 'speedup'))
+    for path in MAPS:
+        legacy = LegacyTilemap(path)
+        tilemap = Tilemap(None)
+        tilemap.load(path)
+        points = query_points(tilemap, QUERIES)
+
+        # both implementations must agree before their speed means anything
+        for pos in points[:2000]:
+            assert bool(legacy.solid_check(pos)) == bool(tilemap.solid_check(pos))
+            assert legacy.physics_rects_around(pos) == list(tilemap.physics_rects_around(pos))
+
+        for name in ['solid_check', 'physics_rects_around']:
+            old = timed(getattr(legacy, name), points)
+            new = timed(getattr(tilemap, name), points)
+            print('%-18s %-22s %12.0f %12.0f %7.2fx' % (path, name, QUERIES / old, QUERIES / new, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Compare Tilemap.render with and without the chunk surface cache: tile blits
+# and time per frame while the camera pans over each shipped map.
+# run from the repo root: python -m benchmarks.tilemap_render
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from scripts.utils import load_images
+from scripts.tilemap import Tilemap
+
+MAPS = ['data/maps/0.json', 'data/maps/1.json', 'data/maps/2.json']
+FRAMES = 600
+
+
+class AssetHolder:
+    def __init__(self):
+        self.assets = {
+            'decor': load_images('tiles/decor'),
+            'grass': load_images('tiles/grass'),
+            'stone': load_images('tiles/stone'),
+            'large_decor': load_images('tiles/large_decor'),
+            'spawners': load_images('tiles/spawners'),
+        }
+
+
+def camera_path(tilemap, frames):
+    xs = [x for x, y, _, _ in tilemap.grid]
+    ys = [y for x, y, _, _ in tilemap.grid]
+    ts = tilemap.tile_size
+    x0, x1 = min(xs) * ts - 160, max(xs) * ts - 160
+    y0, y1 = min(ys) * ts - 120, max(ys) * ts - 120
+    for i in range(frames):
+        t = i / (frames - 1)
+        yield int(x0 + (x1 - x0) * t), int(y0 + (y1 - y0) * (0.5 - abs(t - 0.5)) * 2)
+
+
+def run(tilemap, display, frames):
+    blits = 0
+    start = time.perf_counter()
+    for offset in camera_path(tilemap, frames):
+        display.fill((0, 0, 0, 0))
+        tilemap.render(display, offset=offset)
+        if tilemap.chunk_cache:
+            blits += tilemap.chunk_cache.blits + (0 if tilemap.chunk_cache.include_offgrid else len(tilemap.offgrid_tiles))
+        else:
+            ts = tilemap.tile_size
+            blits += len(tilemap.offgrid_tiles) + sum(1 for _ in tilemap.grid.tiles_in_rect(
+                offset[0] // ts, offset[1] // ts, (offset[0] + display.get_width()) // ts, (offset[1] + display.get_height()) // ts))
+    return (time.perf_counter() - start) / frames * 1000, blits / frames
+
+
+def main():
+    pygame.init()
+    pygame.display.set_mode((320, 240))
+    display = pygame.Surface((320, 240), pygame.SRCALPHA)
+    holder = AssetHolder()
+    print('%-18s %10s %10s %10s %10s' % ('map', 'old ms', 'old blits', 'new ms', 'new blits'))
+    for path in MAPS:
+        old_map = Tilemap(holder, chunk_cache=False)
+        new_map = Tilemap(holder)
+        old_map.load(path)
+        new_map.load(path)
+
+        # the cached render has to produce the same picture. offgrid decor sits at
+        # float positions, which blit truncates, so decor hanging off the top/left
+        # edge may land a pixel apart
+        reference = display.copy()
+        for offset in list(camera_path(old_map, 8)):
+            reference.fill((0, 0, 0, 0))
+            display.fill((0, 0, 0, 0))
+            old_map.render(reference, offset=offset)
+            new_map.render(display, offset=offset)
+            diff = (pygame.surfarray.array3d(reference) != pygame.surfarray.array3d(display)).any(axis=2)
+            assert diff.sum() < display.get_width() * display.get_height() // 100, offset
+
+        old_ms, old_blits = run(old_map, display, FRAMES)
+        new_ms, new_blits = run(new_map, display, FRAMES)
+        print('%-18s %10.3f %10.1f %10.3f %10.1f' % (path, old_ms, old_blits, new_ms, new_blits))
+
+
+if __name__ == '__main__':
+    main()
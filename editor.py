@@ -1,7 +1,7 @@
 import sys
 import pygame
 
-from scripts.utils import load_images
+from scripts.utils import load_images, use_atlas
 from scripts.tilemap import Tilemap
 
 # how much we're multiplying the size of each pixel
@@ -22,6 +22,7 @@ class Editor:
         # individually and we don't want out CPU to be overloaded
         self.clock = pygame.time.Clock()
 
+        use_atlas()
         self.assets = {
             'decor': load_images('tiles/decor'),
             'grass': load_images('tiles/grass'),
@@ -50,6 +51,8 @@ class Editor:
         self.shift = False
 
         self.ongrid = True
+        # autotile the cells around every placed or removed tile as you go (toggle with L)
+        self.live_autotile = True
 
     def run(self):
         while True:
@@ -88,23 +91,16 @@ class Editor:
 
             # left click to create tile
             if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ';'+str(tile_pos[1])] = {
-                    'type': self.tile_list[self.tile_group],
-                    'variant': self.tile_variant,
-                    'pos': tile_pos
-                }
+                self.tilemap.set_tile(tile_pos, self.tile_list[self.tile_group], self.tile_variant)
 
             # right click to delete tiles
             if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
-                for tile in self.tilemap.offgrid_tiles.copy():
-                    tile_img = self.assets[tile['type']][tile['variant']]
-                    # hitbox
-                    tile_r = pygame.Rect(tile['pos'][0] - self.scroll[0], tile['pos'][1] - self.scroll[1], tile_img.get_width(), tile_img.get_height())
-                    if tile_r.collidepoint(mpos):
-                        self.tilemap.offgrid_tiles.remove(tile)
+                self.tilemap.remove_tile(tile_pos)
+                # offgrid tiles under the mouse, from the spatial index
+                for tile in self.tilemap.offgrid_tiles.query_point((mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])):
+                    self.tilemap.remove_offgrid(tile)
+            if self.live_autotile:
+                self.tilemap.autotiler.update()
             self.display.blit(current_tile_img, (5, 5))
 
             # blit essentially copy the memory to the position
@@ -117,7 +113,7 @@ class Editor:
                     if event.button == 1:  # left click
                         self.clicking = True
                         if not self.ongrid:
-                            self.tilemap.offgrid_tiles.append(
+                            self.tilemap.add_offgrid(
                                 {'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': (mpos[0] + render_scroll[0], mpos[1] + self.scroll[1])})
                     if event.button == 3:  # right click
                         self.right_clicking = True
@@ -156,6 +152,8 @@ class Editor:
                         self.ongrid = not self.ongrid
                     if event.key == pygame.K_t:
                         self.tilemap.autotile()
+                    if event.key == pygame.K_l:
+                        self.live_autotile = not self.live_autotile
                     if event.key == pygame.K_o:
                         self.tilemap.save('map.json')
                     if event.key == pygame.K_LSHIFT:
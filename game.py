@@ -1,19 +1,22 @@
+import argparse
 import os
+import random
 import sys
+import time
 import pygame
-import random
-import math
 
-from scripts.entity import PhysicsEntity
-from scripts.player import Player
-from scripts.enemy import Enemy
 from scripts.utils import load_image, load_images, Animation
-from scripts.tilemap import Tilemap
-from scripts.cloud import Clouds
-from scripts.particle import Particle
-from scripts.spark import Spark
+from scripts.outline import Outline
+from scripts.loader import AssetLoader
+from scripts.profiler import Profiler, ProfilerOverlay
+from scripts.timestep import FixedTimestep
+from scripts.replay import Recorder, Replay, ReplayDivergence, LEFT, RIGHT, JUMP, DASH
+from scripts.simulation import Simulation, ANIMATIONS, VIEW_SIZE, level_path
+
+SFX_VOLUMES = {'jump': 0.7, 'dash': 0.3, 'hit': 0.8, 'shoot': 0.4, 'ambience': 0.2}
+
 
-def start_screen(screen):
+def start_screen(screen, loader=None):
     screen.fill((0, 0, 0))
     font = pygame.font.Font(None, 74)
     small_font = pygame.font.Font(None, 36)
@@ -38,19 +41,52 @@ def start_screen(screen):
         screen.blit(title_text, title_rect)
         screen.blit(start_text, start_rect)
         screen.blit(close_text, close_rect)
+        if loader is not None:
+            # finish a few loaded assets a frame and show how far along it is
+            loader.pump()
+            bar = pygame.Rect(0, 0, 200, 4)
+            bar.center = (screen.get_width() // 2, screen.get_height() // 2 + 100)
+            pygame.draw.rect(screen, (60, 60, 60), bar)
+            pygame.draw.rect(screen, (255, 255, 255), (bar.x, bar.y, int(bar.w * loader.progress), bar.h))
         pygame.display.flip()
 
-class Game:
-    def __init__(self):
+class Game(Simulation):
+    def __init__(self, show_start_screen=True, profile=False, seed=None, max_fps=60, vsync=False, batched_physics=False, stream=None):
         pygame.init()
         pygame.display.set_caption('Blade of Shadows')
-        self.screen = pygame.display.set_mode((800, 600))
-        start_screen(self.screen)
-        self.display = pygame.Surface((320, 240), pygame.SRCALPHA)
-        self.display_2 = pygame.Surface((320, 240))
+        self.screen = None
+        if vsync:
+            try:
+                # SDL only syncs to the display for SCALED or OPENGL windows
+                self.screen = pygame.display.set_mode((800, 600), pygame.SCALED, vsync=1)
+            except pygame.error:
+                pass
+        if self.screen is None:
+            self.screen = pygame.display.set_mode((800, 600))
+        # images, the first level and the sounds load while the start screen is up
+        self.loader = AssetLoader()
+        self.loader.add_images()
+        self.loader.add('json', level_path(0))
+        for name in SFX_VOLUMES:
+            self.loader.add('sound', 'data/sfx/' + name + '.wav')
+        self.loader.start()
+        if show_start_screen:
+            start_screen(self.screen, self.loader)
+        self.display = pygame.Surface(VIEW_SIZE, pygame.SRCALPHA)
+        self.display_2 = pygame.Surface(VIEW_SIZE)
+        # 'buffered' or the old full-surface 'mask' pass
+        self.outline = Outline(self.display.get_size(), mode='buffered')
         self.clock = pygame.time.Clock()
-        self.movement = [False, False]
-        self.assets = {
+        # the game advances in fixed ticks, rendering runs at max_fps (0 for uncapped)
+        self.timestep = FixedTimestep()
+        self.max_fps = max_fps
+        self.pacing_report = False  # print timestep.report() on quit
+        # stage timings of the last frames, F3 shows them and F4 writes them out
+        self.profiler = Profiler(enabled=profile)
+        self.profiler_overlay = None
+        # the loader has set the atlas up, or put every image in the load_image cache
+        self.loader.wait('image')
+        assets = {
             'decor': load_images('tiles/decor'),
             'grass': load_images('tiles/grass'),
             'stone': load_images('tiles/stone'),
@@ -60,59 +96,41 @@ class Game:
             'background_evening': load_image('background_evening.png'),  # Load evening background
             'background_night': load_image('background_night.png'),  # Load night background
             'clouds': load_images('clouds'),
-            'enemy/idle': Animation(load_images('entities/enemy/idle'), img_dur=6),
-            'enemy/run': Animation(load_images('entities/enemy/run'), img_dur=4),
-            'player/idle': Animation(load_images('entities/player/idle'), img_dur=6),
-            'player/run': Animation(load_images('entities/player/run'), img_dur=4),
-            'player/jump': Animation(load_images('entities/player/jump')),
-            'player/slide': Animation(load_images('entities/player/slide')),
-            'player/wall_slide': Animation(load_images('entities/player/wall_slide')),
-            'particle/leaf': Animation(load_images('particles/leaf'), img_dur=20, loop=False),
-            'particle/particle': Animation(load_images('particles/particle'), img_dur=6, loop=False),
             'gun': load_image('gun.png'),
             'projectile': load_image('projectile.png')
         }
-        self.sfx = {
-            'jump': pygame.mixer.Sound('data/sfx/jump.wav'),
-            'dash': pygame.mixer.Sound('data/sfx/dash.wav'),
-            'hit': pygame.mixer.Sound('data/sfx/hit.wav'),
-            'shoot': pygame.mixer.Sound('data/sfx/shoot.wav'),
-            'ambience': pygame.mixer.Sound('data/sfx/ambience.wav'),
-        }
-        self.sfx['ambience'].set_volume(0.2)
-        self.sfx['shoot'].set_volume(0.4)
-        self.sfx['hit'].set_volume(0.8)
-        self.sfx['dash'].set_volume(0.3)
-        self.sfx['jump'].set_volume(0.7)
-        self.clouds = Clouds(self.assets['clouds'], count=16)
-        self.player = Player(self, (50, 50), (8, 15))
-        self.tilemap = Tilemap(self, tile_size=16)
-        self.level = 0
-        self.load_level(self.level)
-        self.screenshake = 0
-        self.current_level_passed = False
+        for name, (path, kwargs) in ANIMATIONS.items():
+            assets[name] = Animation(load_images(path), **kwargs)
+        assets['gun/flipped'] = pygame.transform.flip(assets['gun'], True, False)
+        sfx = {}
+        for name, volume in SFX_VOLUMES.items():
+            sfx[name] = self.loader.get('sound', 'data/sfx/' + name + '.wav')
+            sfx[name].set_volume(volume)
+        super().__init__(assets, sfx, seed=seed, chunk_cache=True, batched_physics=batched_physics, stream=stream)
         # Load health bar image and scale it down
-        self.health_image = pygame.transform.scale(load_image('entities/player.png'), (10, 10))
-
-    def load_level(self, map_id):
-        self.tilemap.load('data/maps/' + str(map_id) + '.json')
-        self.leaf_spawners = []
-        self.enemies = []
-        for tree in self.tilemap.extract([('large_decor', 2)], keep=True):
-            self.leaf_spawners.append(pygame.Rect(4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13))
-        for spawner in self.tilemap.extract([('spawners', 0), ('spawners', 1)]):
-            if spawner['variant'] == 0:
-                self.player.pos = spawner['pos']
-                self.player.air_time = 0
-            else:
-                self.enemies.append(Enemy(self, spawner['pos'], (8, 15)))
-        self.projectiles = []
-        self.particles = []
-        self.sparks = []
-        self.scroll = [0, 0]
-        self.dead = 0
-        self.transition = -30
+        self.health_image = pygame.transform.scale(self.assets['player'], (10, 10))
+        # buffers drawn into every frame, so a frame allocates no surfaces
+        self.hud_font = pygame.font.Font(None, 24)
+        self.hud = pygame.Surface((self.display.get_width(), 20))
+        self.hud_state = None  # (level, health) the hud shows
+        self.transition_surf = pygame.Surface(self.display.get_size())
+        self.transition_surf.set_colorkey((255, 255, 255))
+        self.scaled = self.screen.copy()
+
+    def read_level(self, map_id):
+        # the first level was read ahead by the loader, the others are read here
+        return self.loader.take('json', level_path(map_id))
+
+    def render_hud(self):
+        # black bar at the top with the level and the health, redrawn when either changes
+        self.hud_state = (self.level, self.player.health)
+        self.hud.fill((0, 0, 0))
+        level_text = self.hud_font.render(f"Level: {self.level + 1}", True, (255, 255, 255))
+        self.hud.blit(level_text, (10, 2))
+        for i in range(self.player.health):
+            self.hud.blit(self.health_image, (self.hud.get_width() - (i + 1) * 12 - 10, 2))
 
+    def update_background(self):
         # Set background based on the level
         if self.level == 0:
             self.background = self.assets['background_day']
@@ -126,121 +144,178 @@ class Game:
         pygame.mixer.music.set_volume(0.5)
         pygame.mixer.music.play(-1)
         self.sfx['ambience'].play(-1)
+        self.timestep.reset_stats()
         while True:
+            self.frame()
+
+    def frame(self):
+        # one rendered frame: the ticks due since the last frame, then the picture
+        # in between the last two ticks, presented and capped to max_fps if set
+        self.profiler.next_frame()
+        for _ in range(self.timestep.advance()):
+            self.tick()
+        self.render(self.timestep.alpha)
+        with self.profiler.stage('present'):
+            pygame.display.update()
+        if self.max_fps:
+            with self.profiler.stage('wait'):
+                self.clock.tick(self.max_fps)
+
+    def step(self):
+        # one tick and its picture, what a frame was before the fixed timestep
+        self.profiler.next_frame()
+        self.tick()
+        self.render()
+
+    def render(self, alpha=1.0):
+        # draws the game alpha of the way from the previous tick to the last one
+        profiler = self.profiler
+        scroll = self.scroll
+        if alpha != 1.0:
+            scroll = [prev + (now - prev) * alpha for prev, now in zip(self.prev_scroll, self.scroll)]
+        render_scroll = (int(scroll[0]), int(scroll[1]))
+        with profiler.stage('draw_background'):
             self.display.fill((0, 0, 0, 0))
             self.display_2.blit(self.background, (0, 0))  # Use the current background
-            self.screenshake = max(0, self.screenshake - 1)
-            if self.current_level_passed:
-                self.transition += 1
-                if self.transition > 30:
-                    self.level = min(self.level + 1, len(os.listdir('data/maps')) - 1)
-                    self.load_level(self.level)
-                    self.current_level_passed = False
-            if self.transition < 0:
-                self.transition += 1
-            if self.dead:
-                self.dead += 1
-                if self.dead >= 10:
-                    self.transition = min(30, self.transition + 1)
-                if self.dead > 40:
-                    self.level = 0
-                    self.load_level(self.level)
-                    self.player.health = 3
-            self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 30
-            self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 30
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-            for rect in self.leaf_spawners:
-                if random.random() * 49999 < rect.width * rect.height:
-                    pos = (rect.x + random.random() * rect.width, rect.y + random.random() * rect.height)
-                    self.particles.append(Particle(self, 'leaf', pos, velocity=[-0.1, 0.3], frame=random.randint(0, 20)))
-            self.clouds.update()
             self.clouds.render(self.display_2, offset=render_scroll)
+        with profiler.stage('draw_tilemap'):
             self.tilemap.render(self.display, offset=render_scroll)
-            for enemy in self.enemies.copy():
-                kill = enemy.update(self.tilemap, (0, 0))
-                enemy.render(self.display, offset=render_scroll)
-                if kill:
-                    self.enemies.remove(enemy)
-                    if not len(self.enemies):
-                        self.current_level_passed = True
-            if not self.dead:
-                self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
-                self.player.render(self.display, offset=render_scroll)
-            for projectile in self.projectiles.copy():
-                projectile[0][0] += projectile[1]
-                projectile[2] += 1
-                img = self.assets['projectile']
-                self.display.blit(img, (projectile[0][0] - img.get_width() / 2 - render_scroll[0], projectile[0][1] - img.get_height() / 2 - render_scroll[1]))
-                if self.tilemap.solid_check(projectile[0]):
-                    self.projectiles.remove(projectile)
-                    for i in range(4):
-                        self.sparks.append(Spark(projectile[0], random.random() - 0.5 + (math.pi if projectile[1] > 0 else 0), 2 + random.random()))
-                elif projectile[2] > 360:
-                    self.projectiles.remove(projectile)
-                elif abs(self.player.dashing) < 50:
-                    if self.player.rect().collidepoint(projectile[0]):
-                        self.projectiles.remove(projectile)
-                        self.player.take_damage()
-                        self.sfx['hit'].play()
-                        self.screenshake = max(16, self.screenshake)
-                        for i in range(30):
-                            angle = random.random() * math.pi * 2
-                            speed = random.random() * 5
-                            self.sparks.append(Spark(self.player.rect().center, angle, 2 + random.random()))
-                            self.particles.append(Particle(self, 'particle', self.player.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-            for spark in self.sparks.copy():
-                kill = spark.update()
-                spark.render(self.display, offset=render_scroll)
-                if kill:
-                    self.sparks.remove(spark)
-            display_mask = pygame.mask.from_surface(self.display)
-            display_sillhouette = display_mask.to_surface(setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0))
-            for offset in [(-1, 0), (1, 0), (0, 1), (0, 1)]:
-                self.display_2.blit(display_sillhouette, offset)
-            for particle in self.particles.copy():
-                kill = particle.update()
-                particle.render(self.display, offset=render_scroll)
-                if particle.type == 'leaf':
-                    particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
-                if kill:
-                    self.particles.remove(particle)
-            # Render black bar at the top
-            pygame.draw.rect(self.display, (0, 0, 0), (0, 0, self.display.get_width(), 20))
-            # Render level
-            font = pygame.font.Font(None, 24)
-            level_text = font.render(f"Level: {self.level + 1}", True, (255, 255, 255))
-            self.display.blit(level_text, (10, 2))
-            # Render health bar
-            for i in range(self.player.health):
-                self.display.blit(self.health_image, (self.display.get_width() - (i + 1) * 12 - 10, 2))
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                        self.movement[0] = True
-                    if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                        self.movement[1] = True
-                    if event.key == pygame.K_UP or event.key == pygame.K_k:
-                        if self.player.jump():
-                            self.sfx['jump'].play()
-                    if event.key == pygame.K_j:
-                        self.player.dash()
-                if event.type == pygame.KEYUP:
-                    if event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                        self.movement[0] = False
-                    if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                        self.movement[1] = False
+        with profiler.stage('draw_entities'):
+            for enemy in self.visible_enemies:
+                enemy.render(self.display, offset=render_scroll, alpha=alpha)
+            if self.player_visible:
+                self.player.render(self.display, offset=render_scroll, alpha=alpha)
+            self.projectiles.render(self.display, offset=render_scroll, alpha=alpha)
+            self.sparks.render(self.display, offset=render_scroll, alpha=alpha)
+        with profiler.stage('draw_outline'):
+            self.outline.render(self.display, self.display_2)
+        with profiler.stage('draw_particles'):
+            self.particles.render(self.display, offset=render_scroll, alpha=alpha)
+        with profiler.stage('draw_hud'):
+            if self.hud_state != (self.level, self.player.health):
+                self.render_hud()
+            self.display.blit(self.hud, (0, 0))
+        with profiler.stage('draw_transition'):
             if self.transition:
-                transition_surf = pygame.Surface(self.display.get_size())
-                pygame.draw.circle(transition_surf, (255, 255, 255), (self.display.get_width() // 2, self.display.get_height() // 2), (30 - abs(self.transition)) * 8)
-                transition_surf.set_colorkey((255, 255, 255))
-                self.display.blit(transition_surf, (0, 0))
+                self.transition_surf.fill((0, 0, 0))
+                pygame.draw.circle(self.transition_surf, (255, 255, 255), (self.display.get_width() // 2, self.display.get_height() // 2), (30 - abs(self.transition)) * 8)
+                self.display.blit(self.transition_surf, (0, 0))
             self.display_2.blit(self.display, (0, 0))
-            screenshake_offset = (random.random() * self.screenshake - self.screenshake / 2, random.random() * self.screenshake - self.screenshake / 2)
-            self.screen.blit(pygame.transform.scale(self.display_2, self.screen.get_size()), screenshake_offset)
-            pygame.display.update()
-            self.clock.tick(60)
+        with profiler.stage('scale'):
+            if self.screenshake:
+                pygame.transform.scale(self.display_2, self.screen.get_size(), self.scaled)
+                self.screen.blit(self.scaled, self.shake_offset)
+            else:
+                # nothing to offset, scale straight onto the screen
+                pygame.transform.scale(self.display_2, self.screen.get_size(), self.screen)
+        if self.profiler_overlay is not None:
+            with profiler.stage('overlay'):
+                self.profiler_overlay.render(self.screen)
+
+    def read_input(self):
+        # this frame's actions (bits of scripts.replay) from the keyboard, or from the recording being replayed
+        actions = (LEFT if self.movement[0] else 0) | (RIGHT if self.movement[1] else 0)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.quit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_LEFT or event.key == pygame.K_a:
+                    actions |= LEFT
+                if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
+                    actions |= RIGHT
+                if event.key == pygame.K_UP or event.key == pygame.K_k:
+                    actions |= JUMP
+                if event.key == pygame.K_j:
+                    actions |= DASH
+                if event.key == pygame.K_F3:
+                    self.toggle_profiler()
+                if event.key == pygame.K_F4:
+                    self.export_profile()
+            if event.type == pygame.KEYUP:
+                if event.key == pygame.K_LEFT or event.key == pygame.K_a:
+                    actions &= ~LEFT
+                if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
+                    actions &= ~RIGHT
+        if self.replay is not None:
+            actions = self.replay.next_actions()
+        return actions
+
+    def quit(self):
+        if self.recorder is not None:
+            self.recorder.save()
+        if self.pacing_report:
+            print(self.timestep.report())
+        pygame.quit()
+        sys.exit()
+
+    def run_replay(self, render=True):
+        # plays self.replay to the end: in the window at 60 fps, or without
+        # presenting anything and as fast as it goes
+        while not self.replay.done:
+            self.step()
+            if render:
+                pygame.display.update()
+                self.clock.tick(60)
+
+    def toggle_profiler(self):
+        # F3: stage timings on screen, recorded only while they are shown
+        if self.profiler_overlay is None:
+            self.profiler.clear()
+            self.profiler.set_enabled(True)
+            self.profiler_overlay = ProfilerOverlay(self.profiler)
+        else:
+            self.profiler.set_enabled(False)
+            self.profiler_overlay = None
+
+    def export_profile(self, trace_path='profile_trace.json', csv_path='profile.csv'):
+        # F4: the frames recorded so far, for chrome://tracing and as a table
+        self.profiler.export_chrome(trace_path)
+        self.profiler.export_csv(csv_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python game.py')
+    parser.add_argument('--record', metavar='PATH', help='record the input of this session to PATH')
+    parser.add_argument('--replay', metavar='PATH', help='play back a recording')
+    parser.add_argument('--headless', action='store_true', help='replay without a window and without the frame cap')
+    parser.add_argument('--seed', type=int, help='seed of the RNG, random when recording without one')
+    parser.add_argument('--fps', type=int, help='render frame cap, 0 for uncapped (default 60, or 0 with --vsync)')
+    parser.add_argument('--vsync', action='store_true', help='sync rendering to the display')
+    parser.add_argument('--pacing', action='store_true', help='print a frame pacing report on exit')
+    parser.add_argument('--batched-physics', action='store_true', help='move the player and the enemies with the batched physics')
+    parser.add_argument('--stream', metavar='DIR', help='play the streamed level in DIR (see scripts/streaming.py)')
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        if args.headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
+        replay = Replay.load(args.replay)
+        game = Game(show_start_screen=False, seed=replay.seed, batched_physics=args.batched_physics, stream=args.stream)
+        game.replay = replay
+        start = time.perf_counter()
+        try:
+            game.run_replay(render=not args.headless)
+        except ReplayDivergence as e:
+            print(e)
+            return 1
+        elapsed = time.perf_counter() - start
+        print('replayed %d frames in %.2f s (%.0f fps), no divergence' % (len(replay), elapsed, len(replay) / elapsed))
+        return 0
+
+    seed = args.seed
+    if args.record and seed is None:
+        seed = random.randrange(2 ** 32)
+    max_fps = args.fps
+    if max_fps is None:
+        max_fps = 0 if args.vsync else 60
+    game = Game(seed=seed, max_fps=max_fps, vsync=args.vsync,
+                batched_physics=args.batched_physics, stream=args.stream)
+    game.pacing_report = args.pacing
+    if args.record:
+        game.recorder = Recorder(args.record, seed)
+    game.run()
+
 
-Game().run()
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import sys
+from collections import Counter
+
+import pygame
+
+# pygame.transform functions that return a new surface unless given a dest_surface
+TRANSFORMS = ['flip', 'scale', 'scale_by', 'smoothscale', 'smoothscale_by', 'rotate', 'rotozoom', 'scale2x']
+# methods of pygame objects that hand back a new surface
+SURFACE_METHODS = {
+    pygame.Surface: {'copy', 'convert', 'convert_alpha', 'subsurface'},
+    pygame.font.Font: {'render'},
+    pygame.mask.Mask: {'to_surface'},
+}
+
+
+class SurfaceAllocCounter:
+    """
+    Counts the surfaces created while it is active, by kind
+    ('Surface', 'transform.flip', 'Font.render', ...).
+
+        counter = SurfaceAllocCounter()
+        with counter:
+            game.step()
+        print(counter.counts)
+
+    Constructors and pygame.transform are wrapped at module level, methods
+    are seen through sys.setprofile. It slows everything down a lot, it is
+    only meant for checking that a frame doesn't allocate.
+    """
+    def __init__(self):
+        self.counts = Counter()
+        self.saved = {}
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def reset(self):
+        self.counts.clear()
+
+    def _wrap_transform(self, name, func):
+        counts = self.counts
+
+        def wrapper(surface, *args, **kwargs):
+            # scale(surface, size, dest_surface) writes into dest_surface
+            if kwargs.get('dest_surface') is None and not (name.startswith(('scale', 'smoothscale')) and len(args) > 1):
+                counts['transform.' + name] += 1
+            return func(surface, *args, **kwargs)
+        return wrapper
+
+    def _profile(self, frame, event, func):
+        if event == 'c_call':
+            owner = type(getattr(func, '__self__', None))
+            for cls, names in SURFACE_METHODS.items():
+                if issubclass(owner, cls) and func.__name__ in names:
+                    self.counts[cls.__name__ + '.' + func.__name__] += 1
+
+    def __enter__(self):
+        counts = self.counts
+        surface_cls = self.saved['Surface'] = pygame.Surface
+        mask_from_surface = self.saved['mask.from_surface'] = pygame.mask.from_surface
+        font_cls = self.saved['Font'] = pygame.font.Font
+
+        class CountedSurface(surface_cls):
+            def __init__(self, *args, **kwargs):
+                counts['Surface'] += 1
+                super().__init__(*args, **kwargs)
+
+        class CountedFont(font_cls):
+            def __init__(self, *args, **kwargs):
+                counts['Font'] += 1
+                super().__init__(*args, **kwargs)
+
+        def counted_from_surface(*args, **kwargs):
+            counts['mask.from_surface'] += 1
+            return mask_from_surface(*args, **kwargs)
+
+        pygame.Surface = CountedSurface
+        pygame.font.Font = CountedFont
+        pygame.mask.from_surface = counted_from_surface
+        for name in TRANSFORMS:
+            func = getattr(pygame.transform, name, None)
+            if func is not None:
+                self.saved['transform.' + name] = func
+                setattr(pygame.transform, name, self._wrap_transform(name, func))
+        self.saved['profile'] = sys.getprofile()
+        sys.setprofile(self._profile)
+        return self
+
+    def __exit__(self, *exc):
+        sys.setprofile(self.saved.pop('profile'))
+        pygame.Surface = self.saved.pop('Surface')
+        pygame.font.Font = self.saved.pop('Font')
+        pygame.mask.from_surface = self.saved.pop('mask.from_surface')
+        for key, func in list(self.saved.items()):
+            setattr(pygame.transform, key.split('.', 1)[1], func)
+        self.saved.clear()
+        return False
@@ -0,0 +1,145 @@
+# Packs every image under data/images/ into one atlas plus an index, so
+# startup reads a single file instead of decoding dozens of small PNGs. The
+# atlas is stored as raw RGB bytes: a PNG of it takes longer to inflate than
+# the small files together.
+# build it from the repo root with: python -m scripts.atlas
+import hashlib
+import json
+import os
+import sys
+
+import pygame
+
+BASE_IMG_PATH = 'data/images/'
+ATLAS_PATH = 'data/atlas.bin'
+INDEX_PATH = 'data/atlas.json'
+ATLAS_VERSION = 1
+ATLAS_WIDTH = 1024
+PADDING = 1
+
+
+def source_images():
+    # image paths relative to BASE_IMG_PATH, '/' separated like load_image() takes them
+    paths = []
+    for root, dirs, files in os.walk(BASE_IMG_PATH):
+        prefix = root[len(BASE_IMG_PATH):].replace(os.sep, '/').strip('/')
+        for name in files:
+            if name.lower().endswith('.png'):
+                paths.append(prefix + '/' + name if prefix else name)
+    return sorted(paths)
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def pack(sizes, width):
+    # shelf packing, tallest images first. returns {key: (x, y)} and the height used
+    positions = {}
+    x = y = shelf_height = 0
+    for key, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], item[0])):
+        if x + w > width:
+            x = 0
+            y += shelf_height + PADDING
+            shelf_height = 0
+        positions[key] = (x, y)
+        x += w + PADDING
+        shelf_height = max(shelf_height, h)
+    return positions, y + shelf_height
+
+
+def build(atlas_path=ATLAS_PATH, index_path=INDEX_PATH):
+    images = {path: pygame.image.load(BASE_IMG_PATH + path) for path in source_images()}
+    width = max([ATLAS_WIDTH] + [img.get_width() for img in images.values()])
+    positions, height = pack({path: img.get_size() for path, img in images.items()}, width)
+
+    atlas = pygame.Surface((width, height), pygame.SRCALPHA)
+    atlas.fill((0, 0, 0, 0))
+    index = {'version': ATLAS_VERSION, 'size': [width, height], 'images': {}}
+    for path, img in images.items():
+        # adding onto transparent black copies the pixels as they are, so the
+        # RGB bytes are what convert() on the file would have given
+        atlas.blit(img, positions[path], special_flags=pygame.BLEND_RGBA_ADD)
+        stat = os.stat(BASE_IMG_PATH + path)
+        index['images'][path] = {
+            'rect': [positions[path][0], positions[path][1], img.get_width(), img.get_height()],
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha1': file_hash(BASE_IMG_PATH + path),
+        }
+    with open(atlas_path, 'wb') as f:
+        f.write(pygame.image.tobytes(atlas, 'RGB'))
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    return index
+
+
+def is_fresh(index, atlas_path=ATLAS_PATH):
+    # the bundle is stale when an image was added, removed or changed. an image
+    # whose mtime moved but whose content hashes the same still counts as fresh
+    if index.get('version') != ATLAS_VERSION or not os.path.exists(atlas_path):
+        return False
+    entries = index['images']
+    if set(source_images()) != set(entries):
+        return False
+    for path, entry in entries.items():
+        stat = os.stat(BASE_IMG_PATH + path)
+        if stat.st_mtime_ns == entry['mtime'] and stat.st_size == entry['size']:
+            continue
+        if file_hash(BASE_IMG_PATH + path) != entry['sha1']:
+            return False
+    return True
+
+
+class Atlas:
+    """
+    The decoded atlas. image(path) hands out a subsurface of it with the same
+    black colorkey load_image() sets.
+    """
+    def __init__(self, surface, index):
+        self.surface = surface
+        self.rects = {path: entry['rect'] for path, entry in index['images'].items()}
+
+    def __contains__(self, path):
+        return path in self.rects
+
+    def listdir(self, path):
+        # file names directly inside path, like os.listdir
+        prefix = path.rstrip('/') + '/'
+        return [key[len(prefix):] for key in self.rects if key.startswith(prefix) and '/' not in key[len(prefix):]]
+
+    def image(self, path):
+        img = self.surface.subsurface(self.rects[path])
+        img.set_colorkey((0, 0, 0))
+        return img
+
+
+def read(atlas_path=ATLAS_PATH, index_path=INDEX_PATH, rebuild=False):
+    # (surface, index) for an up to date bundle, or None. no display needed, so
+    # this can run on a loading thread; the surface still has to be converted
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = None
+    if index is None or not is_fresh(index, atlas_path):
+        if not rebuild:
+            return None
+        index = build(atlas_path, index_path)
+    with open(atlas_path, 'rb') as f:
+        surface = pygame.image.frombuffer(f.read(), index['size'], 'RGB')
+    return surface, index
+
+
+def load(atlas_path=ATLAS_PATH, index_path=INDEX_PATH, rebuild=False):
+    # the Atlas, or None when there is no up to date bundle (and rebuild is off)
+    bundle = read(atlas_path, index_path, rebuild)
+    if bundle is None:
+        return None
+    return Atlas(bundle[0].convert(), bundle[1])
+
+
+if __name__ == '__main__':
+    index = build()
+    print('packed %d images into %s' % (len(index['images']), ATLAS_PATH), file=sys.stderr)
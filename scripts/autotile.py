@@ -0,0 +1,114 @@
+import numpy as np
+
+from scripts.tilegrid import CHUNK_SIZE, CHUNK_MASK
+
+# neighbor offset -> bit of the neighbor mask
+NEIGHBOR_BITS = {(1, 0): 1, (-1, 0): 2, (0, -1): 4, (0, 1): 8}
+
+
+class Autotiler:
+    """
+    Picks the variant of autotiled tiles from which of their 4 neighbors
+    have the same type, like Tilemap.autotile always did.
+
+    It listens to the grid and remembers the cells changed since the last
+    update(); update() only looks at those cells and their neighbors, so
+    the editor can run it after every edit. bulk() redoes the whole map
+    with numpy, a chunk per row of the arrays. Loading or clearing the map
+    is taken as the new starting point, not as an edit.
+    """
+    def __init__(self, grid, rules, tile_types):
+        self.grid = grid
+        self.tile_types = set(tile_types)
+        # neighbor mask -> variant, -1 where no rule applies and the variant is kept
+        self.variant_for_mask = np.full(16, -1, dtype=np.int16)
+        for neighbors, variant in rules.items():
+            self.variant_for_mask[sum(NEIGHBOR_BITS[offset] for offset in neighbors)] = variant
+        self.dirty = set()
+        self.updating = False  # our own variant changes aren't edits
+        grid.listeners.append(self.changed)
+
+    def changed(self, x, y):
+        if self.updating:
+            return
+        if x is None:
+            self.dirty.clear()
+            return
+        dirty = self.dirty
+        dirty.add((x, y))
+        dirty.add((x + 1, y))
+        dirty.add((x - 1, y))
+        dirty.add((x, y - 1))
+        dirty.add((x, y + 1))
+
+    def autotile_ids(self):
+        return {self.grid.type_ids[t] for t in self.tile_types if t in self.grid.type_ids}
+
+    def update(self):
+        # re-tiles the cells changed since the last update and their neighbors
+        if not self.dirty:
+            return 0
+        grid = self.grid
+        get_id = grid.get_id
+        ids = self.autotile_ids()
+        variant_for_mask = self.variant_for_mask.tolist()
+        self.updating = True
+        try:
+            for x, y in self.dirty:
+                tid = get_id(x, y)
+                if tid not in ids:
+                    continue
+                mask = ((get_id(x + 1, y) == tid) | (get_id(x - 1, y) == tid) << 1
+                        | (get_id(x, y - 1) == tid) << 2 | (get_id(x, y + 1) == tid) << 3)
+                variant = variant_for_mask[mask]
+                if variant >= 0:
+                    grid.set_variant(x, y, variant)
+        finally:
+            self.updating = False
+        count = len(self.dirty)
+        self.dirty.clear()
+        return count
+
+    def bulk(self):
+        # re-tiles the whole map. every chunk is a 16x16 block of one array,
+        # padded by a cell taken from the neighboring chunks
+        grid = self.grid
+        keys = list(grid.chunks)
+        self.dirty.clear()
+        if not keys:
+            return
+        n = len(keys)
+        index = {key: i for i, key in enumerate(keys)}
+        # row n stays empty and stands in for missing neighbor chunks
+        types = np.zeros((n + 1, CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint8)
+        types[:n] = np.frombuffer(b''.join(bytes(grid.chunks[key].types) for key in keys), np.uint8).reshape(n, CHUNK_SIZE, CHUNK_SIZE)
+        variants = np.frombuffer(b''.join(bytes(grid.chunks[key].variants) for key in keys), np.uint8).reshape(n, CHUNK_SIZE, CHUNK_SIZE)
+
+        def neighbor(dx, dy):
+            return np.array([index.get((cx + dx, cy + dy), n) for cx, cy in keys])
+
+        padded = np.zeros((n, CHUNK_SIZE + 2, CHUNK_SIZE + 2), dtype=np.uint8)
+        padded[:, 1:-1, 1:-1] = types[:n]
+        padded[:, 1:-1, 0] = types[neighbor(-1, 0), :, CHUNK_MASK]
+        padded[:, 1:-1, -1] = types[neighbor(1, 0), :, 0]
+        padded[:, 0, 1:-1] = types[neighbor(0, -1), CHUNK_MASK, :]
+        padded[:, -1, 1:-1] = types[neighbor(0, 1), 0, :]
+
+        center = types[:n]
+        mask = np.zeros(center.shape, dtype=np.uint8)
+        for bit, same in enumerate([padded[:, 1:-1, 2:] == center, padded[:, 1:-1, :-2] == center,
+                                    padded[:, :-2, 1:-1] == center, padded[:, 2:, 1:-1] == center]):
+            mask |= same.astype(np.uint8) << bit
+        new = self.variant_for_mask[mask]
+        autotiled = np.zeros(256, dtype=bool)
+        autotiled[list(self.autotile_ids())] = True
+        apply = autotiled[center] & (new >= 0)
+        result = np.where(apply, new, variants).astype(np.uint8)
+
+        changed = np.flatnonzero((result != variants).any(axis=(1, 2)))
+        self.updating = True
+        try:
+            for i in changed.tolist():
+                grid.set_chunk_variants(keys[i], result[i].tobytes())
+        finally:
+            self.updating = False
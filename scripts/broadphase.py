@@ -0,0 +1,120 @@
+class SpatialHash:
+    """
+    Uniform grid broadphase. Every object is stored in the cells its rect
+    touches, so "who overlaps this rect/point" only looks at nearby objects
+    instead of testing every pair. Rects are plain (x, y, w, h) tuples with
+    pygame.Rect overlap rules, nothing is allocated per test.
+    """
+    def __init__(self, cell_size=16):
+        self.cell_size = cell_size
+        self.cells = {}  # (cx, cy) -> {obj: None}, dicts keep insertion order
+        self.rects = {}  # obj -> (x, y, w, h)
+        self.ranges = {}  # obj -> (cx0, cy0, cx1, cy1) cells the obj is in
+
+    def __len__(self):
+        return len(self.rects)
+
+    def __contains__(self, obj):
+        return obj in self.rects
+
+    def clear(self):
+        self.cells = {}
+        self.rects = {}
+        self.ranges = {}
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        # a w x h rect covers x .. x + w - 1
+        return (int(rect[0] // size), int(rect[1] // size),
+                int((rect[0] + max(rect[2], 1) - 1) // size), int((rect[1] + max(rect[3], 1) - 1) // size))
+
+    def _add_cells(self, obj, cell_range):
+        cells = self.cells
+        for cy in range(cell_range[1], cell_range[3] + 1):
+            for cx in range(cell_range[0], cell_range[2] + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    bucket = cells[(cx, cy)] = {}
+                bucket[obj] = None
+
+    def _remove_cells(self, obj, cell_range):
+        cells = self.cells
+        for cy in range(cell_range[1], cell_range[3] + 1):
+            for cx in range(cell_range[0], cell_range[2] + 1):
+                bucket = cells[(cx, cy)]
+                del bucket[obj]
+                if not bucket:
+                    del cells[(cx, cy)]
+
+    def insert(self, obj, rect):
+        if obj in self.rects:
+            self.move(obj, rect)
+            return
+        cell_range = self._cell_range(rect)
+        self.rects[obj] = tuple(rect)
+        self.ranges[obj] = cell_range
+        self._add_cells(obj, cell_range)
+
+    def move(self, obj, rect):
+        # only touches the buckets when the object crossed into other cells
+        self.rects[obj] = tuple(rect)
+        cell_range = self._cell_range(rect)
+        old_range = self.ranges[obj]
+        if cell_range != old_range:
+            self._remove_cells(obj, old_range)
+            self._add_cells(obj, cell_range)
+            self.ranges[obj] = cell_range
+
+    def move_many(self, objs, rects):
+        # move() for many objects, their rects given as ints
+        size = self.cell_size
+        all_rects = self.rects
+        ranges = self.ranges
+        for obj, rect in zip(objs, rects):
+            x, y, w, h = rect
+            all_rects[obj] = (x, y, w, h)
+            cell_range = (x // size, y // size, (x + max(w, 1) - 1) // size, (y + max(h, 1) - 1) // size)
+            old_range = ranges[obj]
+            if cell_range != old_range:
+                self._remove_cells(obj, old_range)
+                self._add_cells(obj, cell_range)
+                ranges[obj] = cell_range
+
+    def remove(self, obj):
+        if obj in self.rects:
+            self._remove_cells(obj, self.ranges.pop(obj))
+            del self.rects[obj]
+
+    def query_rect(self, rect):
+        # objects whose rect overlaps rect, in the order they were found
+        x, y, w, h = rect
+        cx0, cy0, cx1, cy1 = self._cell_range(rect)
+        cells = self.cells
+        rects = self.rects
+        found = {}
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    continue
+                for obj in bucket:
+                    if obj in found:
+                        continue
+                    ox, oy, ow, oh = rects[obj]
+                    if x < ox + ow and ox < x + w and y < oy + oh and oy < y + h:
+                        found[obj] = None
+        return list(found)
+
+    def query_point(self, pos):
+        # objects whose rect contains pos
+        size = self.cell_size
+        bucket = self.cells.get((int(pos[0] // size), int(pos[1] // size)))
+        if bucket is None:
+            return []
+        found = []
+        rects = self.rects
+        for obj in bucket:
+            ox, oy, ow, oh = rects[obj]
+            if ox <= pos[0] < ox + ow and oy <= pos[1] < oy + oh:
+                found.append(obj)
+        return found
@@ -0,0 +1,92 @@
+import math
+from collections import OrderedDict
+
+import pygame
+
+from scripts.tilegrid import CHUNK_SHIFT, CHUNK_SIZE
+
+
+class ChunkCache:
+    """
+    Pre-renders the static tiles of each chunk into one surface, so drawing
+    the tilemap costs one blit per visible chunk instead of one per tile.
+    Surfaces are kept in LRU order and dropped when their tiles change.
+    """
+    def __init__(self, tilemap, max_chunks=64, include_offgrid=True):
+        self.tilemap = tilemap
+        self.max_chunks = max_chunks
+        self.include_offgrid = include_offgrid
+        # (chunk_x, chunk_y) -> surface, or None for a chunk with nothing to draw
+        self.surfaces = OrderedDict()
+        self.blits = 0  # chunk blits done by the last render()
+
+    def chunk_pixels(self):
+        return CHUNK_SIZE * self.tilemap.tile_size
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def invalidate(self, x, y):
+        # tile coords, (None, None) drops everything
+        if x is None:
+            self.surfaces.clear()
+        else:
+            self.surfaces.pop((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT), None)
+
+    def invalidate_chunk(self, cx, cy):
+        self.surfaces.pop((cx, cy), None)
+
+    def invalidate_rect(self, rect):
+        # pixel rect, used for offgrid tiles that can span several chunks.
+        # padded by a pixel since offgrid positions are floats
+        size = self.chunk_pixels()
+        for cy in range((rect.top - 1) // size, rect.bottom // size + 1):
+            for cx in range((rect.left - 1) // size, rect.right // size + 1):
+                self.surfaces.pop((cx, cy), None)
+
+    def build(self, key):
+        tilemap = self.tilemap
+        assets = tilemap.game.assets
+        ts = tilemap.tile_size
+        size = self.chunk_pixels()
+        origin = (key[0] * size, key[1] * size)
+
+        blits = []
+        if self.include_offgrid:
+            # a pixel of margin around the chunk, positions are floored below
+            for tile in tilemap.offgrid_tiles.query_rect((origin[0] - 1, origin[1] - 1, size + 2, size + 2)):
+                img = assets[tile['type']][tile['variant']]
+                # floor like blit does for the on-screen (positive) positions it gets normally
+                blits.append((img, (math.floor(tile['pos'][0]) - origin[0], math.floor(tile['pos'][1]) - origin[1])))
+        x0 = key[0] << CHUNK_SHIFT
+        y0 = key[1] << CHUNK_SHIFT
+        for x, y, tile_type, variant in tilemap.grid.tiles_in_rect(x0, y0, x0 + CHUNK_SIZE - 1, y0 + CHUNK_SIZE - 1):
+            blits.append((assets[tile_type][variant], (x * ts - origin[0], y * ts - origin[1])))
+        if not blits:
+            return None
+
+        surf = pygame.Surface((size, size), pygame.SRCALPHA)
+        if pygame.display.get_surface():
+            surf = surf.convert_alpha()
+        surf.fill((0, 0, 0, 0))
+        surf.blits(blits, doreturn=False)
+        return surf
+
+    def get(self, key):
+        if key in self.surfaces:
+            self.surfaces.move_to_end(key)
+            return self.surfaces[key]
+        surf = self.surfaces[key] = self.build(key)
+        while len(self.surfaces) > self.max_chunks:
+            self.surfaces.popitem(last=False)
+        return surf
+
+    def render(self, surf, offset=(0, 0)):
+        size = self.chunk_pixels()
+        self.blits = 0
+        for cy in range(offset[1] // size, (offset[1] + surf.get_height()) // size + 1):
+            for cx in range(offset[0] // size, (offset[0] + surf.get_width()) // size + 1):
+                chunk_surf = self.get((cx, cy))
+                if chunk_surf is not None:
+                    surf.blit(chunk_surf, (cx * size - offset[0], cy * size - offset[1]))
+                    self.blits += 1
@@ -0,0 +1,227 @@
+import numpy as np
+import pygame
+
+from scripts.navigation import runs_of, splice_runs
+from scripts.tilegrid import CHUNK_SHIFT, CHUNK_MASK, CHUNK_AREA, CHUNK_SIZE
+
+# the 3x3 tiles around a tile, in the order physics_rects_around has always returned them
+NEIGHBOR_OFFSETS = [(-1, 0), (-1, -1), (0, -1), (1, -1),
+                    (1, 0), (0, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+class CollisionGeometry:
+    """
+    Static collision geometry of a tilemap, built once after a level loads
+    and patched around the cells that change afterwards:
+
+        cells   a Rect per solid tile, (x, y) -> Rect
+        runs    horizontal runs of solid tiles merged into one Rect each,
+                row y -> list of Rects, left to right
+
+    rects_around() and runs_around() hand out tuples of these Rects, cached
+    per tile, so a lookup allocates nothing once the tile has been asked
+    about. The Rects are shared: read them, don't move them.
+    """
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+        self.grid = tilemap.grid
+        self.cells = {}
+        self.runs = {}
+        self.around = {}  # tile -> tuple of cell Rects around it
+        self.runs_near = {}  # tile -> tuple of run Rects around it
+        self.tile_size = tilemap.tile_size
+        self.stale = True  # everything changed since the last build
+        self.grid.listeners.append(self.changed)
+        self.grid.chunk_listeners.append(self.chunk_changed)
+
+    def changed(self, x, y):
+        if self.stale:
+            return
+        if x is None:
+            # a new map: rebuilt on the next lookup, when the tile size is known too
+            self.stale = True
+            return
+        solid = self.grid.is_solid(x, y)
+        if solid == ((x, y) in self.cells):
+            # a variant changed, or a tile was swapped for one as solid
+            return
+        if solid:
+            ts = self.tile_size
+            self.cells[(x, y)] = pygame.Rect(x * ts, y * ts, ts, ts)
+        else:
+            del self.cells[(x, y)]
+        around = self.around
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                around.pop((x + dx, y + dy), None)
+        self.patch_row(x, y)
+
+    def chunk_changed(self, cx, cy):
+        # every cell of the chunk, which came in or went out as a whole
+        if self.stale:
+            return
+        ts = self.tile_size
+        x0 = cx << CHUNK_SHIFT
+        y0 = cy << CHUNK_SHIFT
+        cells = self.cells
+        chunk = self.grid.chunks.get((cx, cy))
+        solid = self.grid.solid
+        for i in range(CHUNK_AREA):
+            x = x0 | (i & CHUNK_MASK)
+            y = y0 | (i >> CHUNK_SHIFT)
+            if chunk is not None and solid[chunk.types[i]]:
+                if (x, y) not in cells:
+                    cells[(x, y)] = pygame.Rect(x * ts, y * ts, ts, ts)
+            else:
+                cells.pop((x, y), None)
+        around = self.around
+        for y in range(y0 - 1, y0 + CHUNK_SIZE + 1):
+            for x in range(x0 - 1, x0 + CHUNK_SIZE + 1):
+                around.pop((x, y), None)
+        for y in range(y0, y0 + CHUNK_SIZE):
+            self.patch_row(x0, y, x0 + CHUNK_SIZE - 1)
+
+    def build(self):
+        # every solid tile of the grid, a chunk at a time
+        ts = self.tile_size = self.tilemap.tile_size
+        solid = self.grid.solid
+        cells = self.cells = {}
+        rows = {}
+        for (cx, cy), chunk in self.grid.chunks.items():
+            types = chunk.types
+            base_x = cx << CHUNK_SHIFT
+            base_y = cy << CHUNK_SHIFT
+            for i in range(CHUNK_AREA):
+                if solid[types[i]]:
+                    x = base_x | (i & CHUNK_MASK)
+                    y = base_y | (i >> CHUNK_SHIFT)
+                    cells[(x, y)] = pygame.Rect(x * ts, y * ts, ts, ts)
+                    rows.setdefault(y, []).append(x)
+        self.runs = {}
+        for y, xs in rows.items():
+            xs.sort()
+            runs = self.runs[y] = []
+            start = xs[0]
+            for prev, x in zip(xs, xs[1:]):
+                if x != prev + 1:
+                    runs.append(pygame.Rect(start * ts, y * ts, (prev + 1 - start) * ts, ts))
+                    start = x
+            runs.append(pygame.Rect(start * ts, y * ts, (xs[-1] + 1 - start) * ts, ts))
+        self.around = {}
+        self.runs_near = {}
+        self.stale = False
+
+    def patch_row(self, x, y, last=None):
+        # redoes the runs of row y over the tile x (or x..last) after it changed
+        ts = self.tile_size
+        cells = self.cells
+        last = x if last is None else last
+        runs = self.runs.get(y, [])
+        spans = [(run.x // ts, run.right // ts - 1) for run in runs]
+        i, j = splice_runs(spans, x, last, runs_of(x, [(col, y) in cells for col in range(x, last + 1)]))
+        # only the runs that changed are new Rects
+        runs[i:j + len(runs) - len(spans)] = [pygame.Rect(left * ts, y * ts, (right + 1 - left) * ts, ts)
+                                              for left, right in spans[i:j]]
+        if runs:
+            self.runs[y] = runs
+        else:
+            self.runs.pop(y, None)
+        # a run can reach far from the change, the tiles near it are asked about again
+        self.runs_near.clear()
+
+    def rects_around(self, tile_x, tile_y):
+        if self.stale:
+            self.build()
+        rects = self.around.get((tile_x, tile_y))
+        if rects is None:
+            cells = self.cells
+            rects = self.around[(tile_x, tile_y)] = tuple(
+                cells[loc] for loc in [(tile_x + dx, tile_y + dy) for dx, dy in NEIGHBOR_OFFSETS] if loc in cells)
+        return rects
+
+    def runs_around(self, tile_x, tile_y):
+        # the merged runs that reach into the 3x3 tiles around the tile, top row first
+        if self.stale:
+            self.build()
+        rects = self.runs_near.get((tile_x, tile_y))
+        if rects is None:
+            ts = self.tile_size
+            left = (tile_x - 1) * ts
+            right = (tile_x + 2) * ts
+            rects = self.runs_near[(tile_x, tile_y)] = tuple(
+                run for y in (tile_y - 1, tile_y, tile_y + 1) for run in self.runs.get(y, ())
+                if run.right > left and run.left < right)
+        return rects
+
+
+class SolidBitmap:
+    """
+    The solid flags of a tilemap as one 2D numpy array over the chunks it
+    covers, for looking up many tiles at once. Built from the grid when
+    first used after a map loads; single tile changes are written straight
+    into it, or make it rebuild when they fall outside. A border of empty
+    tiles goes round it, so lookups outside clamp onto empty tiles.
+    """
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+        self.grid = tilemap.grid
+        self.cells = np.zeros((1, 1), bool)  # [y - origin y, x - origin x]
+        self.origin = (0, 0)
+        self.stale = True
+        self.grid.listeners.append(self.changed)
+        self.grid.chunk_listeners.append(self.chunk_changed)
+
+    def changed(self, x, y):
+        if self.stale:
+            return
+        if x is None:
+            self.stale = True
+            return
+        cx = x - self.origin[0]
+        cy = y - self.origin[1]
+        height, width = self.cells.shape
+        if 0 < cy < height - 1 and 0 < cx < width - 1:
+            self.cells[cy, cx] = self.grid.is_solid(x, y)
+        elif self.grid.is_solid(x, y):
+            self.stale = True
+
+    def chunk_changed(self, cx, cy):
+        if self.stale:
+            return
+        x = (cx << CHUNK_SHIFT) - self.origin[0]
+        y = (cy << CHUNK_SHIFT) - self.origin[1]
+        height, width = self.cells.shape
+        chunk = self.grid.chunks.get((cx, cy))
+        if 0 < y and y + CHUNK_SIZE < height and 0 < x and x + CHUNK_SIZE < width:
+            self.cells[y:y + CHUNK_SIZE, x:x + CHUNK_SIZE] = False if chunk is None else self.chunk_solid(chunk)
+        elif chunk is not None:
+            self.stale = True
+
+    def chunk_solid(self, chunk):
+        # the chunk's solid flags, CHUNK_SIZE x CHUNK_SIZE
+        solid = np.frombuffer(bytes(self.grid.solid), np.uint8).astype(bool)
+        return solid[np.frombuffer(chunk.types, np.uint8).reshape(CHUNK_SIZE, CHUNK_SIZE)]
+
+    def build(self):
+        chunks = self.grid.chunks
+        self.stale = False
+        if not chunks:
+            self.origin = (0, 0)
+            self.cells = np.zeros((1, 1), bool)
+            return
+        keys = np.array(list(chunks), np.int64)
+        low_x, low_y = keys.min(axis=0).tolist()
+        high_x, high_y = keys.max(axis=0).tolist()
+        self.origin = ((low_x << CHUNK_SHIFT) - 1, (low_y << CHUNK_SHIFT) - 1)
+        self.cells = np.zeros(((high_y - low_y + 1) * CHUNK_SIZE + 2, (high_x - low_x + 1) * CHUNK_SIZE + 2), bool)
+        for (cx, cy), chunk in chunks.items():
+            x = ((cx - low_x) << CHUNK_SHIFT) + 1
+            y = ((cy - low_y) << CHUNK_SHIFT) + 1
+            self.cells[y:y + CHUNK_SIZE, x:x + CHUNK_SIZE] = self.chunk_solid(chunk)
+
+    def lookup(self, xs, ys):
+        # solid flags of tiles (xs, ys), integer arrays of the same (or broadcastable) shape
+        if self.stale:
+            self.build()
+        height, width = self.cells.shape
+        return self.cells[np.clip(ys - self.origin[1], 0, height - 1), np.clip(xs - self.origin[0], 0, width - 1)]
@@ -1,10 +1,12 @@
 import random
 import math
 
+import numpy as np
 import pygame
 from scripts.entity import PhysicsEntity
-from scripts.spark import Spark
-from scripts.particle import Particle
+
+# fewer enemies than this are updated one at a time by EnemyManager, numpy costs them more than it saves
+MIN_MANAGED = 100
 
 class Enemy(PhysicsEntity):
     def __init__(self, game, pos, size):
@@ -13,8 +15,15 @@ class Enemy(PhysicsEntity):
         self.walking = 0
 
     def update(self, tilemap, movement=(0, 0)):
+        movement = self.think(tilemap, movement)
+        super().update(tilemap, movement=movement)
+        return self.after_move(movement)
+
+    def think(self, tilemap, movement=(0, 0)):
+        # walks, turns and shoots, returns the movement of the tick
         if self.walking:
-            if tilemap.solid_check((self.rect().centerx + (-7 if self.flip else 7), self.pos[1] + 23)):
+            rect = self.rect()  # one rect for all the checks before moving
+            if tilemap.solid_check((rect.centerx + (-7 if self.flip else 7), self.pos[1] + 23)):
                 if (self.collisions['right'] or self.collisions['left']):
                     self.flip = not self.flip
                 else:
@@ -31,55 +40,156 @@ class Enemy(PhysicsEntity):
                 if (abs(dis[1]) < 16):
                     if (self.flip and dis[0] < 0):
                         self.game.sfx['shoot'].play()
-                        self.game.projectiles.append(
-                            [[self.rect().centerx - 7, self.rect().centery], -1.5, 0])
+                        pos = (rect.centerx - 7, rect.centery)
+                        self.game.projectiles.spawn(pos, -1.5)
                         # spawen sparks (left)
                         for i in range(4):
-                            self.game.sparks.append(Spark(
-                                self.game.projectiles[-1][0], random.random() - 0.5 + math.pi, 2 + random.random()))
+                            self.game.sparks.spawn(pos, random.random() - 0.5 + math.pi, 2 + random.random())
                     if (not self.flip and dis[0] > 0):
                         self.game.sfx['shoot'].play()
-                        self.game.projectiles.append(
-                            [[self.rect().centerx + 7, self.rect().centery], 1.5, 0])
+                        pos = (rect.centerx + 7, rect.centery)
+                        self.game.projectiles.spawn(pos, 1.5)
                         # spawen sparks (right)
                         for i in range(4):
-                            self.game.sparks.append(Spark(
-                                self.game.projectiles[-1][0], random.random() - 0.5, 2+random.random()))
+                            self.game.sparks.spawn(pos, random.random() - 0.5, 2+random.random())
 
         elif random.random() < 0.01:
             self.walking = random.randint(30, 120)  # half a sec to 2 sec
-        super().update(tilemap, movement=movement)
+        return movement
+
+    def after_move(self, movement):
+        # True when the player's dash killed the enemy
         if movement[0] != 0:
             self.set_action('run')
         else:
             self.set_action('idle')
 
-        if abs(self.game.player.dashing) >= 50:
+        if abs(self.game.player.dashing) >= 50 and self in self.game.dash_targets:
             if self.rect().colliderect(self.game.player.rect()):
                 self.game.screenshake = max(16, self.game.screenshake)
                 self.game.sfx['hit'].play()
                 for i in range(30):
                     angle = random.random() * math.pi * 2
                     speed = random.random() * 5
-                    self.game.sparks.append(
-                        Spark(self.rect().center, angle, 2 + random.random()))
+                    self.game.sparks.spawn(self.rect().center, angle, 2 + random.random())
                     # angle of particle is opposite
-                    self.game.particles.append(Particle(self.game, 'particle', self.game.player.rect().center, velocity=[
-                        math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=random.randint(0, 7)))
+                    self.game.particles.spawn('particle', self.game.player.rect().center, velocity=[
+                        math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=random.randint(0, 7))
                     # big sparks
-                self.game.sparks.append(
-                    Spark(self.rect().center, 0, 5 + random.random()))
-                self.game.sparks.append(
-                    Spark(self.rect().center, math.pi, 5 + random.random()))
+                self.game.sparks.spawn(self.rect().center, 0, 5 + random.random())
+                self.game.sparks.spawn(self.rect().center, math.pi, 5 + random.random())
                 return True
 
-    def render(self, surf, offset=(0, 0)):
-
+    def render(self, surf, offset=(0, 0), alpha=1.0):
+        offset = self.interpolated_offset(offset, alpha)
         super().render(surf, offset)
         if self.flip:
             # flip gun as well
-            surf.blit(pygame.transform.flip(self.game.assets['gun'], True, False), (self.rect(
+            surf.blit(self.game.assets['gun/flipped'], (self.rect(
             ).centerx - 4 - self.game.assets['gun'].get_width() - offset[0], self.rect().centery - offset[1]))
         else:
             surf.blit(self.game.assets['gun'], (self.rect(
             ).centerx + 4 - offset[0], self.rect().centery - offset[1]))
+
+
+class EnemyManager:
+    """
+    Enemy.update for every enemy at once, for games with the batched
+    physics: walking timers, turning at ledges and walls and who lines up
+    to fire are worked out with numpy over all enemies, which then move in
+    one PhysicsWorld step. What draws from the RNG still happens in the
+    enemies' order, so the game plays as with Enemy.update: the idle rolls
+    to start walking, the sparks of shots, and enemies next to a dashing
+    player (game.dash_targets), which update one at a time since a hit
+    draws too. Shots are spawned in bulk, in order, between those. Fewer
+    than MIN_MANAGED enemies just get Enemy.update each.
+    """
+    def __init__(self, game):
+        self.game = game
+        self.shots = []  # (pos, speed, spark angles, spark speeds) not spawned yet
+
+    def flush(self):
+        if not self.shots:
+            return
+        game = self.game
+        game.sfx['shoot'].play()
+        game.projectiles.spawn_many([shot[0] for shot in self.shots], [shot[1] for shot in self.shots])
+        for pos, speed, angles, speeds in self.shots:
+            game.sparks.spawn_many(pos, angles, speeds)
+        self.shots = []
+
+    def update(self, enemies, tilemap):
+        # returns the enemies killed, in order
+        if len(enemies) < MIN_MANAGED:
+            return [enemy for enemy in enemies if enemy.update(tilemap, (0, 0))]
+        game = self.game
+        world = game.physics
+        n = len(enemies)
+        bodies = np.fromiter((enemy.body for enemy in enemies), np.intp, n)
+        pos = world.pos[bodies]
+        size = world.size[bodies]
+        collisions = world.collisions[bodies]
+        walking = np.fromiter((enemy.walking for enemy in enemies), np.int64, n)
+        flip = np.fromiter((enemy.flip for enemy in enemies), bool, n)
+        targets = np.zeros(n, bool)
+        if game.dash_targets:
+            targets[[i for i, enemy in enumerate(enemies) if enemy in game.dash_targets]] = True
+
+        # walking: turn at a ledge or a wall, else take a step the way it faces
+        walkers = (walking > 0) & ~targets
+        ts = tilemap.tile_size
+        rect = np.trunc(pos).astype(np.int64)
+        center = rect + size // 2
+        ground = world.bitmap.lookup((center[:, 0] + np.where(flip, -7, 7)) // ts,
+                                     np.floor_divide(pos[:, 1] + 23, ts).astype(np.int64))
+        wall = collisions[:, 2] | collisions[:, 3]
+        flip ^= walkers & (~ground | wall)
+        steps = walkers & ground & ~wall
+        movement = np.zeros((n, 2))
+        movement[steps, 0] = np.where(flip[steps], -0.5, 0.5)
+        walking[walkers] -= 1
+        # at the end of a walk, fire if the player is level with it, in front
+        player = game.player.pos
+        lined_up = walkers & (walking == 0) & (np.abs(player[1] - pos[:, 1]) < 16)
+        fires = lined_up & np.where(flip, player[0] - pos[:, 0] < 0, player[0] - pos[:, 0] > 0)
+
+        # everything that draws from the RNG, in order
+        idle = (walking == 0) & ~walkers & ~targets
+        kills = []
+        for i in np.flatnonzero(idle | fires | targets).tolist():
+            enemy = enemies[i]
+            if targets[i]:
+                self.flush()
+                if enemy.update(tilemap, (0, 0)):
+                    kills.append(enemy)
+            elif idle[i]:
+                if random.random() < 0.01:
+                    walking[i] = random.randint(30, 120)  # half a sec to 2 sec
+            else:
+                side = -1 if flip[i] else 1
+                angles = []
+                speeds = []
+                for _ in range(4):
+                    angles.append(random.random() - 0.5 + (math.pi if side < 0 else 0))
+                    speeds.append(2 + random.random())
+                shot = (int(center[i, 0]) + side * 7, int(center[i, 1]))
+                self.shots.append((shot, 1.5 * side, angles, speeds))
+        self.flush()
+
+        moving = np.flatnonzero(~targets).tolist()
+        batch = [enemies[i] for i in moving]
+        movements = movement[moving].tolist()
+        before = world.step(batch, movements)
+        rects = world.rects(batch)
+        walking = walking.tolist()
+        flip = flip.tolist()
+        game.enemy_grid.move_many(batch, rects)
+        for i, enemy, movement, prev_pos in zip(moving, batch, movements, before):
+            # the rest of PhysicsEntity.moved, flip already faces the way it moved
+            enemy.walking = walking[i]
+            enemy.flip = flip[i]
+            enemy.prev_pos = prev_pos
+            enemy.last_movement = movement
+            enemy.animation.update()
+            enemy.set_action('run' if movement[0] else 'idle')
+        return kills
@@ -1,3 +1,4 @@
+import copy
 import pygame
 import random
 from scripts.particle import Particle
@@ -9,6 +10,7 @@ class PhysicsEntity:
         self.game = game
         self.type = e_type
         self.pos = list(pos)
+        self.prev_pos = tuple(pos)  # pos before the last update, for drawing in between
         self.size = size
         self.velocity = [0, 0]
         self.collisions = {'up': False, 'down': False,
@@ -22,9 +24,31 @@ class PhysicsEntity:
 
         self.dashing = 0
 
+        self.broadphase = None  # SpatialHash kept up to date with this entity's rect
+        self.world = None  # PhysicsWorld moving this entity, which then holds pos, velocity and collisions
+        self.body = None  # index of the entity in the world's arrays
+
     def rect(self):
         return pygame.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
 
+    def snapshot(self):
+        # every attribute of the entity's own state (player's and enemy's too), as copies
+        state = {}
+        for key, value in self.__dict__.items():
+            if key not in ('game', 'broadphase', 'animation', 'world', 'body'):
+                state[key] = copy.copy(value)
+        state['animation'] = (self.animation.frame, self.animation.done)
+        return state
+
+    def restore(self, state):
+        for key, value in state.items():
+            if key not in ('action', 'animation'):
+                setattr(self, key, copy.copy(value))
+        self.set_action(state['action'])
+        self.animation.frame, self.animation.done = state['animation']
+        if self.world is not None:
+            self.world.sync(self)
+
     def set_action(self, action):
         if action != self.action:
             self.action = action
@@ -32,6 +56,12 @@ class PhysicsEntity:
                                               '/' + self.action].copy()
             
     def update(self, tilemap, movement=(0, 0)):
+        self.prev_pos = tuple(self.pos)
+        if self.world is not None:
+            # collisions and gravity, done by the world
+            self.world.move(self, movement)
+            self.moved(movement)
+            return
         # collisons are reset every reset
         self.collisions = {'up': False, 'down': False,
                            'right': False, 'left': False}
@@ -68,13 +98,6 @@ class PhysicsEntity:
                     self.collisions['up'] = True
                 self.pos[1] = entity_rect.y  # attach player to the tile
 
-        if movement[0] > 0:
-            self.flip = False
-        if movement[0] < 0:
-            self.flip = True
-
-        self.last_movement = movement
-
         # max velocity is set to 5: avoid consistent acceleration
         # example: jump
         # up phase: taken velocity is from negative number to 0
@@ -87,11 +110,31 @@ class PhysicsEntity:
         if self.collisions['down'] or self.collisions['up']:
             self.velocity[1] = 0
 
+        self.moved(movement)
+
+    def moved(self, movement, rect=None):
+        # what follows the physics of an update. rect is the entity's (x, y, w, h) when known
+        if self.broadphase is not None:
+            self.broadphase.move(self, rect or (int(self.pos[0]), int(self.pos[1]), self.size[0], self.size[1]))
+
+        if movement[0] > 0:
+            self.flip = False
+        if movement[0] < 0:
+            self.flip = True
+
+        self.last_movement = movement
+
         self.animation.update()
 
-    def render(self, surf, offset=(0, 0)):
+    def interpolated_offset(self, offset, alpha):
+        # the camera offset that puts the entity alpha of the way from prev_pos to pos
+        if alpha == 1.0:
+            return offset
+        back = 1.0 - alpha
+        return (offset[0] + (self.pos[0] - self.prev_pos[0]) * back, offset[1] + (self.pos[1] - self.prev_pos[1]) * back)
+
+    def render(self, surf, offset=(0, 0), alpha=1.0):
+        offset = self.interpolated_offset(offset, alpha)
         # surf.blit(self.game.assets['player'], (self.pos[0]-offset[0], self.pos[1]-offset[1]))
-        surf.blit(pygame.transform.flip(self.animation.img(), self.flip, False),
+        surf.blit(self.animation.img(self.flip),
                   (self.pos[0] - offset[0] + self.anim_offset[0], self.pos[1] - offset[1] + self.anim_offset[1]))
-
-
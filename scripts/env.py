@@ -0,0 +1,250 @@
+import math
+import multiprocessing
+import random
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from scripts.simulation import Simulation, headless_assets, silent_sfx
+
+# observation of one instance, float32:
+#   player        x, y, velocity x, velocity y, health, dashing / 60, air_time, on the ground
+#   level         level, enemies left
+#   enemies       NEAREST x (dx, dy, facing left, present), nearest first
+#   projectiles   NEAREST x (dx, dy, speed, present), nearest first
+#   tiles         GRID_W x GRID_H solid flags around the player's tile, row by row
+NEAREST = 4
+GRID_W = 9
+GRID_H = 7
+PLAYER_OBS = 8
+LEVEL_OBS = 2
+OBS_SIZE = PLAYER_OBS + LEVEL_OBS + NEAREST * 4 * 2 + GRID_W * GRID_H
+MAX_TICKS = 60 * 60  # an episode that takes longer than a minute of game time ends
+
+# reward of the events of a tick
+KILL_REWARD = 1.0
+DAMAGE_REWARD = -1.0
+PASSED_REWARD = 10.0
+DIED_REWARD = -10.0
+
+
+def observe(sim, out):
+    # writes the observation of sim into out (a float32 array of OBS_SIZE)
+    out[:] = 0
+    player = sim.player
+    px, py = player.pos
+    out[:PLAYER_OBS] = (px, py, player.velocity[0], player.velocity[1], player.health,
+                        player.dashing / 60, player.air_time, player.collisions['down'])
+    out[PLAYER_OBS:PLAYER_OBS + LEVEL_OBS] = (sim.level, len(sim.enemies))
+    i = PLAYER_OBS + LEVEL_OBS
+    enemies = sorted(sim.enemies, key=lambda enemy: (enemy.pos[0] - px) ** 2 + (enemy.pos[1] - py) ** 2)
+    for k, enemy in enumerate(enemies[:NEAREST]):
+        out[i + k * 4:i + k * 4 + 4] = (enemy.pos[0] - px, enemy.pos[1] - py, enemy.flip, 1)
+    i += NEAREST * 4
+    n = sim.projectiles.count
+    if n:
+        delta = sim.projectiles.pos[:n] - (px, py)
+        nearest = np.argsort((delta ** 2).sum(axis=1))[:NEAREST]
+        k = len(nearest)
+        block = out[i:i + NEAREST * 4].reshape(NEAREST, 4)
+        block[:k, :2] = delta[nearest]
+        block[:k, 2] = sim.projectiles.speed[:n][nearest]
+        block[:k, 3] = 1
+    i += NEAREST * 4
+    ts = sim.tilemap.tile_size
+    tx = int(px // ts) - GRID_W // 2
+    ty = int(py // ts) - GRID_H // 2
+    is_solid = sim.tilemap.grid.is_solid
+    for y in range(GRID_H):
+        for x in range(GRID_W):
+            if is_solid(tx + x, ty + y):
+                out[i + y * GRID_W + x] = 1
+
+
+class VectorEnv:
+    """
+    count independent Simulations stepped together, for bots and level tests.
+
+        env = VectorEnv(64, levels=[0, 1, 2])
+        obs = env.reset()
+        while True:
+            obs, rewards, dones = env.step(actions)   # actions: uint8 array of scripts.replay bits
+
+    An episode ends when its level is passed, the player dies or MAX_TICKS
+    run out; the instance is then reset to its next level right away, and
+    dones says which ones that happened to. stats counts the outcomes per
+    level. Each instance has its own RNG state, swapped in around its
+    tick, so an instance plays the same whatever else is in the batch.
+    The returned arrays are reused by the next call, or are the ones passed
+    in as obs/rewards/dones.
+    """
+    def __init__(self, count, levels=None, seed=0, max_ticks=MAX_TICKS, obs=None, rewards=None, dones=None, first=0):
+        assets = headless_assets()
+        sfx = silent_sfx()
+        self.count = count
+        self.max_ticks = max_ticks
+        self.obs = np.zeros((count, OBS_SIZE), np.float32) if obs is None else obs
+        self.rewards = np.zeros(count, np.float32) if rewards is None else rewards
+        self.dones = np.zeros(count, bool) if dones is None else dones
+        self.sims = []
+        self.rng_states = []
+        for i in range(count):
+            self.sims.append(Simulation(assets, sfx, seed=seed + first + i))
+            self.rng_states.append(random.getstate())
+        self.levels = levels if levels is not None else list(range(self.sims[0].level_count))
+        # instance i plays levels[(first + i + episodes) % len(levels)], so a batch covers every level
+        self.next_level = [first + i for i in range(count)]
+        self.ticks = [0] * count
+        self.total_ticks = 0
+        self.stats = {level: {'passed': 0, 'died': 0, 'timeout': 0} for level in self.levels}
+
+    def _start(self, i):
+        sim = self.sims[i]
+        sim.reset(self.levels[self.next_level[i] % len(self.levels)])
+        self.next_level[i] += 1
+        self.ticks[i] = 0
+
+    def reset(self):
+        for i, sim in enumerate(self.sims):
+            random.setstate(self.rng_states[i])
+            self._start(i)
+            self.rng_states[i] = random.getstate()
+            observe(sim, self.obs[i])
+        self.rewards[:] = 0
+        self.dones[:] = False
+        return self.obs
+
+    def step(self, actions):
+        for i, sim in enumerate(self.sims):
+            random.setstate(self.rng_states[i])
+            enemies = len(sim.enemies)
+            health = sim.player.health
+            sim.tick(int(actions[i]))
+            self.ticks[i] += 1
+            reward = (enemies - len(sim.enemies)) * KILL_REWARD + max(0, health - sim.player.health) * DAMAGE_REWARD
+            outcome = None
+            if sim.current_level_passed:
+                outcome = 'passed'
+                reward += PASSED_REWARD
+            elif sim.dead:
+                outcome = 'died'
+                reward += DIED_REWARD
+            elif self.ticks[i] >= self.max_ticks:
+                outcome = 'timeout'
+            if outcome is not None:
+                self.stats[sim.level][outcome] += 1
+                self._start(i)
+            self.rng_states[i] = random.getstate()
+            self.rewards[i] = reward
+            self.dones[i] = outcome is not None
+            observe(sim, self.obs[i])
+        self.total_ticks += self.count
+        return self.obs, self.rewards, self.dones
+
+    def close(self):
+        pass
+
+
+def _worker(conn, names, total, count, first, levels, seed, max_ticks):
+    # runs instances first..first + count of a ProcessVectorEnv of total instances
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    obs, rewards, dones, actions = _views(blocks, total)
+    part = slice(first, first + count)
+    env = VectorEnv(count, levels, seed, max_ticks, obs[part], rewards[part], dones[part], first=first)
+    try:
+        while True:
+            command = conn.recv()
+            if command == 'step':
+                env.step(actions[part])
+                conn.send(None)
+            elif command == 'reset':
+                env.reset()
+                conn.send(None)
+            elif command == 'stats':
+                conn.send(env.stats)
+            else:
+                break
+    finally:
+        del obs, rewards, dones, actions, env
+        for block in blocks:
+            block.close()
+
+
+def _views(blocks, count):
+    return (np.ndarray((count, OBS_SIZE), np.float32, blocks[0].buf),
+            np.ndarray(count, np.float32, blocks[1].buf),
+            np.ndarray(count, bool, blocks[2].buf),
+            np.ndarray(count, np.uint8, blocks[3].buf))
+
+
+class ProcessVectorEnv:
+    """
+    VectorEnv split over worker processes, for using every core. The
+    observations, rewards, dones and actions live in shared memory that
+    the workers write into directly, so a step sends no arrays through
+    pipes, only a command per worker. Same interface as VectorEnv, plus
+    close() (or use it as a context manager), which stops the workers.
+    Instance i is the same game as instance i of a VectorEnv of the same
+    seed.
+    """
+    def __init__(self, count, workers=None, levels=None, seed=0, max_ticks=MAX_TICKS):
+        workers = min(count, workers or multiprocessing.cpu_count())
+        self.count = count
+        sizes = (count * OBS_SIZE * 4, count * 4, count, count)
+        self.blocks = [shared_memory.SharedMemory(create=True, size=max(1, size)) for size in sizes]
+        self.obs, self.rewards, self.dones, self.actions = _views(self.blocks, count)
+        context = multiprocessing.get_context('spawn')
+        self.conns = []
+        self.processes = []
+        per_worker = math.ceil(count / workers)
+        for first in range(0, count, per_worker):
+            parent, child = context.Pipe()
+            process = context.Process(target=_worker, daemon=True, args=(
+                child, [block.name for block in self.blocks], count, min(per_worker, count - first), first, levels, seed, max_ticks))
+            process.start()
+            self.conns.append(parent)
+            self.processes.append(process)
+
+    def _all(self, command):
+        for conn in self.conns:
+            conn.send(command)
+        return [conn.recv() for conn in self.conns]
+
+    def reset(self):
+        self._all('reset')
+        return self.obs
+
+    def step(self, actions):
+        self.actions[:] = actions
+        self._all('step')
+        return self.obs, self.rewards, self.dones
+
+    @property
+    def stats(self):
+        total = {}
+        for stats in self._all('stats'):
+            for level, counts in stats.items():
+                merged = total.setdefault(level, {'passed': 0, 'died': 0, 'timeout': 0})
+                for outcome, n in counts.items():
+                    merged[outcome] += n
+        return total
+
+    def close(self):
+        if not self.processes:
+            return
+        for conn in self.conns:
+            conn.send('close')
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        del self.obs, self.rewards, self.dones, self.actions
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,128 @@
+import json
+import queue
+import threading
+import warnings
+
+import pygame
+
+from scripts import atlas
+from scripts.utils import BASE_IMG_PATH, add_loaded, set_atlas
+
+
+class AssetLoader:
+    """
+    Reads images, sounds and map files on a worker thread, e.g. while the
+    start screen is up.
+
+        loader = AssetLoader()
+        loader.add_images()
+        loader.add('sound', 'data/sfx/jump.wav')
+        loader.start()
+        ...
+        loader.pump()           # once a frame
+        ...
+        loader.wait('image')    # blocks until every image is in
+
+    The worker only reads and decodes. convert() needs the display, so the
+    decoded images are finished on the calling thread by pump(), a few per
+    frame, or by wait(). Finished images go to the load_image() cache (or the
+    whole atlas is set, when it is up to date), so the assets are put
+    together with load_image()/load_images() as usual afterwards.
+    """
+    def __init__(self, batch=8):
+        self.batch = batch
+        self.jobs = []
+        self.loaded = {}
+        self.finished = queue.Queue()
+        self.thread = None
+
+    def add(self, kind, path):
+        # kind is 'image' (path under data/images/), 'sound' or 'json'
+        self.jobs.append((kind, path))
+
+    def add_images(self):
+        for path in atlas.source_images():
+            self.add('image', path)
+
+    @property
+    def progress(self):
+        return len(self.loaded) / len(self.jobs) if self.jobs else 1.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+
+    def _read(self, kind, path):
+        if kind == 'image':
+            return pygame.image.load(BASE_IMG_PATH + path)
+        if kind == 'sound':
+            return pygame.mixer.Sound(path)
+        with open(path) as f:
+            return json.load(f)
+
+    def _work(self):
+        jobs = self.jobs
+        try:
+            bundle = atlas.read()
+        except (OSError, ValueError):
+            # missing or stale: the images are read one by one
+            bundle = None
+        except Exception as e:
+            # broken some other way: the same, the files are all there
+            warnings.warn('unreadable atlas, loading the images one by one: %r' % e)
+            bundle = None
+        if bundle is not None:
+            # one read covers every image
+            self.finished.put(('atlas', None, bundle))
+            jobs = [job for job in jobs if job[0] != 'image']
+        for kind, path in jobs:
+            try:
+                self.finished.put((kind, path, self._read(kind, path)))
+            except Exception as e:
+                self.finished.put(('error', (kind, path), e))
+
+    def _finish(self, kind, path, value):
+        if kind == 'error':
+            raise value
+        if kind == 'atlas':
+            set_atlas(atlas.Atlas(value[0].convert(), value[1]))
+            for job in self.jobs:
+                if job[0] == 'image':
+                    self.loaded[job] = None
+            return
+        if kind == 'image':
+            add_loaded(path, value)
+            value = None
+        self.loaded[(kind, path)] = value
+
+    def pump(self):
+        # finish up to batch items on this thread, without waiting for the worker
+        for _ in range(self.batch):
+            try:
+                item = self.finished.get_nowait()
+            except queue.Empty:
+                return
+            self._finish(*item)
+
+    def wait(self, kind=None):
+        # finish everything (or every job of kind) before returning
+        for job in self.jobs:
+            if kind is None or job[0] == kind:
+                while job not in self.loaded:
+                    self._finish(*self.finished.get())
+
+    def get(self, kind, path):
+        # a loaded sound or parsed map, waiting for it if need be
+        if (kind, path) not in self.jobs:
+            return self._read(kind, path)
+        while (kind, path) not in self.loaded:
+            self._finish(*self.finished.get())
+        return self.loaded[(kind, path)]
+
+    def take(self, kind, path):
+        # like get(), but hands the value over: asking again reads the file anew
+        value = self.get(kind, path)
+        if (kind, path) in self.jobs:
+            self.jobs.remove((kind, path))
+            del self.loaded[(kind, path)]
+        return value
@@ -0,0 +1,214 @@
+# Binary level format, an alternative to the JSON maps for big levels.
+#
+#   header     '<4sHHHII': magic, version, tile_size, type count, tile count, offgrid count
+#   types      per type: uint8 length + utf-8 name
+#   (padding to a multiple of 8)
+#   tiles      int16 x[n], int16 y[n], uint8 type[n], uint8 variant[n]
+#   offgrid    per tile: uint8 type, uint8 variant, float64 x, float64 y
+#
+# Everything is little endian, types are indices into the type table.
+# Convert from the repo root with:
+#   python -m scripts.mapformat to-binary data/maps/0.json 0.map
+#   python -m scripts.mapformat to-json 0.map 0.json
+import argparse
+import json
+import mmap
+import struct
+
+import numpy as np
+
+from scripts.tilegrid import Chunk, CHUNK_SHIFT, CHUNK_MASK, CHUNK_AREA
+
+MAGIC = b'BOSM'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHII')
+OFFGRID_DTYPE = np.dtype([('type', 'u1'), ('variant', 'u1'), ('x', '<f8'), ('y', '<f8')])
+# chunk coordinates of int16 tile coordinates fit in 12 bits once offset
+CHUNK_KEY_OFFSET = 1 << (15 - CHUNK_SHIFT)
+
+
+def _check_range(name, values, low, high):
+    if len(values) and (values.min() < low or values.max() > high):
+        raise ValueError('%s out of range for the binary map format' % name)
+
+
+def arrays_from_json(map_data):
+    # the JSON map_data as the arrays write() takes
+    type_names = []
+    type_index = {}
+    tiles = list(map_data['tilemap'].values())
+    for tile in tiles + map_data['offgrid']:
+        if tile['type'] not in type_index:
+            type_index[tile['type']] = len(type_names)
+            type_names.append(tile['type'])
+    return {
+        'tile_size': map_data['tile_size'],
+        'type_names': type_names,
+        'x': np.array([tile['pos'][0] for tile in tiles], np.int64),
+        'y': np.array([tile['pos'][1] for tile in tiles], np.int64),
+        'type': np.array([type_index[tile['type']] for tile in tiles], np.int64),
+        'variant': np.array([tile['variant'] for tile in tiles], np.int64),
+        'offgrid': [(type_index[tile['type']], tile['variant'], tile['pos'][0], tile['pos'][1]) for tile in map_data['offgrid']],
+    }
+
+
+def arrays_from_tilemap(tilemap):
+    # a Tilemap as the arrays write() takes, one numpy pass per chunk
+    grid = tilemap.grid
+    type_names = grid.type_names[1:]
+    type_index = {name: i for i, name in enumerate(type_names)}
+    xs, ys, types, variants = [], [], [], []
+    for (cx, cy), chunk in grid.chunks.items():
+        chunk_types = np.frombuffer(bytes(chunk.types), np.uint8)
+        cells = np.flatnonzero(chunk_types)
+        xs.append((cx << CHUNK_SHIFT) + (cells & CHUNK_MASK))
+        ys.append((cy << CHUNK_SHIFT) + (cells >> CHUNK_SHIFT))
+        types.append(chunk_types[cells].astype(np.int64) - 1)
+        variants.append(np.frombuffer(bytes(chunk.variants), np.uint8)[cells])
+    for tile in tilemap.offgrid_tiles:
+        if tile['type'] not in type_index:
+            type_index[tile['type']] = len(type_names)
+            type_names.append(tile['type'])
+    empty = np.zeros(0, np.int64)
+    return {
+        'tile_size': tilemap.tile_size,
+        'type_names': type_names,
+        'x': np.concatenate(xs) if xs else empty,
+        'y': np.concatenate(ys) if ys else empty,
+        'type': np.concatenate(types) if types else empty,
+        'variant': np.concatenate(variants) if variants else empty,
+        'offgrid': [(type_index[tile['type']], tile['variant'], tile['pos'][0], tile['pos'][1]) for tile in tilemap.offgrid_tiles],
+    }
+
+
+def write(path, data):
+    _check_range('tile position', data['x'], -32768, 32767)
+    _check_range('tile position', data['y'], -32768, 32767)
+    _check_range('variant', data['variant'], 0, 255)
+    if len(data['type_names']) > 255:
+        raise ValueError('too many tile types for the binary map format')
+    offgrid = np.array(data['offgrid'], OFFGRID_DTYPE)
+    _check_range('variant', offgrid['variant'], 0, 255)
+
+    parts = [HEADER.pack(MAGIC, VERSION, data['tile_size'], len(data['type_names']), len(data['x']), len(offgrid))]
+    for name in data['type_names']:
+        encoded = name.encode('utf-8')
+        parts.append(struct.pack('<B', len(encoded)) + encoded)
+    size = sum(len(part) for part in parts)
+    parts.append(bytes(-size % 8))
+    parts.append(np.asarray(data['x'], '<i2').tobytes())
+    parts.append(np.asarray(data['y'], '<i2').tobytes())
+    parts.append(np.asarray(data['type'], 'u1').tobytes())
+    parts.append(np.asarray(data['variant'], 'u1').tobytes())
+    parts.append(offgrid.tobytes())
+    with open(path, 'wb') as f:
+        f.write(b''.join(parts))
+
+
+def read(path):
+    # the arrays of a binary map. the file is mapped, not read into Python objects;
+    # the arrays are copied out so the mapping can be closed right away
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, tile_size, type_count, tile_count, offgrid_count = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is not a binary map' % path)
+        if version != VERSION:
+            raise ValueError('%s has map format version %d, expected %d' % (path, version, VERSION))
+        offset = HEADER.size
+        type_names = []
+        for _ in range(type_count):
+            length = mm[offset]
+            type_names.append(mm[offset + 1:offset + 1 + length].decode('utf-8'))
+            offset += 1 + length
+        offset += -offset % 8
+
+        def take(dtype, count):
+            nonlocal offset
+            view = np.frombuffer(mm, dtype, count, offset)
+            offset += view.nbytes
+            array = view.copy()
+            del view
+            return array
+
+        data = {
+            'tile_size': tile_size,
+            'type_names': type_names,
+            'x': take('<i2', tile_count),
+            'y': take('<i2', tile_count),
+            'type': take('u1', tile_count),
+            'variant': take('u1', tile_count),
+        }
+        offgrid = take(OFFGRID_DTYPE, offgrid_count)
+    data['offgrid'] = [(int(t), int(v), float(x), float(y)) for t, v, x, y in offgrid.tolist()]
+    return data
+
+
+def chunk_arrays(data, tids):
+    # the tiles of data by chunk: the (cx, cy) keys and a row of CHUNK_AREA
+    # types (tids, one per tile) and variants per key
+    xs = data['x'].astype(np.int32)
+    ys = data['y'].astype(np.int32)
+    keys = (((xs >> CHUNK_SHIFT) + CHUNK_KEY_OFFSET) << 16) | ((ys >> CHUNK_SHIFT) + CHUNK_KEY_OFFSET)
+    keys, rows = np.unique(keys, return_inverse=True)
+    cells = ((ys & CHUNK_MASK) << CHUNK_SHIFT) | (xs & CHUNK_MASK)
+    types = np.zeros((len(keys), CHUNK_AREA), np.uint8)
+    variants = np.zeros((len(keys), CHUNK_AREA), np.uint8)
+    types[rows, cells] = tids
+    variants[rows, cells] = data['variant']
+    keys = [((key >> 16) - CHUNK_KEY_OFFSET, (key & 0xffff) - CHUNK_KEY_OFFSET) for key in keys.tolist()]
+    return keys, types, variants
+
+
+def make_chunks(keys, types, variants):
+    # {key: Chunk} of chunk_arrays()
+    counts = np.count_nonzero(types, axis=1).tolist()
+    chunks = {}
+    type_bytes = memoryview(np.ascontiguousarray(types).reshape(-1))
+    variant_bytes = memoryview(np.ascontiguousarray(variants).reshape(-1))
+    for row, key in enumerate(keys):
+        chunk = Chunk()
+        start = row * CHUNK_AREA
+        chunk.types[:] = type_bytes[start:start + CHUNK_AREA]
+        chunk.variants[:] = variant_bytes[start:start + CHUNK_AREA]
+        chunk.count = counts[row]
+        chunks[key] = chunk
+    return chunks
+
+
+def fill_grid(grid, data):
+    # puts the tiles of data into grid in bulk: one Chunk per chunk, never one object per tile
+    lookup = np.array([grid.type_id(name) for name in data['type_names']] + [0], np.uint8)
+    grid.set_chunks(make_chunks(*chunk_arrays(data, lookup[data['type']])))
+
+
+def offgrid_tiles(data):
+    # the offgrid section as Tilemap.offgrid_tiles dicts
+    names = data['type_names']
+    return [{'type': names[t], 'variant': v, 'pos': [x, y]} for t, v, x, y in data['offgrid']]
+
+
+def to_json(data):
+    # data as the map_data of a JSON map file
+    names = data['type_names']
+    tilemap = {}
+    for x, y, t, v in zip(data['x'].tolist(), data['y'].tolist(), data['type'].tolist(), data['variant'].tolist()):
+        tilemap[str(x) + ';' + str(y)] = {'type': names[t], 'variant': v, 'pos': [x, y]}
+    return {'tilemap': tilemap, 'tile_size': data['tile_size'], 'offgrid': offgrid_tiles(data)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m scripts.mapformat', description='convert maps between JSON and the binary format')
+    parser.add_argument('direction', choices=['to-binary', 'to-json'])
+    parser.add_argument('source')
+    parser.add_argument('dest')
+    args = parser.parse_args(argv)
+    if args.direction == 'to-binary':
+        with open(args.source) as f:
+            write(args.dest, arrays_from_json(json.load(f)))
+    else:
+        with open(args.dest, 'w') as f:
+            json.dump(to_json(read(args.source)), f)
+
+
+if __name__ == '__main__':
+    main()
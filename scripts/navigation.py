@@ -0,0 +1,167 @@
+import bisect
+import math
+
+from scripts.tilegrid import CHUNK_SHIFT, CHUNK_MASK, CHUNK_AREA, CHUNK_SIZE
+
+
+def find_run(runs, x):
+    # the run of a row (tuples starting left, right, left to right) that x is in, or None
+    i = bisect.bisect_right(runs, (x, math.inf)) - 1
+    if i >= 0 and runs[i][1] >= x:
+        return runs[i]
+    return None
+
+
+def runs_of(first, flags):
+    # (left, right) of the runs of set flags, the flags of the tiles from first on
+    runs = []
+    start = None
+    for x, flag in enumerate(flags, first):
+        if flag:
+            if start is None:
+                start = x
+        elif start is not None:
+            runs.append((start, x - 1))
+            start = None
+    if start is not None:
+        runs.append((start, first + len(flags) - 1))
+    return runs
+
+
+def splice_runs(runs, first, last, local):
+    # replaces the tiles first..last of a row's runs with the runs local, joining the ones that
+    # now touch; the parts of the old runs outside first..last stay. returns the slice that changed
+    i = bisect.bisect_right(runs, (first - 1, math.inf)) - 1
+    if i < 0 or runs[i][1] < first - 1:
+        i += 1
+    j = i
+    parts = list(local)
+    while j < len(runs) and runs[j][0] <= last + 1:
+        left, right = runs[j][:2]
+        if left < first:
+            parts.append((left, first - 1))
+        if right > last:
+            parts.append((last + 1, right))
+        j += 1
+    parts.sort()
+    merged = []
+    for left, right in parts:
+        if merged and merged[-1][1] + 1 >= left:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], right))
+        else:
+            merged.append((left, right))
+    runs[i:j] = merged
+    return i, i + len(merged)
+
+
+class NavigationTable:
+    """
+    Where walkers can go on a tilemap, in tiles, built once after a level
+    loads and patched around the cells that change afterwards:
+
+        spans   horizontal runs of solid tiles, what an enemy stands on,
+                row y -> [(left, right), ...] left to right
+        floors  the parts of the spans with no solid tile above, where it
+                can walk, row y -> [(left, right, left_wall, right_wall), ...]
+
+    A floor ends at a ledge or, when the span goes on under a solid tile,
+    at a wall (left_wall/right_wall). A lookup is a bisect in its row, and
+    a change only redoes the runs next to it, however long they are.
+    """
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+        self.grid = tilemap.grid
+        self.spans = {}
+        self.floors = {}
+        self.stale = True  # everything changed since the last build
+        self.grid.listeners.append(self.changed)
+        self.grid.chunk_listeners.append(self.chunk_changed)
+
+    def changed(self, x, y):
+        if self.stale:
+            return
+        if x is None:
+            self.stale = True
+            return
+        if self.grid.is_solid(x, y) == (find_run(self.spans.get(y, ()), x) is not None):
+            # a variant changed, or a tile was swapped for one as solid
+            return
+        self.patch(x, x, y, y)
+
+    def chunk_changed(self, cx, cy):
+        if self.stale:
+            return
+        x0 = cx << CHUNK_SHIFT
+        y0 = cy << CHUNK_SHIFT
+        self.patch(x0, x0 + CHUNK_SIZE - 1, y0, y0 + CHUNK_SIZE - 1)
+
+    def build(self):
+        # every solid tile of the grid, a chunk at a time
+        solid = self.grid.solid
+        rows = {}
+        for (cx, cy), chunk in self.grid.chunks.items():
+            types = chunk.types
+            base_x = cx << CHUNK_SHIFT
+            base_y = cy << CHUNK_SHIFT
+            for i in range(CHUNK_AREA):
+                if solid[types[i]]:
+                    rows.setdefault(base_y | (i >> CHUNK_SHIFT), []).append(base_x | (i & CHUNK_MASK))
+        self.spans = {}
+        self.floors = {}
+        for y, xs in rows.items():
+            xs.sort()
+            spans = self.spans[y] = []
+            start = xs[0]
+            for prev, x in zip(xs, xs[1:]):
+                if x != prev + 1:
+                    spans.append((start, prev))
+                    start = x
+            spans.append((start, xs[-1]))
+        for y, spans in self.spans.items():
+            floors = self.floor_runs(y, spans)
+            if floors:
+                self.floors[y] = floors
+        self.stale = False
+
+    def floor_runs(self, y, spans):
+        # the floors on the spans of row y, with their walls
+        is_solid = self.grid.is_solid
+        floors = []
+        for left, right in spans:
+            for start, end in runs_of(left, [not is_solid(x, y - 1) for x in range(left, right + 1)]):
+                floors.append((start, end, start > left, end < right))
+        return floors
+
+    def patch(self, first, last, top, bottom):
+        # redoes the spans of rows top..bottom over the tiles first..last, and the floors
+        # on them and on the row under them, whose tiles above are the last row's
+        is_solid = self.grid.is_solid
+        columns = range(first, last + 1)
+        solid = {y: [is_solid(x, y) for x in columns] for y in range(top - 1, bottom + 2)}
+        for y in range(top, bottom + 1):
+            spans = self.spans.setdefault(y, [])
+            splice_runs(spans, first, last, runs_of(first, solid[y]))
+            if not spans:
+                del self.spans[y]
+        for y in range(top, bottom + 2):
+            floors = self.floors.setdefault(y, [])
+            walkable = [tile and not above for tile, above in zip(solid[y], solid[y - 1])]
+            i, j = splice_runs(floors, first, last, runs_of(first, walkable))
+            # a floor's walls are the span going on past its ends
+            floors[i:j] = [(left, right, is_solid(left - 1, y), is_solid(right + 1, y)) for left, right in floors[i:j]]
+            if not floors:
+                del self.floors[y]
+
+    def span(self, tile_x, tile_y):
+        # (left, right) of the solid span at the tile, None when it isn't solid
+        if self.stale:
+            self.build()
+        spans = self.spans.get(tile_y)
+        return find_run(spans, tile_x) if spans else None
+
+    def floor(self, tile_x, tile_y):
+        # (left, right, left_wall, right_wall) of the floor the tile is part of, or None
+        if self.stale:
+            self.build()
+        floors = self.floors.get(tile_y)
+        return find_run(floors, tile_x) if floors else None
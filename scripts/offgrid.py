@@ -0,0 +1,60 @@
+from scripts.broadphase import SpatialHash
+
+
+class OffgridTiles:
+    """
+    The offgrid tiles of a map, in the order they were added (which is the
+    order they are drawn in), bucketed in a SpatialHash by their image rect
+    so drawing and hit-testing only look at the tiles around the camera or
+    the mouse. Iterating, len() and append()/remove() work like the list
+    this replaces; remove() is O(1).
+
+    rect_for(tile) gives the (x, y, w, h) rect a tile covers.
+    """
+    def __init__(self, rect_for, tiles=(), cell_size=64):
+        self.rect_for = rect_for
+        self.index = SpatialHash(cell_size)
+        self.tiles = {}  # order number -> tile, dicts keep insertion order
+        self.numbers = {}  # id(tile) -> order number
+        self.next_number = 0
+        for tile in tiles:
+            self.append(tile)
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def __iter__(self):
+        return iter(list(self.tiles.values()))
+
+    def __contains__(self, tile):
+        return id(tile) in self.numbers
+
+    def copy(self):
+        return list(self.tiles.values())
+
+    def clear(self):
+        self.index.clear()
+        self.tiles = {}
+        self.numbers = {}
+
+    def append(self, tile):
+        number = self.next_number
+        self.next_number += 1
+        self.tiles[number] = tile
+        self.numbers[id(tile)] = number
+        self.index.insert(number, self.rect_for(tile))
+
+    def remove(self, tile):
+        number = self.numbers.pop(id(tile), None)
+        if number is None:
+            raise ValueError('tile is not an offgrid tile of this map')
+        del self.tiles[number]
+        self.index.remove(number)
+
+    def query_rect(self, rect):
+        # tiles overlapping rect, in drawing order
+        return [self.tiles[number] for number in sorted(self.index.query_rect(rect))]
+
+    def query_point(self, pos):
+        # tiles whose rect contains pos, in drawing order
+        return [self.tiles[number] for number in sorted(self.index.query_point(pos))]
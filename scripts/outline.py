@@ -0,0 +1,34 @@
+import pygame
+
+# where the silhouette is drawn around everything on the display
+OUTLINE_OFFSETS = [(-1, 0), (1, 0), (0, 1)]
+
+
+class Outline:
+    """
+    Dark silhouette drawn behind the sprites of the display.
+
+    'mask' is the original pass: build a Mask of the whole display and turn
+    it back into a new surface every frame. 'buffered' reuses one surface:
+    it is filled with the outline color and the display is blitted over it
+    with BLEND_RGBA_MIN, which zeroes the color and caps the alpha at the
+    outline's, giving the same silhouette with no allocation.
+    """
+    def __init__(self, size, mode='buffered', color=(0, 0, 0, 180)):
+        self.mode = mode
+        self.color = color
+        self.silhouette = pygame.Surface(size, pygame.SRCALPHA)
+
+    def render(self, source, dest):
+        if self.mode == 'mask':
+            display_mask = pygame.mask.from_surface(source)
+            display_sillhouette = display_mask.to_surface(setcolor=self.color, unsetcolor=(0, 0, 0, 0))
+            # (0, 1) twice, as the game always did
+            for offset in [(-1, 0), (1, 0), (0, 1), (0, 1)]:
+                dest.blit(display_sillhouette, offset)
+            return
+
+        self.silhouette.fill(self.color)
+        self.silhouette.blit(source, (0, 0), special_flags=pygame.BLEND_RGBA_MIN)
+        for offset in OUTLINE_OFFSETS:
+            dest.blit(self.silhouette, offset)
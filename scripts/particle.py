@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Particle:
     def __init__(self, game, p_type, pos, velocity=[0, 0], frame=0) -> None:
         self.game = game
@@ -22,3 +25,150 @@ class Particle:
         img = self.animation.img()
         surf.blit(img, (self.pos[0] - offset[0] - img.get_width() //
                  2, self.pos[1] - offset[1] - img.get_height() // 2))
+
+
+# horizontal sway of each particle type, as pos[0] += sin(frame * 0.035) * amplitude
+SWAY = {'leaf': 0.3}
+
+
+class ParticleSystem:
+    """
+    All live particles stored as arrays (structure of arrays) instead of one
+    Particle object each. update() moves and animates every particle in one
+    batched step and render() draws them with a single Surface.blits call.
+    Particles that finished their animation are compacted away in bulk.
+    """
+    FIELDS = ('pos', 'prev_pos', 'velocity', 'frame', 'type', 'done')  # one array entry per particle
+
+    def __init__(self, assets, p_types=('leaf', 'particle'), capacity=1024):
+        self.type_ids = {}
+        self.images = []  # images of every type, one flat list
+        first_image = []
+        img_duration = []
+        last_frame = []
+        loop = []
+        sway = []
+        for p_type in p_types:
+            animation = assets['particle/' + p_type]
+            self.type_ids[p_type] = len(self.type_ids)
+            first_image.append(len(self.images))
+            self.images += animation.images
+            img_duration.append(animation.img_duration)
+            last_frame.append(animation.img_duration * len(animation.images) - 1)
+            loop.append(animation.loop)
+            sway.append(SWAY.get(p_type, 0))
+        self.first_image = np.array(first_image)
+        self.img_duration = np.array(img_duration)
+        self.last_frame = np.array(last_frame)
+        self.loop = np.array(loop)
+        self.sway = np.array(sway)
+        # blit offset that centers each image on the particle position
+        self.half_size = np.array([(img.get_width() // 2, img.get_height() // 2) for img in self.images]).reshape(-1, 2)
+
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.prev_pos = np.zeros((capacity, 2))  # pos before the last update, for drawing in between
+        self.velocity = np.zeros((capacity, 2))
+        self.frame = np.zeros(capacity, dtype=np.int32)
+        self.type = np.zeros(capacity, dtype=np.int32)
+        self.done = np.zeros(capacity, dtype=bool)
+        self.kill = None  # particles to drop on the next update
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+        self.kill = None
+
+    def snapshot(self):
+        state = {name: getattr(self, name)[:self.count].copy() for name in self.FIELDS}
+        state['kill'] = None if self.kill is None else self.kill.copy()
+        return state
+
+    def restore(self, state):
+        n = len(state[self.FIELDS[0]])
+        self.count = 0
+        self._reserve(n)
+        for name in self.FIELDS:
+            getattr(self, name)[:n] = state[name]
+        self.count = n
+        self.kill = None if state['kill'] is None else state['kill'].copy()
+
+    def _reserve(self, n):
+        needed = self.count + n
+        capacity = len(self.frame)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, p_type, pos, velocity=(0, 0), frame=0):
+        self._reserve(1)
+        i = self.count
+        self.pos[i] = pos
+        self.prev_pos[i] = pos
+        self.velocity[i] = velocity
+        self.frame[i] = frame
+        self.type[i] = self.type_ids[p_type]
+        self.done[i] = False
+        self.count += 1
+
+    def spawn_many(self, p_type, pos, velocities, frames):
+        # pos is one shared position or one per particle
+        n = len(frames)
+        self._reserve(n)
+        new = slice(self.count, self.count + n)
+        self.pos[new] = pos
+        self.prev_pos[new] = pos
+        self.velocity[new] = velocities
+        self.frame[new] = frames
+        self.type[new] = self.type_ids[p_type]
+        self.done[new] = False
+        self.count += n
+
+    def _compact(self):
+        # drop the particles flagged last update, particles spawned since are kept
+        kill = self.kill
+        self.kill = None
+        if kill is None or not kill.any():
+            return
+        keep = np.concatenate((np.flatnonzero(~kill), np.arange(len(kill), self.count)))
+        for arr in (self.pos, self.prev_pos, self.velocity, self.frame, self.type, self.done):
+            arr[:len(keep)] = arr[keep]
+        self.count = len(keep)
+
+    def update(self):
+        self._compact()
+        n = self.count
+        p_type = self.type[:n]
+        frame = self.frame[:n]
+        last = self.last_frame[p_type]
+        # a particle whose animation is done is drawn one last time, then removed
+        self.kill = self.done[:n].copy()
+        self.prev_pos[:n] = self.pos[:n]
+        self.pos[:n] += self.velocity[:n]
+        loop = self.loop[p_type]
+        frame[:] = np.where(loop, (frame + 1) % (last + 1), np.minimum(frame + 1, last))
+        self.done[:n] |= ~loop & (frame >= last)
+        self.pos[:n, 0] += np.sin(frame * 0.035) * self.sway[p_type]
+
+    def render(self, surf, offset=(0, 0), alpha=1.0):
+        # alpha < 1 draws the particles that far from prev_pos to pos
+        n = self.count
+        if not n:
+            return
+        p_type = self.type[:n]
+        image = self.first_image[p_type] + self.frame[:n] // self.img_duration[p_type]
+        pos = self.pos[:n]
+        if alpha != 1.0:
+            pos = self.prev_pos[:n] + (pos - self.prev_pos[:n]) * alpha
+        dest = (pos - offset - self.half_size[image]).astype(np.int32)
+        images = self.images
+        surf.blits(zip([images[i] for i in image.tolist()], zip(dest[:, 0].tolist(), dest[:, 1].tolist())),
+                   doreturn=False)
@@ -0,0 +1,240 @@
+import numpy as np
+
+from scripts.collision import SolidBitmap
+
+# columns of PhysicsWorld.collisions
+DIRECTIONS = ('up', 'down', 'right', 'left')
+UP, DOWN, RIGHT, LEFT = range(4)
+DIRECTION_INDEX = {name: i for i, name in enumerate(DIRECTIONS)}
+# fewer bodies than this are moved one at a time, numpy's cost per call is more than it saves
+MIN_BATCH = 32
+
+
+class Collisions:
+    # an entity's collision flags as the dict they always were, over its row of PhysicsWorld.collisions
+    __slots__ = ('row',)
+
+    def __init__(self, row):
+        self.row = row
+
+    def __getitem__(self, name):
+        return bool(self.row[DIRECTION_INDEX[name]])
+
+    def __setitem__(self, name, value):
+        self.row[DIRECTION_INDEX[name]] = value
+
+    def __copy__(self):
+        return {name: bool(flag) for name, flag in zip(DIRECTIONS, self.row)}
+
+
+class PhysicsWorld:
+    """
+    Positions, velocities, sizes and collision flags of PhysicsEntities in
+    arrays, moved in one batched step against a SolidBitmap of the tilemap.
+
+        world.add(entity)                       # entity.pos etc. now view the arrays
+        world.step(entities, movements)         # PhysicsEntity.update's physics, for all at once
+
+    An entity's pos and velocity become rows of pos and velocity, and its
+    collisions a Collisions view, so code written for one entity keeps
+    working; assign into them (pos[:] = ...) rather than replacing them.
+    Movement is swept: a body stops at the first solid tile in its path,
+    however far it goes in a tick. For moves shorter than a tile, from
+    outside the tiles, that is where PhysicsEntity.update stops it too.
+    """
+    FIELDS = ('pos', 'velocity', 'size', 'collisions')  # one array entry per body
+
+    def __init__(self, tilemap, capacity=64):
+        self.tilemap = tilemap
+        self.bitmap = SolidBitmap(tilemap)
+        self.count = 0
+        self.entities = []  # body index -> entity
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.size = np.zeros((capacity, 2), np.int64)
+        self.collisions = np.zeros((capacity, 4), bool)
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        capacity = len(self.pos) * 2
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        # the entities still view the old arrays
+        for body, entity in enumerate(self.entities):
+            self._attach(entity, body)
+
+    def _attach(self, entity, body):
+        entity.body = body
+        entity.pos = self.pos[body]
+        entity.velocity = self.velocity[body]
+        entity.collisions = Collisions(self.collisions[body])
+
+    def _load(self, entity, body):
+        # copies the entity's own values into its body
+        self.pos[body] = entity.pos
+        self.velocity[body] = entity.velocity
+        self.size[body] = entity.size
+        self.collisions[body] = [entity.collisions[name] for name in DIRECTIONS]
+
+    def add(self, entity):
+        if self.count == len(self.pos):
+            self._grow()
+        body = self.count
+        self.count += 1
+        self.entities.append(entity)
+        self._load(entity, body)
+        entity.world = self
+        self._attach(entity, body)
+
+    def remove(self, entity):
+        # the entity keeps copies of its values, the last body moves into the freed slot
+        body = entity.body
+        last = self.count - 1
+        entity.pos = self.pos[body].tolist()
+        entity.velocity = self.velocity[body].tolist()
+        entity.collisions = Collisions(self.collisions[body]).__copy__()
+        entity.world = None
+        entity.body = None
+        if body != last:
+            for name in self.FIELDS:
+                array = getattr(self, name)
+                array[body] = array[last]
+            moved = self.entities[body] = self.entities[last]
+            self._attach(moved, body)
+        self.entities.pop()
+        self.count = last
+
+    def sync(self, entity):
+        # after the entity's attributes were replaced (PhysicsEntity.restore): back into its body
+        self._load(entity, entity.body)
+        self._attach(entity, entity.body)
+
+    def move(self, entity, movement):
+        # step() for one entity, without numpy: arrays of one cost more than they save
+        body = entity.body
+        ts = self.tilemap.tile_size
+        is_solid = self.tilemap.grid.is_solid
+        pos = self.pos[body].tolist()
+        velocity = self.velocity[body].tolist()
+        size = self.size[body].tolist()
+        frame_movement = (movement[0] + velocity[0], movement[1] + velocity[1])
+        flags = [False] * 4
+        for axis in (0, 1):
+            other = 1 - axis
+            start = int(pos[axis])
+            pos[axis] += frame_movement[axis]
+            lead = int(pos[axis])
+            length = size[axis]
+            cross = int(pos[other])
+            rows = range(cross // ts, (cross + size[other] - 1) // ts + 1)
+            first = lead // ts
+            last = (lead + length - 1) // ts
+            delta = frame_movement[axis]
+            if delta > 0:
+                tiles = range(min(first, -(-(start + length) // ts)), last + 1)
+            elif delta < 0:
+                tiles = range(max(last, start // ts - 1), first - 1, -1)
+            else:
+                tiles = range(first, last + 1)
+            hit = None
+            for tile in tiles:
+                for row in rows:
+                    if is_solid(tile, row) if axis == 0 else is_solid(row, tile):
+                        hit = tile
+                        break
+                if hit is not None:
+                    break
+            if hit is None:
+                continue
+            if delta > 0:
+                pos[axis] = hit * ts - length
+                flags[DOWN if axis else RIGHT] = True
+            elif delta < 0:
+                pos[axis] = (hit + 1) * ts
+                flags[UP if axis else LEFT] = True
+            else:
+                pos[axis] = lead
+        velocity[1] = min(5, velocity[1] + 0.1)
+        if flags[DOWN] or flags[UP]:
+            velocity[1] = 0
+        self.pos[body] = pos
+        self.velocity[body] = velocity
+        self.collisions[body] = flags
+
+    def step(self, entities, movements):
+        # moves entities by their velocity plus movements (one (x, y) each), resolves their
+        # collisions with the tiles, an axis at a time, and applies gravity. returns
+        # where they were before, as [x, y] lists
+        if len(entities) < MIN_BATCH:
+            before = [self.pos[entity.body].tolist() for entity in entities]
+            for entity, movement in zip(entities, movements):
+                self.move(entity, movement)
+            return before
+        bodies = np.fromiter((entity.body for entity in entities), np.intp, len(entities))
+        before = self.pos[bodies].tolist()
+        pos = self.pos[bodies]
+        velocity = self.velocity[bodies]
+        size = self.size[bodies]
+        frame_movement = np.asarray(movements, float).reshape(-1, 2) + velocity
+        flags = np.zeros((len(bodies), 4), bool)
+        for axis in (0, 1):
+            start = np.trunc(pos[:, axis]).astype(np.int64)
+            pos[:, axis] += frame_movement[:, axis]
+            self._resolve(pos, size, frame_movement[:, axis], start, axis, flags)
+        velocity[:, 1] = np.minimum(5, velocity[:, 1] + 0.1)
+        velocity[flags[:, DOWN] | flags[:, UP], 1] = 0
+        self.pos[bodies] = pos
+        self.velocity[bodies] = velocity
+        self.collisions[bodies] = flags
+        return before
+
+    def rects(self, entities):
+        # (x, y, w, h) of each entity's rect, as ints
+        bodies = np.fromiter((entity.body for entity in entities), np.intp, len(entities))
+        rects = np.empty((len(bodies), 4), np.int64)
+        rects[:, :2] = np.trunc(self.pos[bodies])
+        rects[:, 2:] = self.size[bodies]
+        return rects.tolist()
+
+    def _resolve(self, pos, size, delta, start, axis, flags):
+        # moves every body back out of the tiles along axis, as PhysicsEntity.update does
+        ts = self.tilemap.tile_size
+        other = 1 - axis
+        lead = np.trunc(pos[:, axis]).astype(np.int64)  # where the rect is, like pygame.Rect truncates
+        length = size[:, axis]
+        cross = np.trunc(pos[:, other]).astype(np.int64)
+        cross_first = cross // ts
+        cross_last = (cross + size[:, other] - 1) // ts
+        forward = delta > 0
+        backward = delta < 0
+        # tiles the rect ends up in, plus the ones its leading edge went through
+        first = lead // ts
+        last = (lead + length - 1) // ts
+        first = np.where(forward, np.minimum(first, -(-(start + length) // ts)), first)
+        last = np.where(backward, np.maximum(last, start // ts - 1), last)
+
+        # the nearest solid tile along the direction of movement
+        span = last - first
+        steps = np.arange(int(span.max()) + 1)
+        tiles = np.where(backward[:, None], last[:, None] - steps, first[:, None] + steps)
+        solid = np.zeros(tiles.shape, bool)
+        for offset in range(int((cross_last - cross_first).max()) + 1):
+            row = cross_first + offset
+            if axis == 0:
+                found = self.bitmap.lookup(tiles, row[:, None])
+            else:
+                found = self.bitmap.lookup(row[:, None], tiles)
+            solid |= found & (row <= cross_last)[:, None]
+        solid &= steps <= span[:, None]
+        hit = solid.any(axis=1)
+        tile = tiles[np.arange(len(tiles)), solid.argmax(axis=1)]
+
+        resolved = np.where(forward, tile * ts - length, np.where(backward, (tile + 1) * ts, lead))
+        pos[hit, axis] = resolved[hit]
+        flags[:, (DOWN if axis else RIGHT)] = hit & forward
+        flags[:, (UP if axis else LEFT)] = hit & backward
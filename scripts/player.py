@@ -1,7 +1,6 @@
 import random
 import math
 from scripts.entity import PhysicsEntity
-from scripts.particle import Particle
 
 class Player(PhysicsEntity):
     def __init__(self, game, pos, size):
@@ -43,7 +42,7 @@ class Player(PhysicsEntity):
                 angle = random.random() * math.pi * 2
                 speed = random.random() * 0.5 + 0.5
                 pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed]
-                self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
+                self.game.particles.spawn('particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7))
         if self.dashing > 0:
             self.dashing = max(0, self.dashing - 1)
         if self.dashing < 0:
@@ -53,7 +52,7 @@ class Player(PhysicsEntity):
             if abs(self.dashing) == 51:
                 self.velocity[0] *= 0.1
             pvelocity = [abs(self.dashing) / self.dashing * random.random() * 3, 0]
-            self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
+            self.game.particles.spawn('particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7))
         if self.velocity[0] > 0:
             self.velocity[0] = max(self.velocity[0] - 0.1, 0)
         else:
@@ -79,9 +78,9 @@ class Player(PhysicsEntity):
             self.air_time = 5
             return True
 
-    def render(self, surf, offset=(0, 0)):
+    def render(self, surf, offset=(0, 0), alpha=1.0):
         if abs(self.dashing) <= 50:
-            super().render(surf, offset=offset)
+            super().render(surf, offset=offset, alpha=alpha)
 
     def dash(self):
         if not self.dashing:
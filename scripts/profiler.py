@@ -0,0 +1,168 @@
+import csv
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+PERCENTILES = (50, 95, 99)
+
+
+class NullScope:
+    # what stage() hands out while the profiler is off: entering it does nothing
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SCOPE = NullScope()
+
+
+class Scope:
+    __slots__ = ('events', 'name', 'start')
+
+    def __init__(self, events, name):
+        self.events = events
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.events.append((self.name, self.start, time.perf_counter()))
+        return False
+
+
+class Profiler:
+    """
+    Named stage timers for the game loop, keeping the last `frames` frames.
+
+        profiler.next_frame()           # once at the top of every frame
+        with profiler.stage('tilemap'):
+            tilemap.render(...)
+
+    A frame lasts from one next_frame() to the next, so stages timed after
+    the game step (presenting, the frame cap) count towards it too. Stages
+    of the same name must not nest. While disabled, stage() returns a
+    shared do-nothing scope and next_frame() returns right away.
+    """
+    def __init__(self, frames=600, enabled=False):
+        self.enabled = enabled
+        self.history = deque(maxlen=frames)  # (frame start, frame end, [(stage, start, end)])
+        self.events = []
+        self.frame_start = None
+        self.scopes = {}
+        self.origin = time.perf_counter()
+
+    def clear(self):
+        self.history.clear()
+        self.frame_start = None
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.frame_start = None
+
+    def next_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.history.append((self.frame_start, now, self.events))
+        self.frame_start = now
+        self.events = []
+        # the scopes append to the frame's own list
+        for scope in self.scopes.values():
+            scope.events = self.events
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = Scope(self.events, name)
+        return scope
+
+    def stage_names(self):
+        names = {}
+        for _, _, events in self.history:
+            for name, _, _ in events:
+                names[name] = None
+        return list(names)
+
+    def percentiles(self, percentiles=PERCENTILES):
+        # {stage: [ms at each percentile]} over the frames kept, plus 'frame' for whole frames.
+        # a stage that ran several times in a frame counts with its total
+        names = self.stage_names()
+        if not self.history:
+            return {}
+        column = {name: i for i, name in enumerate(names)}
+        times = np.zeros((len(self.history), len(names) + 1))
+        for row, (start, end, events) in enumerate(self.history):
+            times[row, -1] = end - start
+            for name, stage_start, stage_end in events:
+                times[row, column[name]] += stage_end - stage_start
+        values = np.percentile(times * 1000, percentiles, axis=0)
+        result = {name: values[:, column[name]].tolist() for name in names}
+        result['frame'] = values[:, -1].tolist()
+        return result
+
+    def export_chrome(self, path):
+        # chrome://tracing (and Perfetto) JSON, one complete event per stage and per frame
+        events = []
+        for number, (start, end, stages) in enumerate(self.history):
+            events.append({'name': 'frame', 'cat': 'frame', 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6, 'args': {'frame': number}})
+            for name, stage_start, stage_end in stages:
+                events.append({'name': name, 'cat': 'stage', 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': (stage_start - self.origin) * 1e6, 'dur': (stage_end - stage_start) * 1e6})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export_csv(self, path):
+        # one row per stage per frame, times in ms from the first frame kept
+        origin = self.history[0][0] if self.history else 0.0
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'stage', 'start_ms', 'duration_ms'])
+            for number, (start, end, stages) in enumerate(self.history):
+                writer.writerow([number, 'frame', round((start - origin) * 1000, 4), round((end - start) * 1000, 4)])
+                for name, stage_start, stage_end in stages:
+                    writer.writerow([number, name, round((stage_start - origin) * 1000, 4), round((stage_end - stage_start) * 1000, 4)])
+
+
+class ProfilerOverlay:
+    """
+    Table of p50/p95/p99 stage times drawn over the screen. The text is
+    rendered again every `interval` frames only.
+    """
+    def __init__(self, profiler, interval=30, font_size=12):
+        self.profiler = profiler
+        self.interval = interval
+        self.font = pygame.font.SysFont('monospace', font_size)
+        self.lines = []
+        self.frames = 0
+        self.background = None
+
+    def refresh(self):
+        header = '%-12s %7s %7s %7s' % ('ms', 'p50', 'p95', 'p99')
+        rows = [header] + ['%-12s %7.2f %7.2f %7.2f' % (name, *values) for name, values in self.profiler.percentiles().items()]
+        self.lines = [self.font.render(row, True, (255, 255, 255)) for row in rows]
+        width = max(line.get_width() for line in self.lines) + 8
+        height = sum(line.get_height() for line in self.lines) + 8
+        self.background = pygame.Surface((width, height))
+        self.background.set_alpha(160)
+
+    def render(self, surf):
+        if self.frames % self.interval == 0:
+            self.refresh()
+        self.frames += 1
+        surf.blit(self.background, (0, 0))
+        y = 4
+        for line in self.lines:
+            surf.blit(line, (4, y))
+            y += line.get_height()
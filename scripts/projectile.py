@@ -0,0 +1,162 @@
+import numpy as np
+
+from scripts.tilegrid import CHUNK_SHIFT
+
+MAX_AGE = 360  # frames a projectile flies before it disappears
+NEVER = 1 << 30  # impact frame of a projectile that won't hit a tile in time
+
+
+class ProjectileSystem:
+    """
+    Pooled storage for the enemies' projectiles. Projectiles fly along their
+    row at a constant speed, so the frame on which each one enters a solid
+    tile is worked out once at spawn with a walk along the tile row. The
+    per-frame work is then a timer compare plus the player hit test. When a
+    streamed chunk comes in or goes out, the projectiles along its rows
+    work theirs out again from where they are.
+    """
+    FIELDS = ('pos', 'prev_pos', 'speed', 'timer', 'impact')  # one array entry per projectile
+
+    def __init__(self, tilemap, img, capacity=64):
+        self.tilemap = tilemap
+        self.img = img
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.prev_pos = np.zeros((capacity, 2))  # pos before the last update, for drawing in between
+        self.speed = np.zeros(capacity)
+        self.timer = np.zeros(capacity, dtype=np.int32)
+        self.impact = np.zeros(capacity, dtype=np.int32)  # timer value of the tile hit
+        self.kill = None  # projectiles to drop on the next update
+        tilemap.grid.chunk_listeners.append(self.chunk_changed)
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+        self.kill = None
+
+    def snapshot(self):
+        state = {name: getattr(self, name)[:self.count].copy() for name in self.FIELDS}
+        state['kill'] = None if self.kill is None else self.kill.copy()
+        return state
+
+    def restore(self, state):
+        n = len(state[self.FIELDS[0]])
+        self.count = 0
+        self._reserve(n)
+        for name in self.FIELDS:
+            getattr(self, name)[:n] = state[name]
+        self.count = n
+        self.kill = None if state['kill'] is None else state['kill'].copy()
+
+    def _reserve(self, n):
+        needed = self.count + n
+        capacity = len(self.speed)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def impact_frame(self, pos, speed):
+        # projectiles move first and check the tile after, so the frame k we
+        # want is the first k >= 1 with a solid tile at pos[0] + k * speed.
+        # the tile is checked before the age, so frame MAX_AGE + 1 still hits
+        ts = self.tilemap.tile_size
+        if abs(speed) >= ts:
+            # too fast to visit every column on the way, sample the frames instead
+            for k in range(1, MAX_AGE + 2):
+                if self.tilemap.solid_check((pos[0] + k * speed, pos[1])):
+                    return k
+            return NEVER
+        start_col = int((pos[0] + speed) // ts)
+        end_col = int((pos[0] + speed * (MAX_AGE + 1)) // ts)
+        col = self.tilemap.first_solid_in_row(int(pos[1] // ts), start_col, end_col)
+        if col is None:
+            return NEVER
+        if col == start_col:
+            return 1
+        # first frame the projectile's x is inside the column
+        edge = col * ts if speed > 0 else (col + 1) * ts
+        k = max(1, int((edge - pos[0]) / speed))
+        while int((pos[0] + k * speed) // ts) != col:
+            k += 1
+        return k
+
+    def chunk_changed(self, cx, cy):
+        # the tiles ahead of the projectiles in the chunk's rows changed
+        n = self.count
+        if not n:
+            return
+        rows = (self.pos[:n, 1] // self.tilemap.tile_size).astype(np.int64) >> CHUNK_SHIFT
+        for i in np.flatnonzero(rows == cy).tolist():
+            self.impact[i] = self.timer[i] + self.impact_frame(self.pos[i].tolist(), self.speed[i])
+
+    def spawn(self, pos, speed):
+        self._reserve(1)
+        i = self.count
+        self.pos[i] = pos
+        self.prev_pos[i] = pos
+        self.speed[i] = speed
+        self.timer[i] = 0
+        self.impact[i] = self.impact_frame(pos, speed)
+        self.count += 1
+
+    def spawn_many(self, positions, speeds):
+        n = len(speeds)
+        self._reserve(n)
+        new = slice(self.count, self.count + n)
+        self.pos[new] = positions
+        self.prev_pos[new] = positions
+        self.speed[new] = speeds
+        self.timer[new] = 0
+        self.impact[new] = [self.impact_frame(pos, speed) for pos, speed in zip(positions, speeds)]
+        self.count += n
+
+    def _compact(self):
+        kill = self.kill
+        self.kill = None
+        if kill is None or not kill.any():
+            return
+        keep = np.concatenate((np.flatnonzero(~kill), np.arange(len(kill), self.count)))
+        for arr in (self.pos, self.prev_pos, self.speed, self.timer, self.impact):
+            arr[:len(keep)] = arr[keep]
+        self.count = len(keep)
+
+    def update(self, player_rect=None):
+        # player_rect is None while the player can't be hit (dashing).
+        # returns (positions and speeds of projectiles that hit a tile, positions of player hits)
+        self._compact()
+        n = self.count
+        pos = self.pos[:n]
+        self.prev_pos[:n] = pos
+        pos[:, 0] += self.speed[:n]
+        self.timer[:n] += 1
+        wall = self.timer[:n] >= self.impact[:n]
+        kill = wall | (self.timer[:n] > MAX_AGE)
+        hits = np.zeros(n, dtype=bool)
+        if player_rect is not None:
+            hits = ~kill & (pos[:, 0] >= player_rect.left) & (pos[:, 0] < player_rect.right) \
+                & (pos[:, 1] >= player_rect.top) & (pos[:, 1] < player_rect.bottom)
+            kill |= hits
+        # removed on the next update, after being drawn one last time
+        self.kill = kill
+        return pos[wall].tolist(), self.speed[:n][wall].tolist(), pos[hits].tolist()
+
+    def render(self, surf, offset=(0, 0), alpha=1.0):
+        # alpha < 1 draws the projectiles that far from prev_pos to pos
+        n = self.count
+        if not n:
+            return
+        pos = self.pos[:n]
+        if alpha != 1.0:
+            pos = self.prev_pos[:n] + (pos - self.prev_pos[:n]) * alpha
+        half = (self.img.get_width() / 2 + offset[0], self.img.get_height() / 2 + offset[1])
+        dest = (pos - half).astype(np.int32)
+        img = self.img
+        surf.blits([(img, xy) for xy in zip(dest[:, 0].tolist(), dest[:, 1].tolist())], doreturn=False)
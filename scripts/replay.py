@@ -0,0 +1,103 @@
+# Recorded play sessions: the RNG seed and one byte of actions per frame,
+# plus a hash of the game state after every frame so a replay can tell when
+# it stops matching the recording.
+#
+#   header     '<4sHQI': magic, version, seed, frame count
+#   body       zlib of uint8 actions[frames] + uint32 hashes[frames]
+import random
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'BOSR'
+VERSION = 1
+HEADER = struct.Struct('<4sHQI')
+
+# action bits: left and right are held, jump and dash were pressed that frame
+LEFT = 1
+RIGHT = 2
+JUMP = 4
+DASH = 8
+
+
+class ReplayDivergence(Exception):
+    def __init__(self, frame):
+        super().__init__('replay diverged from the recording at frame %d' % frame)
+        self.frame = frame
+
+
+def state_hash(game):
+    # crc32 of what decides how the game goes on: the player, the enemies,
+    # the projectiles, the level and how far the RNG has been drawn
+    player = game.player
+    parts = [
+        struct.pack('<iiddddii', game.level, game.dead, player.pos[0], player.pos[1],
+                    player.velocity[0], player.velocity[1], player.health, player.dashing),
+        struct.pack('<%dd' % (len(game.enemies) * 2), *[v for enemy in game.enemies for v in enemy.pos]),
+        game.projectiles.pos[:game.projectiles.count].tobytes(),
+        struct.pack('<III', len(game.particles), len(game.sparks), random.getstate()[1][-1]),
+    ]
+    return zlib.crc32(b''.join(parts))
+
+
+class Recorder:
+    # collects the frames of a session, save() writes them to path
+    def __init__(self, path, seed):
+        self.path = path
+        self.seed = seed
+        self.actions = bytearray()
+        self.hashes = []
+
+    def __len__(self):
+        return len(self.actions)
+
+    def record(self, actions, state):
+        self.actions.append(actions)
+        self.hashes.append(state)
+
+    def save(self):
+        body = bytes(self.actions) + np.array(self.hashes, '<u4').tobytes()
+        with open(self.path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed, len(self.actions)))
+            f.write(zlib.compress(body, 9))
+
+
+class Replay:
+    """
+    A recording played back a frame at a time: next_actions() gives the
+    actions of the coming frame and check() compares the state after it
+    with the recorded hash, raising ReplayDivergence when they differ.
+    """
+    def __init__(self, seed, actions, hashes):
+        self.seed = seed
+        self.actions = actions
+        self.hashes = hashes
+        self.frame = 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, seed, frames = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is not a recording' % path)
+        if version != VERSION:
+            raise ValueError('%s has recording version %d, expected %d' % (path, version, VERSION))
+        body = zlib.decompress(data[HEADER.size:])
+        return cls(seed, body[:frames], np.frombuffer(body, '<u4', frames, frames).tolist())
+
+    def __len__(self):
+        return len(self.actions)
+
+    @property
+    def done(self):
+        return self.frame >= len(self.actions)
+
+    def next_actions(self):
+        return self.actions[self.frame]
+
+    def check(self, state):
+        if state != self.hashes[self.frame]:
+            raise ReplayDivergence(self.frame)
+        self.frame += 1
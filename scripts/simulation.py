@@ -0,0 +1,372 @@
+import json
+import math
+import os
+import random
+
+import pygame
+
+from scripts.player import Player
+from scripts.enemy import Enemy, EnemyManager
+from scripts.utils import BASE_IMG_PATH, Animation
+from scripts.tilemap import Tilemap
+from scripts.cloud import Clouds
+from scripts.particle import ParticleSystem
+from scripts.spark import SparkSystem
+from scripts.projectile import ProjectileSystem
+from scripts.broadphase import SpatialHash
+from scripts.physics import PhysicsWorld
+from scripts.profiler import Profiler
+from scripts.replay import state_hash, LEFT, RIGHT, JUMP, DASH
+from scripts.streaming import WorldStreamer
+
+VIEW_SIZE = (320, 240)  # what the camera shows, in game pixels
+DASH_MARGIN = 16  # inflate() adds 8 px a side, more than an enemy moves in a frame
+# animations of the game: asset name -> (image directory, Animation arguments)
+ANIMATIONS = {
+    'enemy/idle': ('entities/enemy/idle', {'img_dur': 6}),
+    'enemy/run': ('entities/enemy/run', {'img_dur': 4}),
+    'player/idle': ('entities/player/idle', {'img_dur': 6}),
+    'player/run': ('entities/player/run', {'img_dur': 4}),
+    'player/jump': ('entities/player/jump', {}),
+    'player/slide': ('entities/player/slide', {}),
+    'player/wall_slide': ('entities/player/wall_slide', {}),
+    'particle/leaf': ('particles/leaf', {'img_dur': 20, 'loop': False}),
+    'particle/particle': ('particles/particle', {'img_dur': 6, 'loop': False}),
+}
+SOUNDS = ('jump', 'dash', 'hit', 'shoot', 'ambience')
+
+
+def level_path(map_id):
+    return 'data/maps/' + str(map_id) + '.json'
+
+
+def _raw_images(path):
+    return [pygame.image.load(BASE_IMG_PATH + path + '/' + name) for name in sorted(os.listdir(BASE_IMG_PATH + path))]
+
+
+def headless_assets():
+    # the assets the simulation reads, without a display: images are decoded
+    # but not converted and animations get no flipped frames. only their
+    # counts and sizes matter, nothing is drawn
+    assets = {'clouds': _raw_images('clouds'), 'projectile': pygame.image.load(BASE_IMG_PATH + 'projectile.png')}
+    for name, (path, kwargs) in ANIMATIONS.items():
+        images = _raw_images(path)
+        assets[name] = Animation(images, flipped=images, **kwargs)
+    return assets
+
+
+class SilentSound:
+    def play(self, *args, **kwargs):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+
+def silent_sfx():
+    return {name: SilentSound() for name in SOUNDS}
+
+
+class Simulation:
+    """
+    The game's state and rules without a window: levels, the player, the
+    enemies and what they shoot, advanced a tick at a time by tick(). Game
+    builds on it with the display, sound, keyboard and rendering.
+
+        sim = Simulation(headless_assets(), silent_sfx(), seed=1)
+        sim.tick(RIGHT | JUMP)
+
+    Everything random draws from the global random module, seeded by seed.
+    Runs of the same seed and actions are identical. With batched_physics
+    the player and the enemies move in a PhysicsWorld and an EnemyManager
+    runs the enemies, all in one step; the game plays the same either way.
+    With stream, the directory of a streamed level (scripts/streaming.py),
+    that level is the only one and a WorldStreamer brings its parts in
+    around the camera.
+    """
+    def __init__(self, assets, sfx, seed=None, chunk_cache=False, batched_physics=False, stream=None):
+        if seed is not None:
+            # everything random in the game draws from the global RNG, clouds included
+            random.seed(seed)
+        self.assets = assets
+        self.sfx = sfx
+        if not hasattr(self, 'profiler'):
+            self.profiler = Profiler()
+        # input of the session being recorded, or the recording being played back
+        self.recorder = None
+        self.replay = None
+        self.movement = [False, False]
+        self.particles = ParticleSystem(self.assets)
+        self.sparks = SparkSystem()
+        self.clouds = Clouds(self.assets['clouds'], count=16)
+        self.player = Player(self, (50, 50), (8, 15))
+        # the chunk cache is for drawing, only Game wants it
+        self.tilemap = Tilemap(self, tile_size=16, chunk_cache=chunk_cache)
+        self.projectiles = ProjectileSystem(self.tilemap, self.assets['projectile'])
+        self.physics = None
+        self.enemy_manager = None
+        if batched_physics:
+            self.physics = PhysicsWorld(self.tilemap)
+            self.physics.add(self.player)
+            self.enemy_manager = EnemyManager(self)
+        # enemies by tile-sized cell, so dash hits only look at enemies near the player
+        self.enemy_grid = SpatialHash(self.tilemap.tile_size)
+        self.enemies = []
+        self.dash_targets = set()
+        self.streamer = None
+        if stream is not None:
+            self.streamer = WorldStreamer(self, stream)
+        # parsed levels, spawners already taken out; see level_template()
+        self.levels = {}
+        self.level_count = len(os.listdir('data/maps'))
+        self.level = 0
+        self.load_level(self.level)
+        self.screenshake = 0
+        self.current_level_passed = False
+
+    def read_level(self, map_id):
+        with open(level_path(map_id)) as f:
+            return json.load(f)
+
+    def level_template(self, map_id):
+        # a level as read from its map file, kept so reloading it needs no disk access
+        template = self.levels.get(map_id)
+        if template is None:
+            self.tilemap.load_data(self.read_level(map_id))
+            leaf_spawners = []
+            for tree in self.tilemap.extract([('large_decor', 2)], keep=True):
+                leaf_spawners.append(tuple(pygame.Rect(4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13)))
+            player_pos = None
+            enemy_positions = []
+            for spawner in self.tilemap.extract([('spawners', 0), ('spawners', 1)]):
+                if spawner['variant'] == 0:
+                    player_pos = tuple(spawner['pos'])
+                else:
+                    enemy_positions.append(tuple(spawner['pos']))
+            template = self.levels[map_id] = {
+                'tilemap': self.tilemap.snapshot(),
+                'leaf_spawners': tuple(leaf_spawners),
+                'player': player_pos,
+                'enemies': tuple(enemy_positions),
+            }
+        return template
+
+    def load_level(self, map_id):
+        if self.streamer is not None:
+            self.streamer.start()
+        else:
+            template = self.level_template(map_id)
+            self.tilemap.restore(template['tilemap'])
+            self.leaf_spawners = [pygame.Rect(rect) for rect in template['leaf_spawners']]
+            if template['player'] is not None:
+                self.player.pos[:] = template['player']
+                self.player.air_time = 0
+            self.clear_enemies()
+            for pos in template['enemies']:
+                self.add_enemy(Enemy(self, pos, (8, 15)))
+        self.projectiles.clear()
+        self.particles.clear()
+        self.sparks.clear()
+        self.scroll = [0, 0]
+        if self.streamer is not None:
+            # the camera starts on the player, not on the far away top left, with the tiles around it in
+            center = self.player.rect().center
+            self.scroll = [center[0] - VIEW_SIZE[0] / 2, center[1] - VIEW_SIZE[1] / 2]
+            self.streamer.update(center)
+        self.dead = 0
+        self.transition = -30
+        self.reset_render_state()
+        self.update_background()
+
+    def add_enemy(self, enemy):
+        enemy.broadphase = self.enemy_grid
+        self.enemies.append(enemy)
+        self.enemy_grid.insert(enemy, enemy.rect())
+        if self.physics is not None:
+            self.physics.add(enemy)
+
+    def remove_enemy(self, enemy):
+        self.enemies.remove(enemy)
+        self.enemy_grid.remove(enemy)
+        if self.physics is not None:
+            self.physics.remove(enemy)
+
+    def restore_enemy(self, state):
+        enemy = Enemy(self, state['pos'], state['size'])
+        enemy.restore(state)
+        self.add_enemy(enemy)
+
+    def kill_enemy(self, enemy):
+        self.remove_enemy(enemy)
+        if not len(self.enemies) and (self.streamer is None or not self.streamer.enemies_away):
+            self.current_level_passed = True
+
+    def clear_enemies(self):
+        if self.physics is not None:
+            for enemy in self.enemies:
+                self.physics.remove(enemy)
+        self.enemies = []
+        self.enemy_grid.clear()
+
+    def update_background(self):
+        # nothing to show without a display, Game picks the level's background
+        pass
+
+    def read_input(self):
+        # the actions of the coming tick when none are given: the recording's, or the keys still held
+        if self.replay is not None:
+            return self.replay.next_actions()
+        return (LEFT if self.movement[0] else 0) | (RIGHT if self.movement[1] else 0)
+
+    def reset(self, map_id=0):
+        # starts map_id afresh, as after a restart of the game
+        self.level = map_id
+        self.load_level(map_id)
+        self.player.velocity[:] = (0, 0)
+        self.player.dashing = 0
+        self.player.health = 3
+        self.movement = [False, False]
+        self.screenshake = 0
+        self.current_level_passed = False
+
+    def snapshot(self):
+        # the whole game state; restore() puts it back. tiles are shared copy-on-write
+        return {
+            'level': self.level,
+            'tilemap': self.tilemap.snapshot(),
+            'leaf_spawners': [tuple(rect) for rect in self.leaf_spawners],
+            'player': self.player.snapshot(),
+            'enemies': [enemy.snapshot() for enemy in self.enemies],
+            'projectiles': self.projectiles.snapshot(),
+            'particles': self.particles.snapshot(),
+            'sparks': self.sparks.snapshot(),
+            'scroll': list(self.scroll),
+            'screenshake': self.screenshake,
+            'dead': self.dead,
+            'transition': self.transition,
+            'current_level_passed': self.current_level_passed,
+            'movement': list(self.movement),
+            'streamer': self.streamer.snapshot() if self.streamer is not None else None,
+            'rng': random.getstate(),
+        }
+
+    def restore(self, snapshot):
+        self.level = snapshot['level']
+        self.tilemap.restore(snapshot['tilemap'])
+        self.leaf_spawners = [pygame.Rect(rect) for rect in snapshot['leaf_spawners']]
+        self.player.restore(snapshot['player'])
+        self.clear_enemies()
+        for state in snapshot['enemies']:
+            self.restore_enemy(state)
+        if self.streamer is not None:
+            self.streamer.restore(snapshot['streamer'])
+        self.projectiles.restore(snapshot['projectiles'])
+        self.particles.restore(snapshot['particles'])
+        self.sparks.restore(snapshot['sparks'])
+        self.scroll = list(snapshot['scroll'])
+        self.screenshake = snapshot['screenshake']
+        self.dead = snapshot['dead']
+        self.transition = snapshot['transition']
+        self.current_level_passed = snapshot['current_level_passed']
+        self.movement = list(snapshot['movement'])
+        random.setstate(snapshot['rng'])
+        self.update_background()
+        self.reset_render_state()
+
+    def reset_render_state(self):
+        # nothing to interpolate from after a jump in the game state
+        self.prev_scroll = tuple(self.scroll)
+        self.player.prev_pos = tuple(self.player.pos)
+        self.visible_enemies = self.enemies.copy()
+        self.player_visible = not self.dead
+        self.shake_offset = (0, 0)
+
+    def tick(self, actions=None):
+        # advances the game by one tick, draws nothing. actions (bits of
+        # scripts.replay) are what the player does at the end of the tick,
+        # read_input() decides them when not given
+        profiler = self.profiler
+        self.prev_scroll = tuple(self.scroll)
+        with profiler.stage('level'):
+            self.screenshake = max(0, self.screenshake - 1)
+            if self.current_level_passed:
+                self.transition += 1
+                if self.transition > 30:
+                    self.level = min(self.level + 1, self.level_count - 1)
+                    self.load_level(self.level)
+                    self.current_level_passed = False
+            if self.transition < 0:
+                self.transition += 1
+            if self.dead:
+                self.dead += 1
+                if self.dead >= 10:
+                    self.transition = min(30, self.transition + 1)
+                if self.dead > 40:
+                    self.level = 0
+                    self.load_level(self.level)
+                    self.player.health = 3
+            self.scroll[0] += (self.player.rect().centerx - VIEW_SIZE[0] / 2 - self.scroll[0]) / 30
+            self.scroll[1] += (self.player.rect().centery - VIEW_SIZE[1] / 2 - self.scroll[1]) / 30
+            for rect in self.leaf_spawners:
+                if random.random() * 49999 < rect.width * rect.height:
+                    pos = (rect.x + random.random() * rect.width, rect.y + random.random() * rect.height)
+                    self.particles.spawn('leaf', pos, velocity=[-0.1, 0.3], frame=random.randint(0, 20))
+            self.clouds.update()
+        if self.streamer is not None:
+            with profiler.stage('streaming'):
+                self.streamer.update((self.scroll[0] + VIEW_SIZE[0] / 2, self.scroll[1] + VIEW_SIZE[1] / 2))
+        with profiler.stage('enemies'):
+            self.dash_targets.clear()
+            if abs(self.player.dashing) >= 50:
+                # enemies move a few pixels before they test the hit, hence the margin
+                self.dash_targets.update(self.enemy_grid.query_rect(self.player.rect().inflate(DASH_MARGIN, DASH_MARGIN)))
+            # enemies killed this tick are still drawn once
+            self.visible_enemies = self.enemies.copy()
+            if self.physics is None:
+                for enemy in self.visible_enemies:
+                    if enemy.update(self.tilemap, (0, 0)):
+                        self.kill_enemy(enemy)
+            else:
+                for enemy in self.enemy_manager.update(self.visible_enemies, self.tilemap):
+                    self.kill_enemy(enemy)
+        with profiler.stage('player'):
+            self.player_visible = not self.dead
+            if self.player_visible:
+                self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
+        with profiler.stage('projectiles'):
+            impacts, impact_speeds, hits = self.projectiles.update(self.player.rect() if abs(self.player.dashing) < 50 else None)
+            for pos, speed in zip(impacts, impact_speeds):
+                for i in range(4):
+                    self.sparks.spawn(pos, random.random() - 0.5 + (math.pi if speed > 0 else 0), 2 + random.random())
+            for pos in hits:
+                self.player.take_damage()
+                self.sfx['hit'].play()
+                self.screenshake = max(16, self.screenshake)
+                for i in range(30):
+                    angle = random.random() * math.pi * 2
+                    speed = random.random() * 5
+                    self.sparks.spawn(self.player.rect().center, angle, 2 + random.random())
+                    self.particles.spawn('particle', self.player.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=random.randint(0, 7))
+        with profiler.stage('sparks'):
+            self.sparks.update()
+        with profiler.stage('particles'):
+            self.particles.update()
+        with profiler.stage('input'):
+            if actions is None:
+                actions = self.read_input()
+            self.apply_actions(actions)
+        # drawn from the game's RNG with the rest of the tick, so replays stay in step
+        self.shake_offset = (random.random() * self.screenshake - self.screenshake / 2, random.random() * self.screenshake - self.screenshake / 2)
+        if self.recorder is not None:
+            self.recorder.record(actions, state_hash(self))
+        if self.replay is not None:
+            self.replay.check(state_hash(self))
+
+    def apply_actions(self, actions):
+        self.movement = [bool(actions & LEFT), bool(actions & RIGHT)]
+        if actions & JUMP:
+            if self.player.jump():
+                self.sfx['jump'].play()
+        if actions & DASH:
+            self.player.dash()
+
@@ -1,5 +1,6 @@
 import math
 
+import numpy as np
 import pygame
 
 
@@ -24,3 +25,123 @@ class Spark:
             (self.pos[0] + math.cos(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[1]),
         ]
         pygame.draw.polygon(surf, (255, 255, 255), render_points)
+
+
+class SparkSystem:
+    """
+    Pool of sparks stored as arrays. A spark's angle never changes, so its
+    direction vector is computed once at spawn and the quads of every live
+    spark are built in one vectorized pass; what is left per spark is a
+    single draw.polygon call.
+    """
+    FIELDS = ('pos', 'prev_pos', 'direction', 'speed')  # one array entry per spark
+
+    def __init__(self, capacity=256, color=(255, 255, 255)):
+        self.color = color
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.prev_pos = np.zeros((capacity, 2))  # pos before the last update, for drawing in between
+        self.direction = np.zeros((capacity, 2))  # (cos(angle), sin(angle))
+        self.speed = np.zeros(capacity)
+        self.kill = None  # sparks to drop on the next update
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+        self.kill = None
+
+    def snapshot(self):
+        state = {name: getattr(self, name)[:self.count].copy() for name in self.FIELDS}
+        state['kill'] = None if self.kill is None else self.kill.copy()
+        return state
+
+    def restore(self, state):
+        n = len(state[self.FIELDS[0]])
+        self.count = 0
+        self._reserve(n)
+        for name in self.FIELDS:
+            getattr(self, name)[:n] = state[name]
+        self.count = n
+        self.kill = None if state['kill'] is None else state['kill'].copy()
+
+    def _reserve(self, n):
+        needed = self.count + n
+        capacity = len(self.speed)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:])
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, pos, angle, speed):
+        self._reserve(1)
+        i = self.count
+        self.pos[i] = pos
+        self.prev_pos[i] = pos
+        self.direction[i] = (math.cos(angle), math.sin(angle))
+        self.speed[i] = speed
+        self.count += 1
+
+    def spawn_many(self, pos, angles, speeds):
+        # pos is one shared position or one per spark
+        angles = np.asarray(angles, dtype=float)
+        n = len(angles)
+        self._reserve(n)
+        new = slice(self.count, self.count + n)
+        self.pos[new] = pos
+        self.prev_pos[new] = pos
+        self.direction[new, 0] = np.cos(angles)
+        self.direction[new, 1] = np.sin(angles)
+        self.speed[new] = speeds
+        self.count += n
+
+    def _compact(self):
+        kill = self.kill
+        self.kill = None
+        if kill is None or not kill.any():
+            return
+        keep = np.concatenate((np.flatnonzero(~kill), np.arange(len(kill), self.count)))
+        for arr in (self.pos, self.prev_pos, self.direction, self.speed):
+            arr[:len(keep)] = arr[keep]
+        self.count = len(keep)
+
+    def update(self):
+        self._compact()
+        n = self.count
+        speed = self.speed[:n]
+        self.prev_pos[:n] = self.pos[:n]
+        self.pos[:n] += self.direction[:n] * speed[:, None]
+        np.maximum(speed - 0.1, 0, out=speed)
+        # like Spark.update, a spark that stopped is drawn once more and then removed
+        self.kill = speed == 0
+
+    def render(self, surf, offset=(0, 0), alpha=1.0):
+        # alpha < 1 draws the sparks that far from prev_pos to pos
+        n = self.count
+        if not n:
+            return
+        pos = self.pos[:n]
+        if alpha != 1.0:
+            pos = self.prev_pos[:n] + (pos - self.prev_pos[:n]) * alpha
+        pos = pos - offset
+        speed = self.speed[:n, None]
+        forward = self.direction[:n] * speed * 3
+        # direction rotated by 90 degrees: (-sin, cos)
+        side = self.direction[:n, ::-1] * (-0.5, 0.5) * speed
+        quads = np.stack((pos + forward, pos + side, pos - forward, pos - side), axis=1)
+        # skip sparks that are entirely off screen
+        low = quads.min(axis=1)
+        high = quads.max(axis=1)
+        visible = (high[:, 0] >= 0) & (high[:, 1] >= 0) & (low[:, 0] < surf.get_width()) & (low[:, 1] < surf.get_height())
+        if not visible.all():
+            quads = quads[visible]
+        draw_polygon = pygame.draw.polygon
+        color = self.color
+        for quad in quads.tolist():
+            draw_polygon(surf, color, quad)
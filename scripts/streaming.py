@@ -0,0 +1,395 @@
+# Streamed levels, for maps too big to load at once. The map is split into
+# square regions of REGION_CHUNKS x REGION_CHUNKS chunks with a file each,
+# and a WorldStreamer keeps only the regions around the camera in the game.
+# A streamed level is a directory:
+#
+#   index.json   tile size, type names, region size, the regions with their
+#                enemy count, the player spawn
+#   X_Y.region   tiles, offgrid tiles, enemy spawns and trees of region (X, Y)
+#
+# region file:
+#   header     '<4sHIIII': magic, version, chunk count, offgrid count, enemy count, tree count
+#   chunks     int32 chunk x[k], int32 chunk y[k], uint8 types[k][CHUNK_AREA], uint8 variants[k][CHUNK_AREA]
+#   offgrid    per tile like scripts/mapformat.py
+#   enemies    float64 x[n], float64 y[n]
+#   trees      float64 x[t], float64 y[t] of the trees leaves fall from, on or off the grid
+#
+# Types are indices into the type names, plus one in the chunks, where 0 is
+# empty. Spawners are taken out of the tiles: the player's goes into the
+# index, the enemies' into their regions. Split a map from the repo root with:
+#   python -m scripts.streaming data/maps/0.json level0
+import argparse
+import json
+import os
+import queue
+import struct
+import threading
+
+import numpy as np
+import pygame
+
+from scripts import mapformat
+from scripts.enemy import Enemy
+from scripts.tilegrid import CHUNK_SIZE, CHUNK_AREA
+
+MAGIC = b'BOSG'
+VERSION = 1
+HEADER = struct.Struct('<4sHIIII')
+REGION_CHUNKS = 4  # a region is 64 x 64 tiles
+CHUNK_BUDGET = 4  # chunks put in ahead of time or taken out late, per tick
+
+
+def leaf_spawner(pos):
+    # the Rect leaves fall from of the tree at pos, as in Simulation.level_template
+    return pygame.Rect(4 + pos[0], 4 + pos[1], 23, 13)
+
+
+def region_path(path, key):
+    return os.path.join(path, '%d_%d.region' % key)
+
+
+def write(path, data, region_chunks=REGION_CHUNKS):
+    # splits the arrays of a map (scripts/mapformat.py) into the streamed level at path
+    os.makedirs(path, exist_ok=True)
+    ts = data['tile_size']
+    names = data['type_names']
+    region_pixels = region_chunks * CHUNK_SIZE * ts
+    spawner = names.index('spawners') if 'spawners' in names else -1
+    tree = names.index('large_decor') if 'large_decor' in names else -1
+    tiles = np.asarray(data['type']) != spawner
+    player = None
+    enemies = []
+    offgrid = []
+    trees = []
+    for t, v, x, y in data['offgrid']:
+        if t != spawner:
+            offgrid.append((t, v, x, y))
+            if (t, v) == (tree, 2):
+                trees.append((x, y))
+        elif v:
+            enemies.append((x, y))
+        else:
+            player = (x, y)
+    grid_trees = (np.asarray(data['type']) == tree) & (np.asarray(data['variant']) == 2)
+    trees += [(x * ts, y * ts) for x, y in zip(data['x'][grid_trees].tolist(), data['y'][grid_trees].tolist())]
+    for x, y, v in zip(data['x'][~tiles].tolist(), data['y'][~tiles].tolist(), data['variant'][~tiles].tolist()):
+        if v:
+            enemies.append((x * ts, y * ts))
+        else:
+            player = (x * ts, y * ts)
+    data = dict(data, x=data['x'][tiles], y=data['y'][tiles], type=data['type'][tiles], variant=data['variant'][tiles])
+
+    regions = {}  # key -> [chunk rows, offgrid tiles, enemy positions, tree positions]
+    keys, types, variants = mapformat.chunk_arrays(data, np.asarray(data['type']) + 1)
+    for row, (cx, cy) in enumerate(keys):
+        regions.setdefault((cx // region_chunks, cy // region_chunks), [[], [], [], []])[0].append(row)
+    for part, items in ((1, offgrid), (2, enemies), (3, trees)):
+        for item in items:
+            pos = item[2:] if part == 1 else item
+            regions.setdefault((int(pos[0] // region_pixels), int(pos[1] // region_pixels)), [[], [], [], []])[part].append(item)
+
+    keys = np.array(keys, np.int32).reshape(-1, 2)
+    for key, (rows, region_offgrid, region_enemies, region_trees) in regions.items():
+        enemy_positions = np.array(region_enemies, np.float64).reshape(-1, 2)
+        tree_positions = np.array(region_trees, np.float64).reshape(-1, 2)
+        with open(region_path(path, key), 'wb') as f:
+            f.write(b''.join([
+                HEADER.pack(MAGIC, VERSION, len(rows), len(region_offgrid), len(region_enemies), len(region_trees)),
+                keys[rows, 0].tobytes(), keys[rows, 1].tobytes(),
+                types[rows].tobytes(), variants[rows].tobytes(),
+                np.array(region_offgrid, mapformat.OFFGRID_DTYPE).tobytes(),
+                enemy_positions[:, 0].tobytes(), enemy_positions[:, 1].tobytes(),
+                tree_positions[:, 0].tobytes(), tree_positions[:, 1].tobytes(),
+            ]))
+    with open(os.path.join(path, 'index.json'), 'w') as f:
+        json.dump({
+            'version': VERSION,
+            'tile_size': ts,
+            'type_names': names,
+            'region_chunks': region_chunks,
+            'regions': [[key[0], key[1], len(region[2])] for key, region in sorted(regions.items())],
+            'player': player,
+        }, f)
+
+
+def read_region(path, key, lookup, type_names):
+    # the chunks (of grid type ids, through lookup), offgrid tiles, enemy spawns and trees of a region
+    with open(region_path(path, key), 'rb') as f:
+        raw = f.read()
+    magic, version, chunk_count, offgrid_count, enemy_count, tree_count = HEADER.unpack_from(raw, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('%s is not a region of streamed level version %d' % (region_path(path, key), VERSION))
+    offset = HEADER.size
+
+    def take(dtype, count):
+        nonlocal offset
+        array = np.frombuffer(raw, dtype, count, offset)
+        offset += array.nbytes
+        return array
+
+    xs = take('<i4', chunk_count).tolist()
+    ys = take('<i4', chunk_count).tolist()
+    types = lookup[take('u1', chunk_count * CHUNK_AREA)].reshape(-1, CHUNK_AREA)
+    variants = take('u1', chunk_count * CHUNK_AREA).reshape(-1, CHUNK_AREA)
+    offgrid = take(mapformat.OFFGRID_DTYPE, offgrid_count)
+    enemies = list(zip(take('<f8', enemy_count).tolist(), take('<f8', enemy_count).tolist()))
+    trees = list(zip(take('<f8', tree_count).tolist(), take('<f8', tree_count).tolist()))
+    return {
+        'chunks': mapformat.make_chunks(list(zip(xs, ys)), types, variants),
+        'offgrid': [{'type': type_names[t], 'variant': v, 'pos': [x, y]} for t, v, x, y in offgrid.tolist()],
+        'enemies': enemies,
+        'trees': trees,
+    }
+
+
+class WorldStreamer:
+    """
+    Keeps the regions of a streamed level near the camera in a game and
+    takes the far ones out again, so memory and the cost of a load stay
+    bounded however big the map is.
+
+        streamer = WorldStreamer(game, 'level0')
+        streamer.start()            # the level from the beginning
+        streamer.update(center)     # every tick, center of the view in pixels
+
+    A worker thread reads the regions within prefetch regions of the view
+    before they are needed. Those within radius go into the game, nearest
+    first, and the game waits for the worker if one isn't read yet; the
+    ones just past radius go in chunk_budget chunks a tick, so a region
+    rarely has to go in at once. Regions go out beyond radius + 1, their
+    chunks leaving the grid the same few a tick. Which regions are in
+    depends only on where the camera has been, never on how fast the
+    worker was, so replays play the same. The enemies of a region going
+    out are put away as snapshots and come back as they were with it, as
+    do enemies that wander onto a region that isn't in. The streamed tiles
+    are taken as they are in the files: edits to them are lost when their
+    region goes out.
+    """
+    def __init__(self, game, path, radius=1, prefetch=3, chunk_budget=CHUNK_BUDGET):
+        self.game = game
+        self.path = path
+        with open(os.path.join(path, 'index.json')) as f:
+            self.index = json.load(f)
+        if self.index['version'] != VERSION:
+            raise ValueError('%s has streamed level version %d, expected %d' % (path, self.index['version'], VERSION))
+        self.radius = radius
+        self.prefetch = prefetch
+        self.chunk_budget = chunk_budget
+        self.region_pixels = self.index['region_chunks'] * CHUNK_SIZE * self.index['tile_size']
+        self.spawns = {(x, y): enemies for x, y, enemies in self.index['regions']}  # region -> enemies in its file
+        # grid type id of each type index of the files
+        grid = game.tilemap.grid
+        self.lookup = np.array([0] + [grid.type_id(name) for name in self.index['type_names']], np.uint8)
+        self.loaded = {}  # region in the game -> what was read of it
+        self.staged = {}  # region going in -> (what was read of it, chunks of it in the grid)
+        self.leaving = []  # chunks of regions gone out, still in the grid
+        self.ready = {}  # region -> data read by the worker, kept while it is near
+        self.requested = set()
+        self.parked = {}  # region -> snapshots of the enemies put away there
+        self.spawned = set()  # regions whose spawns came in; after that, their enemies come from parked
+        self.stalls = 0  # regions the game had to wait for
+        self.requests = queue.Queue()
+        self.finished = queue.Queue()
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+
+    def _work(self):
+        while True:
+            key = self.requests.get()
+            if key is None:
+                return
+            try:
+                self.finished.put((key, read_region(self.path, key, self.lookup, self.index['type_names'])))
+            except Exception as e:
+                self.finished.put((key, e))
+
+    def close(self):
+        self.requests.put(None)
+
+    def region_of(self, pos):
+        size = self.region_pixels
+        return (int(pos[0] // size), int(pos[1] // size))
+
+    def near(self, center, distance):
+        # the regions of the level within distance regions of center's, nearest first
+        cx, cy = center
+        keys = [(x, y) for y in range(cy - distance, cy + distance + 1) for x in range(cx - distance, cx + distance + 1)
+                if (x, y) in self.spawns]
+        keys.sort(key=lambda key: max(abs(key[0] - cx), abs(key[1] - cy)))
+        return keys
+
+    @property
+    def enemies_away(self):
+        # enemies of the level that aren't in the game: put away, or not spawned yet
+        return (sum(len(states) for states in self.parked.values())
+                + sum(count for key, count in self.spawns.items() if key not in self.spawned))
+
+    def start(self):
+        # takes everything out and puts the player on the spawn, the regions come in with update()
+        game = self.game
+        game.tilemap.grid.clear()
+        game.tilemap.tile_size = self.index['tile_size']
+        game.tilemap.set_offgrid([])
+        game.clear_enemies()
+        game.leaf_spawners = []
+        self.loaded = {}
+        self.staged = {}
+        self.leaving = []
+        self.parked = {}
+        self.spawned = set()
+        if self.index['player'] is not None:
+            game.player.pos[:] = self.index['player']
+            game.player.air_time = 0
+
+    def update(self, center):
+        center = self.region_of(center)
+        for key in list(self.loaded) + list(self.staged):
+            if max(abs(key[0] - center[0]), abs(key[1] - center[1])) > self.radius + 1:
+                self.evict(key)
+        near = self.near(center, self.prefetch)
+        for key in list(self.ready):
+            if key not in near:
+                del self.ready[key]
+        self.collect()
+        for key in near:
+            if key not in self.ready and key not in self.requested:
+                self.requested.add(key)
+                self.requests.put(key)
+        for key in self.near(center, self.radius):
+            if key not in self.loaded:
+                self.install(key)
+        budget = self.chunk_budget
+        leaving = self.leaving[:budget]
+        del self.leaving[:budget]
+        for key in leaving:
+            self.game.tilemap.grid.put_chunk(key, None)
+        budget -= len(leaving)
+        for key in self.near(center, self.radius + 1):
+            if budget <= 0:
+                break
+            if key not in self.loaded:
+                budget -= self.install(key, budget)
+        self.park_strays()
+
+    def collect(self, block=False):
+        # takes what the worker has read, waiting for one region when block
+        while True:
+            try:
+                key, data = self.finished.get(block)
+            except queue.Empty:
+                return
+            if isinstance(data, Exception):
+                raise data
+            self.requested.discard(key)
+            self.ready[key] = data
+            if block:
+                return
+
+    def read(self, key):
+        # the region from the worker, waiting for it if it isn't read yet
+        if key not in self.ready:
+            self.stalls += 1
+            if key not in self.requested:
+                self.requested.add(key)
+                self.requests.put(key)
+            while key not in self.ready:
+                self.collect(block=True)
+        return self.ready[key]
+
+    def install(self, key, budget=None):
+        # puts at most budget chunks of the region into the grid, and the rest of the
+        # region in once they all are; returns how many chunks went in
+        data, done = self.staged.pop(key) if key in self.staged else (self.read(key), 0)
+        game = self.game
+        tilemap = game.tilemap
+        if not done and self.leaving:
+            # back before all of it had left
+            self.leaving = [chunk_key for chunk_key in self.leaving if chunk_key not in data['chunks']]
+        chunks = list(data['chunks'].items())[done:]
+        if budget is not None and budget < len(chunks):
+            chunks = chunks[:budget]
+            self.staged[key] = (data, done + budget)
+        for chunk_key, chunk in chunks:
+            tilemap.grid.put_chunk(chunk_key, chunk)
+        if key in self.staged:
+            return len(chunks)
+        for tile in data['offgrid']:
+            tilemap.add_offgrid(tile)
+        for pos in data['trees']:
+            game.leaf_spawners.append(leaf_spawner(pos))
+        self.loaded[key] = data
+        if key not in self.spawned:
+            for pos in data['enemies']:
+                game.add_enemy(Enemy(game, pos, (8, 15)))
+            self.spawned.add(key)
+        # its own enemies from when it went out, and strays from the regions around
+        for state in self.parked.pop(key, ()):
+            game.restore_enemy(state)
+        return len(chunks)
+
+    def evict(self, key):
+        # everything of the region but its tiles goes now, those over the next ticks
+        game = self.game
+        tilemap = game.tilemap
+        chunks = tilemap.grid.chunks
+        size = self.index['region_chunks']
+        self.leaving += [(cx, cy) for cy in range(key[1] * size, (key[1] + 1) * size)
+                         for cx in range(key[0] * size, (key[0] + 1) * size) if (cx, cy) in chunks]
+        if self.staged.pop(key, None) is not None:
+            # only its chunks were in
+            return
+        for enemy in [enemy for enemy in game.enemies if self.region_of(enemy.pos) == key]:
+            self.park(enemy, key)
+        data = self.loaded.pop(key)
+        for tile in data['offgrid']:
+            tilemap.remove_offgrid(tile)
+        if data['trees']:
+            gone = {tuple(leaf_spawner(pos)) for pos in data['trees']}
+            game.leaf_spawners = [rect for rect in game.leaf_spawners if tuple(rect) not in gone]
+
+    def park(self, enemy, key):
+        # a region's spawns come in with it the first time, whatever was parked there before
+        self.parked.setdefault(key, []).append(enemy.snapshot())
+        self.game.remove_enemy(enemy)
+
+    def park_strays(self):
+        # enemies that walked or fell off the regions that are in
+        loaded = self.loaded
+        region_of = self.region_of
+        for enemy in [enemy for enemy in self.game.enemies if region_of(enemy.pos) not in loaded]:
+            self.park(enemy, region_of(enemy.pos))
+
+    def snapshot(self):
+        return {
+            'loaded': dict(self.loaded),
+            'staged': dict(self.staged),
+            'leaving': tuple(self.leaving),
+            'parked': {key: tuple(states) for key, states in self.parked.items()},
+            'spawned': frozenset(self.spawned),
+        }
+
+    def restore(self, snapshot):
+        # after the tilemap and the enemies were restored to the same moment
+        self.loaded = dict(snapshot['loaded'])
+        self.staged = dict(snapshot['staged'])
+        self.leaving = list(snapshot['leaving'])
+        self.parked = {key: list(states) for key, states in snapshot['parked'].items()}
+        self.spawned = set(snapshot['spawned'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m scripts.streaming', description='split a map into a streamed level')
+    parser.add_argument('source', help='a JSON or binary (.map) map')
+    parser.add_argument('dest', help='directory of the streamed level')
+    parser.add_argument('--region-chunks', type=int, default=REGION_CHUNKS, help='region size in chunks of %d tiles' % CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if args.source.endswith('.map'):
+        data = mapformat.read(args.source)
+    else:
+        with open(args.source) as f:
+            data = mapformat.arrays_from_json(json.load(f))
+    write(args.dest, data, args.region_chunks)
+
+
+if __name__ == '__main__':
+    main()
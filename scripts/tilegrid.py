@@ -0,0 +1,261 @@
+CHUNK_SHIFT = 4
+CHUNK_SIZE = 1 << CHUNK_SHIFT  # tiles per chunk side
+CHUNK_MASK = CHUNK_SIZE - 1
+CHUNK_AREA = CHUNK_SIZE * CHUNK_SIZE
+
+EMPTY = 0  # type id 0 means "no tile"
+
+
+class Chunk:
+    """
+    A CHUNK_SIZE x CHUNK_SIZE block of tiles stored as two flat byte
+    arrays (type id and variant), indexed by (y << CHUNK_SHIFT) | x
+    """
+    __slots__ = ('types', 'variants', 'count')
+
+    def __init__(self):
+        self.types = bytearray(CHUNK_AREA)
+        self.variants = bytearray(CHUNK_AREA)
+        self.count = 0  # number of non-empty cells
+
+    def copy(self):
+        chunk = Chunk()
+        chunk.types[:] = self.types
+        chunk.variants[:] = self.variants
+        chunk.count = self.count
+        return chunk
+
+
+class TileGrid:
+    """
+    Sparse grid of on-grid tiles. Tiles live in fixed-size chunks keyed by
+    integer (chunk_x, chunk_y) tuples, so a lookup is one dict probe plus
+    one byte read instead of building an "x;y" string.
+    """
+    def __init__(self, solid_types=()):
+        self.chunks = {}
+        # type names are interned into small ints, 0 is reserved for empty
+        self.type_names = [None]
+        self.type_ids = {}
+        self.solid_types = set(solid_types)
+        self.solid = bytearray(256)  # solid flag per type id
+        # callbacks(x, y) run after a cell changes, (None, None) means everything changed
+        self.listeners = []
+        # callbacks(cx, cy) run after put_chunk() swapped a whole chunk, instead of the above
+        self.chunk_listeners = []
+        # keys of chunks shared with a snapshot (or a streamer), copied before they are written to
+        self.shared = set()
+
+    def type_id(self, tile_type):
+        tid = self.type_ids.get(tile_type)
+        if tid is None:
+            tid = len(self.type_names)
+            if tid > 255:
+                raise ValueError('too many tile types')
+            self.type_names.append(tile_type)
+            self.type_ids[tile_type] = tid
+            self.solid[tid] = tile_type in self.solid_types
+        return tid
+
+    def _changed(self, x, y):
+        for listener in self.listeners:
+            listener(x, y)
+
+    def clear(self):
+        self.chunks = {}
+        self.shared = set()
+        self._changed(None, None)
+
+    def set_chunks(self, chunks):
+        # replaces every tile at once with prebuilt {(cx, cy): Chunk}, for bulk loads
+        self.chunks = chunks
+        self.shared = set()
+        self._changed(None, None)
+
+    def put_chunk(self, key, chunk):
+        # puts a whole chunk in at key, or takes it out when chunk is None, for streaming
+        # parts of a map in and out. the map is as loaded there, not edited: chunk_listeners
+        # hear about it, listeners don't. the chunk stays the caller's, edits copy it first
+        if chunk is None:
+            self.chunks.pop(key, None)
+            self.shared.discard(key)
+        else:
+            self.chunks[key] = chunk
+            self.shared.add(key)
+        for listener in self.chunk_listeners:
+            listener(key[0], key[1])
+
+    def snapshot(self):
+        # copy-on-write: the snapshot shares the chunks, whichever side writes first copies
+        self.shared = set(self.chunks)
+        return dict(self.chunks)
+
+    def restore(self, snapshot):
+        self.chunks = dict(snapshot)
+        self.shared = set(snapshot)
+        self._changed(None, None)
+
+    def _writable(self, key):
+        # the chunk at key, copied first if a snapshot still uses it
+        chunk = self.chunks.get(key)
+        if chunk is not None and key in self.shared:
+            chunk = self.chunks[key] = chunk.copy()
+            self.shared.discard(key)
+        return chunk
+
+    def get(self, x, y):
+        # (type, variant) or None
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is not None:
+            i = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+            tid = chunk.types[i]
+            if tid:
+                return self.type_names[tid], chunk.variants[i]
+        return None
+
+    def get_id(self, x, y):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is None:
+            return EMPTY
+        return chunk.types[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+
+    def is_solid(self, x, y):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is None:
+            return False
+        return self.solid[chunk.types[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]] == 1
+
+    def set(self, x, y, tile_type, variant=0):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self._writable(key)
+        if chunk is None:
+            chunk = self.chunks[key] = Chunk()
+        i = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+        if not chunk.types[i]:
+            chunk.count += 1
+        chunk.types[i] = self.type_id(tile_type)
+        chunk.variants[i] = variant
+        self._changed(x, y)
+
+    def set_variant(self, x, y, variant):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            i = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+            if chunk.types[i] and chunk.variants[i] != variant:
+                chunk = self._writable(key)
+                chunk.variants[i] = variant
+                self._changed(x, y)
+
+    def set_chunk_variants(self, key, variants):
+        # every variant of one chunk at once, for bulk passes. listeners hear
+        # about the chunk's first cell
+        chunk = self._writable(key)
+        chunk.variants[:] = variants
+        self._changed(key[0] << CHUNK_SHIFT, key[1] << CHUNK_SHIFT)
+
+    def remove(self, x, y):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            return False
+        i = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+        if not chunk.types[i]:
+            return False
+        chunk = self._writable(key)
+        chunk.types[i] = EMPTY
+        chunk.variants[i] = 0
+        chunk.count -= 1
+        if not chunk.count:
+            del self.chunks[key]
+        self._changed(x, y)
+        return True
+
+    def __len__(self):
+        return sum(chunk.count for chunk in self.chunks.values())
+
+    def __contains__(self, loc):
+        return self.get_id(loc[0], loc[1]) != EMPTY
+
+    def __iter__(self):
+        # yields (x, y, type, variant) for every tile
+        for (cx, cy), chunk in list(self.chunks.items()):
+            types = chunk.types
+            for i in range(CHUNK_AREA):
+                if types[i]:
+                    yield ((cx << CHUNK_SHIFT) | (i & CHUNK_MASK), (cy << CHUNK_SHIFT) | (i >> CHUNK_SHIFT),
+                           self.type_names[types[i]], chunk.variants[i])
+
+    def tiles_in_rect(self, x0, y0, x1, y1):
+        # yields (x, y, type, variant) for tiles with x0 <= x <= x1 and y0 <= y <= y1
+        chunks = self.chunks
+        names = self.type_names
+        for cy in range(y0 >> CHUNK_SHIFT, (y1 >> CHUNK_SHIFT) + 1):
+            for cx in range(x0 >> CHUNK_SHIFT, (x1 >> CHUNK_SHIFT) + 1):
+                chunk = chunks.get((cx, cy))
+                if chunk is None:
+                    continue
+                types = chunk.types
+                variants = chunk.variants
+                base_x = cx << CHUNK_SHIFT
+                base_y = cy << CHUNK_SHIFT
+                for ly in range(max(y0 - base_y, 0), min(y1 - base_y, CHUNK_MASK) + 1):
+                    row = ly << CHUNK_SHIFT
+                    for lx in range(max(x0 - base_x, 0), min(x1 - base_x, CHUNK_MASK) + 1):
+                        tid = types[row | lx]
+                        if tid:
+                            yield base_x | lx, base_y | ly, names[tid], variants[row | lx]
+
+
+class LegacyTileView:
+    """
+    Dict-like view that keeps the old {"x;y": {'type', 'variant', 'pos'}}
+    interface working on top of a TileGrid. Returned tile dicts are
+    copies, write changes back with view[loc] = tile.
+    """
+    def __init__(self, grid):
+        self.grid = grid
+
+    @staticmethod
+    def _parse(loc):
+        x, y = loc.split(';')
+        return int(x), int(y)
+
+    def __contains__(self, loc):
+        x, y = self._parse(loc)
+        return self.grid.get_id(x, y) != EMPTY
+
+    def __getitem__(self, loc):
+        x, y = self._parse(loc)
+        tile = self.grid.get(x, y)
+        if tile is None:
+            raise KeyError(loc)
+        return {'type': tile[0], 'variant': tile[1], 'pos': [x, y]}
+
+    def get(self, loc, default=None):
+        return self[loc] if loc in self else default
+
+    def __setitem__(self, loc, tile):
+        x, y = self._parse(loc)
+        self.grid.set(x, y, tile['type'], tile['variant'])
+
+    def __delitem__(self, loc):
+        x, y = self._parse(loc)
+        if not self.grid.remove(x, y):
+            raise KeyError(loc)
+
+    def __len__(self):
+        return len(self.grid)
+
+    def __iter__(self):
+        for x, y, _, _ in self.grid:
+            yield str(x) + ';' + str(y)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [{'type': t, 'variant': v, 'pos': [x, y]} for x, y, t, v in self.grid]
+
+    def items(self):
+        return [(str(x) + ';' + str(y), {'type': t, 'variant': v, 'pos': [x, y]}) for x, y, t, v in self.grid]
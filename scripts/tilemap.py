@@ -1,6 +1,14 @@
 import json
 import pygame
 
+from scripts.tilegrid import Chunk, TileGrid, LegacyTileView, CHUNK_SHIFT, CHUNK_MASK
+from scripts.chunk_cache import ChunkCache
+from scripts.autotile import Autotiler
+from scripts.offgrid import OffgridTiles
+from scripts.collision import CollisionGeometry, NEIGHBOR_OFFSETS
+from scripts.navigation import NavigationTable
+from scripts import mapformat
+
 AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (0, 1)])): 0,
     tuple(sorted([(1, 0), (0, 1), (-1, 0)])): 1,
@@ -13,19 +21,65 @@ AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8
 }
 
-# offsets for a given tile, to get the 9 tiles around it and including it
-NEIGHBOR_OFFSETS = [(-1, 0), (-1, -1), (0, -1), (1, -1),
-                    (1, 0), (0, 0), (-1, 1), (0, 1), (1, 1)]
 PHYSICS_TILES = {'grass', 'stone'}  # faster than list
 AUTOTILE_TYPES = {'grass', 'stone'}
 
 
 class Tilemap:
-    def __init__(self, game, tile_size=16):
+    def __init__(self, game, tile_size=16, chunk_cache=True):
         self.game = game
         self.tile_size = tile_size
-        self.tilemap = {}  # every tile
-        self.offgrid_tiles = []
+        self.grid = TileGrid(PHYSICS_TILES)  # every on-grid tile
+        # old "x;y" string-keyed access, kept for compatibility
+        self.tilemap = LegacyTileView(self.grid)
+        # offgrid tiles, bucketed by where they are drawn
+        self.offgrid_tiles = OffgridTiles(self.offgrid_bounds)
+        # static tiles pre-rendered per chunk, rebuilt when a tile in it changes
+        self.chunk_cache = None
+        if chunk_cache:
+            self.chunk_cache = ChunkCache(self)
+            self.grid.listeners.append(self.chunk_cache.invalidate)
+            self.grid.chunk_listeners.append(self.chunk_cache.invalidate_chunk)
+        # solid tiles as prebuilt Rects, for the physics
+        self.collision = CollisionGeometry(self)
+        # platform spans, floors, ledges and walls, for the enemies
+        self.navigation = NavigationTable(self)
+        # keeps track of edited cells, for autotiling only what changed
+        self.autotiler = Autotiler(self.grid, AUTOTILE_MAP, AUTOTILE_TYPES)
+
+    def get_tile(self, tile_pos):
+        tile = self.grid.get(tile_pos[0], tile_pos[1])
+        if tile:
+            return {'type': tile[0], 'variant': tile[1], 'pos': [tile_pos[0], tile_pos[1]]}
+
+    def set_tile(self, tile_pos, tile_type, variant=0):
+        self.grid.set(tile_pos[0], tile_pos[1], tile_type, variant)
+
+    def remove_tile(self, tile_pos):
+        return self.grid.remove(tile_pos[0], tile_pos[1])
+
+    def offgrid_bounds(self, tile):
+        # (x, y, w, h) of the tile's image, positions left as floats.
+        # spawners have no image in the game assets, they fit in one tile anyway
+        images = self.game.assets.get(tile['type']) if self.game else None
+        size = images[tile['variant']].get_size() if images else (self.tile_size, self.tile_size)
+        return (tile['pos'][0], tile['pos'][1], size[0], size[1])
+
+    def offgrid_rect(self, tile):
+        return pygame.Rect(self.offgrid_bounds(tile))
+
+    def set_offgrid(self, tiles):
+        self.offgrid_tiles = OffgridTiles(self.offgrid_bounds, tiles)
+
+    def add_offgrid(self, tile):
+        self.offgrid_tiles.append(tile)
+        if self.chunk_cache and self.chunk_cache.surfaces:
+            self.chunk_cache.invalidate_rect(self.offgrid_rect(tile))
+
+    def remove_offgrid(self, tile):
+        self.offgrid_tiles.remove(tile)
+        if self.chunk_cache and self.chunk_cache.surfaces:
+            self.chunk_cache.invalidate_rect(self.offgrid_rect(tile))
 
     def extract(self, id_pairs, keep=False):
         matches = []
@@ -33,84 +87,143 @@ class Tilemap:
             if (tile['type'], tile['variant']) in id_pairs:
                 matches.append(tile.copy())
                 if not keep:
-                    self.offgrid_tiles.remove(tile)
-        # In the video, the tilemap is not wrapped by a list(), which
-        # may cause RuntimeError: dictionary changed size during iteration                    
-        for loc in list(self.tilemap):
-            tile = self.tilemap[loc]
-            if (tile['type'], tile['variant']) in id_pairs:
-                matches.append(tile.copy())
-                matches[-1]['pos'] = matches[-1]['pos'].copy()
-                matches[-1]['pos'][0] *= self.tile_size
-                matches[-1]['pos'][1] *= self.tile_size
+                    self.remove_offgrid(tile)
+        # iterating the grid works on a snapshot of the chunks, so removing is safe
+        for x, y, tile_type, variant in self.grid:
+            if (tile_type, variant) in id_pairs:
+                matches.append({'type': tile_type, 'variant': variant,
+                                'pos': [x * self.tile_size, y * self.tile_size]})
                 if not keep:
-                    del self.tilemap[loc]
-        
+                    self.grid.remove(x, y)
+
         return matches
-    
+
     def solid_check(self, pos):
-        tile_loc = str(int(pos[0] // self.tile_size)) + ';' + str(int(pos[1] // self.tile_size))
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]['type'] in PHYSICS_TILES:
-                return self.tilemap[tile_loc]
-        
+        # same as self.grid.is_solid(), inlined since this runs many times a frame
+        x = int(pos[0] // self.tile_size)
+        y = int(pos[1] // self.tile_size)
+        chunk = self.grid.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        return chunk is not None and self.grid.solid[chunk.types[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]] == 1
+
+    def span_at(self, pos):
+        # (left, right) tiles of the span of solid tiles at pos, None where there is no solid tile.
+        # a bisect in the row: as a yes/no it is solid_check, at about the same cost
+        ts = self.tile_size
+        return self.navigation.span(int(pos[0] // ts), int(pos[1] // ts))
+
+    def floor_at(self, pos):
+        # (left, right, left_wall, right_wall) of the floor at pos, see NavigationTable
+        ts = self.tile_size
+        return self.navigation.floor(int(pos[0] // ts), int(pos[1] // ts))
+
+    def first_solid_in_row(self, row, start_col, end_col):
+        # walks the tile row from start_col to end_col (both included, in either
+        # direction) and returns the first solid column or None
+        step = 1 if end_col >= start_col else -1
+        is_solid = self.grid.is_solid
+        for col in range(start_col, end_col + step, step):
+            if is_solid(col, row):
+                return col
+        return None
+
     def tiles_around(self, pos):
         tiles = []
         tile_loc = (int(pos[0] // self.tile_size),
                     int(pos[1] // self.tile_size))
         for offset in NEIGHBOR_OFFSETS:
-            check_loc = str(tile_loc[0] + offset[0]) + \
-                ';' + str(tile_loc[1] + offset[1])
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
+            tile = self.get_tile((tile_loc[0] + offset[0], tile_loc[1] + offset[1]))
+            if tile:
+                tiles.append(tile)
         return tiles
 
     def save(self, path):
+        if path.endswith('.map'):
+            mapformat.write(path, mapformat.arrays_from_tilemap(self))
+            return
         f = open(path, 'w')
-        json.dump({'tilemap': self.tilemap, 'tile_size': self.tile_size,
-                  'offgrid': self.offgrid_tiles}, f)
+        json.dump({'tilemap': dict(self.tilemap.items()), 'tile_size': self.tile_size,
+                  'offgrid': self.offgrid_tiles.copy()}, f)
         f.close()
 
     def load(self, path):
+        if path.endswith('.map'):
+            # binary maps (scripts/mapformat.py) go into the grid in bulk
+            data = mapformat.read(path)
+            mapformat.fill_grid(self.grid, data)
+            self.tile_size = data['tile_size']
+            self.set_offgrid(mapformat.offgrid_tiles(data))
+            if self.chunk_cache:
+                self.chunk_cache.clear()
+            return
         f = open(path, 'r')
         map_data = json.load(f)
         f.close()
-        self.tilemap = map_data['tilemap']
+        self.load_data(map_data)
+
+    def load_data(self, map_data):
+        # map_data as parsed from a map file, for maps read ahead of time
+        # the chunks are filled first and go in at once, like a .map: a load isn't an edit
+        grid = self.grid
+        chunks = {}
+        for tile in map_data['tilemap'].values():
+            x, y = tile['pos']
+            key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+            chunk = chunks.get(key)
+            if chunk is None:
+                chunk = chunks[key] = Chunk()
+            i = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+            if not chunk.types[i]:
+                chunk.count += 1
+            chunk.types[i] = grid.type_id(tile['type'])
+            chunk.variants[i] = tile['variant']
+        grid.set_chunks(chunks)
         self.tile_size = map_data['tile_size']
-        self.offgrid_tiles = map_data['offgrid']
+        self.set_offgrid(map_data['offgrid'])
+        if self.chunk_cache:
+            self.chunk_cache.clear()
+
+    def snapshot(self):
+        # the tiles share their chunks with the live map until either side changes
+        return {'grid': self.grid.snapshot(), 'tile_size': self.tile_size, 'offgrid': tuple(self.offgrid_tiles)}
+
+    def restore(self, snapshot):
+        self.grid.restore(snapshot['grid'])
+        self.tile_size = snapshot['tile_size']
+        self.set_offgrid(snapshot['offgrid'])
+        if self.chunk_cache:
+            self.chunk_cache.clear()
 
     def physics_rects_around(self, pos):
-        rects = []
-        for tile in self.tiles_around(pos):
-            if tile['type'] in PHYSICS_TILES:
-                rects.append(pygame.Rect(
-                    tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, self.tile_size, self.tile_size))
-        return rects
+        # Rects of the solid tiles among the 9 around pos. They are built once
+        # per map and shared between calls, so don't change them
+        ts = self.tile_size
+        return self.collision.rects_around(int(pos[0] // ts), int(pos[1] // ts))
+
+    def physics_runs_around(self, pos):
+        # like physics_rects_around, with each row's touching solid tiles merged into one Rect
+        ts = self.tile_size
+        return self.collision.runs_around(int(pos[0] // ts), int(pos[1] // ts))
 
     def autotile(self):
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            neighbors = set()
-            for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
-                check_loc = str(tile['pos'][0] + shift[0]) + \
-                    ';' + str(tile['pos'][1] + shift[1])
-                if check_loc in self.tilemap:
-                    if self.tilemap[check_loc]['type'] == tile['type']:
-                        neighbors.add(shift)
-            neighbors = tuple(sorted(neighbors))
-            if (tile['type'] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
-                tile['variant'] = AUTOTILE_MAP[neighbors]
+        # the whole map; autotiler.update() does just the cells edited since the last pass
+        self.autotiler.bulk()
 
     def render(self, surf, offset=(0, 0)):
-        for tile in self.offgrid_tiles:
-            surf.blit(self.game.assets[tile['type']][tile['variant']],
-                      (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
+        if not (self.chunk_cache and self.chunk_cache.include_offgrid):
+            # a pixel of margin, blit truncates the float positions
+            view = (offset[0] - 1, offset[1] - 1, surf.get_width() + 2, surf.get_height() + 2)
+            for tile in self.offgrid_tiles.query_rect(view):
+                surf.blit(self.game.assets[tile['type']][tile['variant']],
+                          (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
+        if self.chunk_cache:
+            self.chunk_cache.render(surf, offset=offset)
+            return
 
         # optimization of tilemap: only render the tiles need to be shown in display
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ';' + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    surf.blit(self.game.assets[tile['type']][tile['variant']], (
-                        tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
+        assets = self.game.assets
+        ts = self.tile_size
+        surf.blits([(assets[tile_type][variant], (x * ts - offset[0], y * ts - offset[1]))
+                    for x, y, tile_type, variant in self.grid.tiles_in_rect(
+                        offset[0] // ts, offset[1] // ts,
+                        (offset[0] + surf.get_width()) // ts, (offset[1] + surf.get_height()) // ts)],
+                   doreturn=False)
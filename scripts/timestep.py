@@ -0,0 +1,70 @@
+import time
+from collections import Counter
+
+# ticks per second: the game's speeds and timers are all per tick, so the rate is fixed
+TICK_RATE = 60
+
+
+class FixedTimestep:
+    """
+    Clock of a fixed-rate simulation under a render loop of any rate.
+
+        timestep = FixedTimestep()
+        while True:
+            for _ in range(timestep.advance()):
+                game.tick()
+            game.render(timestep.alpha)
+
+    advance() adds the real time since the last call and returns how many
+    ticks are due. At most max_ticks run per frame, time beyond that is
+    dropped, so after a long stall the game slows down for a moment instead
+    of trying to catch up forever. alpha is how far the time left over is
+    into the next tick, for interpolating what gets drawn.
+    """
+    def __init__(self, max_ticks=5, clock=time.perf_counter):
+        self.dt = 1 / TICK_RATE
+        self.max_ticks = max_ticks
+        self.clock = clock
+        self.accumulator = 0.0
+        self.last = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.ticks = 0
+        self.dropped = 0
+        self.ticks_per_frame = Counter()
+        self.started = self.clock()
+
+    def advance(self):
+        now = self.clock()
+        if self.last is None:
+            # the first frame gets one tick
+            self.last = now - self.dt
+        self.accumulator += now - self.last
+        self.last = now
+        ticks = int(self.accumulator / self.dt)
+        if ticks > self.max_ticks:
+            self.dropped += ticks - self.max_ticks
+            ticks = self.max_ticks
+            self.accumulator = ticks * self.dt
+        self.accumulator -= ticks * self.dt
+        self.frames += 1
+        self.ticks += ticks
+        self.ticks_per_frame[ticks] += 1
+        return ticks
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.dt
+
+    def report(self):
+        # frame pacing since the last reset_stats(), as printable lines
+        elapsed = self.clock() - self.started
+        lines = ['%d frames, %d ticks in %.1f s: %.1f fps, %.1f ticks/s (target %.0f)' % (
+            self.frames, self.ticks, elapsed, self.frames / elapsed, self.ticks / elapsed, 1 / self.dt)]
+        lines.append('dropped ticks: %d' % self.dropped)
+        lines.append('ticks per frame:')
+        for ticks, frames in sorted(self.ticks_per_frame.items()):
+            lines.append('  %d  %6d frames  %5.1f%%' % (ticks, frames, frames / max(1, self.frames) * 100))
+        return '\n'.join(lines)
@@ -2,20 +2,55 @@ import os
 
 import pygame
 
+from scripts import atlas
 
 BASE_IMG_PATH = 'data/images/'
 
+# the baked atlas (scripts/atlas.py) once use_atlas() found an up to date one
+ATLAS = None
+# every image loaded so far, so loading one twice doesn't decode it twice
+_loaded = {}
 
-def load_image(path):
+
+def use_atlas(rebuild=False):
+    set_atlas(atlas.load(rebuild=rebuild))
+    return ATLAS is not None
+
+
+def set_atlas(bundle):
+    global ATLAS
+    ATLAS = bundle
+    _loaded.clear()
+
+
+def prepare_image(img):
     # make rendering more efficient
-    img = pygame.image.load(BASE_IMG_PATH + path).convert()
+    img = img.convert()
     img.set_colorkey((0, 0, 0))  # Make pure black transparent
     return img
 
 
+def add_loaded(path, img):
+    # an image decoded elsewhere (the background loader), ready for load_image
+    _loaded[path] = prepare_image(img)
+
+
+def load_image(path):
+    img = _loaded.get(path)
+    if img is not None:
+        return img
+    if ATLAS is not None and path in ATLAS:
+        img = ATLAS.image(path)
+    else:
+        img = prepare_image(pygame.image.load(BASE_IMG_PATH + path))
+    _loaded[path] = img
+    return img
+
+
 def load_images(path):
     images = []
-    for img_name in sorted(os.listdir(BASE_IMG_PATH + path)):
+    names = ATLAS.listdir(path) if ATLAS is not None else os.listdir(BASE_IMG_PATH + path)
+    for img_name in sorted(names):
         images.append(load_image(path + '/' + img_name))
     return images
 
@@ -26,15 +61,19 @@ class Animation:
     Animation is all about just showing different 
     images at different times
     """
-    def __init__(self, images, img_dur=5, loop=True):
+    def __init__(self, images, img_dur=5, loop=True, flipped=None):
         self.images = images
+        # horizontally flipped images, made once here and shared by every copy
+        if flipped is None:
+            flipped = [pygame.transform.flip(img, True, False) for img in images]
+        self.flipped = flipped
         self.loop = loop
         self.img_duration = img_dur
         self.done = False
         self.frame = 0
 
     def copy(self):
-        return Animation(self.images, self.img_duration, self.loop)
+        return Animation(self.images, self.img_duration, self.loop, self.flipped)
     
     def update(self):
         # not a simple frame++
@@ -45,7 +84,9 @@ class Animation:
             if self.frame >= self.img_duration * len(self.images) - 1:
                 self.done = True
                 
-    def img(self):
+    def img(self, flip=False):
         # will increase by 1 every single time as frames increases
         # division gives us the index of the imag we should have
+        if flip:
+            return self.flipped[int(self.frame / self.img_duration)]
         return self.images[int(self.frame / self.img_duration)]